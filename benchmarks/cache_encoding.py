@@ -0,0 +1,108 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.models.orm.session import Session
+from falconswagger.models.orm.sqlalchemy_redis import ModelSQLAlchemyRedisFactory
+from fakeredis import FakeStrictRedis
+from sqlalchemy import create_engine
+from time import process_time
+import json
+import sqlalchemy as sa
+
+
+ROWS = 1000
+REQUESTS = 200
+SIZES = (1, 10, 100)
+model_base = ModelSQLAlchemyRedisFactory.make()
+
+
+class product_msgpack(model_base):
+    __tablename__ = 'product_msgpack'
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String(255))
+    description = sa.Column(sa.String(255))
+    price = sa.Column(sa.Float)
+    stock = sa.Column(sa.Integer)
+
+
+class product_json(model_base):
+    __tablename__ = 'product_json'
+    __cache_encoding__ = 'json'
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String(255))
+    description = sa.Column(sa.String(255))
+    price = sa.Column(sa.Float)
+    stock = sa.Column(sa.Integer)
+
+
+def timeit(func):
+    start = process_time()
+    for _ in range(REQUESTS):
+        func()
+    return (process_time() - start) / REQUESTS
+
+
+def msgpack_response(session, ids):
+    body = product_msgpack.get(session, ids)
+    return json.dumps(body).encode()
+
+
+def json_response(session, ids):
+    body = product_json.get_json(session, ids)
+    return b''.join((b'[', b','.join(body), b']'))
+
+
+def run(session, size):
+    ids = [{'id': i} for i in range(size)]
+    assert json.loads(msgpack_response(session, ids).decode()) == \
+        json.loads(json_response(session, ids).decode())
+
+    redis_time = timeit(lambda: session.redis_bind.hmget('product_json', [b'0'] * size))
+    msgpack_time = timeit(lambda: msgpack_response(session, ids))
+    json_time = timeit(lambda: json_response(session, ids))
+    print('{:<8}{:>16.1f}{:>16.1f}{:>16.1f}{:>16.1f}'.format(
+        size, redis_time * 1e6, msgpack_time * 1e6, json_time * 1e6,
+        (msgpack_time - json_time) * 1e6))
+
+
+def main():
+    engine = create_engine('sqlite://')
+    model_base.metadata.create_all(engine)
+    redis = FakeStrictRedis()
+    redis.flushall()
+    session = Session(bind=engine, redis_bind=redis)
+    rows = [{'id': i, 'name': 'product {}'.format(i), 'description': 'description ' * 10,
+             'price': i / 100, 'stock': i % 50} for i in range(ROWS)]
+    engine.execute(product_msgpack.__table__.insert(), rows)
+    engine.execute(product_json.__table__.insert(), rows)
+
+    print('CPU time per request, in microseconds, with every id cached on redis')
+    print('{:<8}{:>16}{:>16}{:>16}{:>16}'.format(
+        'ids', 'hmget only', 'msgpack', 'json', 'saved'))
+
+    for size in SIZES:
+        run(session, size)
+
+
+if __name__ == '__main__':
+    main()
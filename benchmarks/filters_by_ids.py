@@ -0,0 +1,82 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.models.orm.session import Session
+from falconswagger.models.orm.sqlalchemy_redis import ModelSQLAlchemyRedisFactory
+from sqlalchemy import create_engine
+from time import perf_counter
+import sqlalchemy as sa
+
+
+SIZES = (10, 1000, 50000)
+model_base = ModelSQLAlchemyRedisFactory.make()
+
+
+class single_id(model_base):
+    __tablename__ = 'single_id'
+    id = sa.Column(sa.Integer, primary_key=True)
+
+
+class two_ids(model_base):
+    __tablename__ = 'two_ids'
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+    id2 = sa.Column(sa.Integer, primary_key=True, autoincrement=False)
+
+
+def timeit(func):
+    start = perf_counter()
+    func()
+    return perf_counter() - start
+
+
+def compile_filters(session, filters):
+    return str(filters.compile(dialect=session.bind.dialect))
+
+
+def run(session, model, ids):
+    or_time = timeit(lambda: compile_filters(session, model._build_or_filters_by_ids(ids)))
+    in_time = timeit(lambda: compile_filters(session, model.build_filters_by_ids(ids)))
+    query_time = timeit(lambda: model._query_by_ids(session.query(model), ids))
+    print('{:<10}{:>8}{:>16.4f}{:>16.4f}{:>16.4f}'.format(
+        model.__key__, len(ids), or_time, in_time, query_time))
+
+
+def main():
+    engine = create_engine('sqlite://')
+    model_base.metadata.create_all(engine)
+    session = Session(bind=engine)
+    max_size = max(SIZES)
+    engine.execute(single_id.__table__.insert(), [{'id': i} for i in range(max_size)])
+    engine.execute(two_ids.__table__.insert(), [{'id': i, 'id2': i} for i in range(max_size)])
+
+    print('{:<10}{:>8}{:>16}{:>16}{:>16}'.format(
+        'model', 'ids', 'or compile (s)', 'in compile (s)', 'in query (s)'))
+
+    for size in SIZES:
+        run(session, single_id, [{'id': i} for i in range(size)])
+        run(session, two_ids, [{'id': i, 'id2': i} for i in range(size)])
+        session.expunge_all()
+
+
+if __name__ == '__main__':
+    main()
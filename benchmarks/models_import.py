@@ -0,0 +1,109 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.models.orm.sqlalchemy_redis import ModelSQLAlchemyRedisFactory
+from time import perf_counter
+import sqlalchemy as sa
+
+
+SIZES = (50, 100, 300)
+EAGER_MAX_SIZE = 100
+RELATED_OFFSETS = (1, 2, 5)
+
+
+def build_models(model_base, size, on_model_built=None):
+    models = []
+
+    for i in range(size):
+        name = 'model{}'.format(i)
+        attributes = {
+            '__tablename__': name,
+            'id': sa.Column(sa.Integer, primary_key=True)
+        }
+
+        for offset in RELATED_OFFSETS:
+            if i >= offset:
+                rel_name = 'model{}'.format(i - offset)
+                attributes['{}_id'.format(rel_name)] = \
+                    sa.Column(sa.ForeignKey('{}.id'.format(rel_name)))
+                attributes[rel_name] = sa.orm.relationship(
+                    rel_name, foreign_keys='{}.{}_id'.format(name, rel_name))
+
+        models.append(type(name, (model_base,), attributes))
+
+        if on_model_built is not None:
+            on_model_built(models)
+
+    return models
+
+
+def eager_build_backrefs(models):
+    all_relationships = set()
+    backrefs = {model: set() for model in models}
+
+    for model in models:
+        all_relationships.update(model.__relationships__.values())
+
+    for model in models:
+        for relationship in all_relationships:
+            if model != model.get_model_from_rel(relationship, models, parent=True) and \
+                    model == model.get_model_from_rel(relationship, models):
+                backrefs[model].add(relationship)
+
+    return backrefs
+
+
+def timeit(func):
+    start = perf_counter()
+    result = func()
+    return perf_counter() - start, result
+
+
+def run(size):
+    deferred_time, deferred_models = timeit(
+        lambda: build_models(ModelSQLAlchemyRedisFactory.make(), size))
+    build_time, _ = timeit(deferred_models[0].build_backrefs)
+
+    if size > EAGER_MAX_SIZE:
+        eager_time = float('nan')
+    else:
+        eager_time, eager_models = timeit(lambda: build_models(
+            ModelSQLAlchemyRedisFactory.make(), size, eager_build_backrefs))
+        eager_backrefs = eager_build_backrefs(eager_models)
+        assert [len(eager_backrefs[model]) for model in eager_models] == \
+            [len(model.__backrefs__) for model in deferred_models]
+
+    print('{:<10}{:>16.4f}{:>16.4f}{:>16.4f}'.format(
+        size, eager_time, deferred_time, build_time))
+
+
+def main():
+    print('{:<10}{:>16}{:>16}{:>16}'.format(
+        'models', 'eager (s)', 'deferred (s)', 'finalize (s)'))
+
+    for size in SIZES:
+        run(size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.models.orm.session import Session
+from falconswagger.models.orm.sqlalchemy_redis import ModelSQLAlchemyRedisFactory
+from sqlalchemy import create_engine
+from time import perf_counter
+import sqlalchemy as sa
+
+
+ROWS = 100000
+model_base = ModelSQLAlchemyRedisFactory.make()
+
+
+class category(model_base):
+    __tablename__ = 'category'
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String(255))
+
+
+class product(model_base):
+    __tablename__ = 'product'
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String(255))
+    description = sa.Column(sa.String(255))
+    price = sa.Column(sa.Float)
+    stock = sa.Column(sa.Integer)
+    category_id = sa.Column(sa.ForeignKey('category.id'))
+    category = sa.orm.relationship('category')
+
+
+def timeit(func):
+    start = perf_counter()
+    func()
+    return perf_counter() - start
+
+
+def reflective_todict(inst, schema):
+    dict_inst = inst._todict(schema)
+    inst._format_output_json(dict_inst, schema)
+    return dict_inst
+
+
+def run(insts, schema, label):
+    reflective_time = timeit(lambda: [reflective_todict(inst, schema) for inst in insts])
+    compiled_time = timeit(lambda: product._build_todict_list(insts, schema))
+    print('{:<20}{:>8}{:>16.4f}{:>16.4f}{:>10.2f}x'.format(
+        label, len(insts), reflective_time, compiled_time, reflective_time / compiled_time))
+
+
+def main():
+    engine = create_engine('sqlite://')
+    model_base.metadata.create_all(engine)
+    session = Session(bind=engine)
+    engine.execute(category.__table__.insert(), [{'id': i, 'name': str(i)} for i in range(10)])
+    engine.execute(product.__table__.insert(), [
+        {'id': i, 'name': 'product {}'.format(i), 'description': 'description',
+         'price': i / 100, 'stock': i % 50, 'category_id': i % 10}
+        for i in range(ROWS)])
+    insts = session.query(product).options(sa.orm.joinedload('category')).all()
+    assert [reflective_todict(inst, {}) for inst in insts[:10]] == \
+        product._build_todict_list(insts[:10])
+
+    print('{:<20}{:>8}{:>16}{:>16}{:>11}'.format(
+        'schema', 'rows', 'reflective (s)', 'compiled (s)', 'speedup'))
+
+    run(insts, {'category': False}, 'columns')
+    run(insts, {}, 'with relationship')
+    run(insts, product._build_fields_schema(['id', 'name']), 'fields')
+
+
+if __name__ == '__main__':
+    main()
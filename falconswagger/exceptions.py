@@ -21,7 +21,7 @@
 # SOFTWARE.
 
 
-from falcon import HTTP_UNAUTHORIZED, HTTP_BAD_REQUEST
+from falcon import HTTP_UNAUTHORIZED, HTTP_BAD_REQUEST, HTTP_TOO_MANY_REQUESTS
 
 import json
 
@@ -73,5 +73,11 @@ class UnauthorizedError(FalconSwaggerError):
         headers = {'WWW-Authenticate': 'Basic realm="{}"'.format(realm)}
         FalconSwaggerError.__init__(self, message, status, headers)
 
+
+class JobsQueueFullError(FalconSwaggerError):
+    def __init__(self, message):
+        FalconSwaggerError.__init__(self, message, HTTP_TOO_MANY_REQUESTS)
+
+
 class SwaggerAPIError(Exception):
     pass
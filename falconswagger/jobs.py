@@ -0,0 +1,222 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.exceptions import JobsQueueFullError
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from uuid import uuid4
+import atexit
+import json
+import time
+
+
+class JobsExecutor(object):
+    _default = None
+
+    def __init__(self, max_workers=4, max_queue_size=100):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._slots = BoundedSemaphore(max_workers + max_queue_size)
+        self._lock = Lock()
+        self._is_shutdown = False
+        self._queued_jobs = 0
+        self._running_jobs = 0
+        self._finished_jobs = 0
+        self._rejected_jobs = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls.set_default(cls())
+
+        return cls._default
+
+    @classmethod
+    def set_default(cls, executor):
+        if cls._default is not None and cls._default is not executor:
+            cls._default.shutdown()
+
+        cls._default = executor
+
+    def submit_job(self, model, job_hash, req, resp, session):
+        return self.submit(model._job_watcher, job_hash, req, resp, type(session),
+                           session.bind, session.redis_bind)
+
+    def submit(self, func, *args, **kwargs):
+        if self._is_shutdown or not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected_jobs += 1
+            raise JobsQueueFullError('The jobs queue is full, try again later')
+
+        with self._lock:
+            self._queued_jobs += 1
+
+        try:
+            return self._executor.submit(self._run, time.time(), func, args, kwargs)
+        except RuntimeError:
+            self._job_finished()
+            raise JobsQueueFullError('The jobs executor was shut down')
+
+    def _run(self, submit_time, func, args, kwargs):
+        with self._lock:
+            self._queued_jobs -= 1
+            self._running_jobs += 1
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latency = time.time() - submit_time
+            with self._lock:
+                self._running_jobs -= 1
+                self._finished_jobs += 1
+                self._total_latency += latency
+                self._max_latency = max(self._max_latency, latency)
+
+            self._slots.release()
+
+    def _job_finished(self):
+        with self._lock:
+            self._queued_jobs -= 1
+
+        self._slots.release()
+
+    def shutdown(self, wait=True):
+        self._is_shutdown = True
+        self._executor.shutdown(wait)
+
+    def get_metrics(self):
+        with self._lock:
+            finished_jobs = self._finished_jobs
+            return {
+                'queue_depth': self._queued_jobs,
+                'running_jobs': self._running_jobs,
+                'finished_jobs': finished_jobs,
+                'rejected_jobs': self._rejected_jobs,
+                'max_workers': self.max_workers,
+                'max_queue_size': self.max_queue_size,
+                'avg_latency': self._total_latency / finished_jobs if finished_jobs else 0.0,
+                'max_latency': self._max_latency
+            }
+
+
+class RedisJobsQueue(object):
+
+    def __init__(self, redis_bind, queue_key='falconswagger_jobs',
+                 max_queue_size=None, heartbeat_ttl=30):
+        self.redis_bind = redis_bind
+        self.queue_key = queue_key
+        self.workers_key = queue_key + '_workers'
+        self.max_queue_size = max_queue_size
+        self.heartbeat_ttl = heartbeat_ttl
+        self.worker_id = uuid4().hex
+
+    @property
+    def processing_key(self):
+        return self._build_processing_key(self.worker_id)
+
+    def _build_processing_key(self, worker_id):
+        return '{}_processing:{}'.format(self.queue_key, worker_id)
+
+    def _build_heartbeat_key(self, worker_id):
+        return '{}_heartbeat:{}'.format(self.queue_key, worker_id)
+
+    def submit_job(self, model, job_hash, req, resp, session):
+        if self.max_queue_size is not None \
+                and self.redis_bind.llen(self.queue_key) >= self.max_queue_size:
+            raise JobsQueueFullError('The jobs queue is full, try again later')
+
+        parameters = dict(req.context['parameters'])
+        if 'headers' in parameters:
+            parameters['headers'] = {name: value for name, value in parameters['headers'].items()
+                                     if name != 'Authorization'}
+
+        job = {
+            'model': model.__key__,
+            'hash': job_hash,
+            'parameters': parameters
+        }
+        self.redis_bind.lpush(self.queue_key, json.dumps(job))
+
+    def register_worker(self):
+        self.worker_id = uuid4().hex
+        self.redis_bind.sadd(self.workers_key, self.worker_id)
+        self.heartbeat()
+
+    def unregister_worker(self):
+        self._requeue_worker_jobs(self.worker_id)
+        self.redis_bind.delete(self._build_heartbeat_key(self.worker_id))
+        self.redis_bind.srem(self.workers_key, self.worker_id)
+
+    def heartbeat(self):
+        self.redis_bind.set(self._build_heartbeat_key(self.worker_id), b'1',
+                            ex=self.heartbeat_ttl)
+
+    def pop_job(self, timeout=0):
+        return self.redis_bind.brpoplpush(self.queue_key, self.processing_key, timeout)
+
+    def ack_job(self, raw_job):
+        self.redis_bind.lrem(self.processing_key, 1, raw_job)
+
+    def requeue_dead_workers_jobs(self):
+        requeued = 0
+
+        for worker_id in list(self.redis_bind.smembers(self.workers_key)):
+            worker_id = worker_id.decode()
+            if worker_id == self.worker_id \
+                    or self.redis_bind.exists(self._build_heartbeat_key(worker_id)):
+                continue
+
+            requeued += self._requeue_worker_jobs(worker_id)
+            self.redis_bind.srem(self.workers_key, worker_id)
+
+        return requeued
+
+    def _requeue_worker_jobs(self, worker_id):
+        processing_key = self._build_processing_key(worker_id)
+        requeued = 0
+
+        while self.redis_bind.rpoplpush(processing_key, self.queue_key) is not None:
+            requeued += 1
+
+        return requeued
+
+    def get_metrics(self):
+        workers_ids = [worker_id.decode()
+                       for worker_id in self.redis_bind.smembers(self.workers_key)]
+        return {
+            'queue_depth': self.redis_bind.llen(self.queue_key),
+            'running_jobs': sum(
+                self.redis_bind.llen(self._build_processing_key(worker_id))
+                for worker_id in set(workers_ids + [self.worker_id])),
+            'workers': len(workers_ids),
+            'max_queue_size': self.max_queue_size
+        }
+
+
+@atexit.register
+def _shutdown_default_executor():
+    if JobsExecutor._default is not None:
+        JobsExecutor._default.shutdown()
@@ -43,4 +43,32 @@ class SessionMiddleware(object):
         if session is not None \
                 and hasattr(session, 'close') \
                 and not getattr(model, '__session__', None):
+            if req.context.pop('session_on_stream', False):
+                resp.stream = _SessionClosingStream(resp.stream, session)
+            else:
+                session.close()
+
+
+class _SessionClosingStream(object):
+
+    def __init__(self, stream, session):
+        self._stream = stream
+        self._session = session
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self.close()
+
+    def close(self):
+        session, self._session = self._session, None
+        if session is None:
+            return
+
+        try:
+            stream_close = getattr(self._stream, 'close', None)
+            if stream_close is not None:
+                stream_close()
+        finally:
             session.close()
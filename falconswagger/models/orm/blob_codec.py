@@ -0,0 +1,153 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.exceptions import ModelBaseError
+from falconswagger.mixins import LoggerMixin
+from threading import Lock
+from time import perf_counter
+import zlib
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class BlobCodec(LoggerMixin):
+    HEADERS = {'zlib': b'\x01', 'lz4': b'\x02', 'zstd': b'\x03'}
+
+    def __init__(self, min_size=1024, compression='zlib', level=None):
+        available = self.get_available_compressions()
+        if compression not in available:
+            raise ModelBaseError(
+                "compression '{}' is not available, must be one of: {}".format(
+                    compression, ', '.join(available)))
+
+        self.min_size = min_size
+        self.compression = compression
+        self.level = level
+        self._header = self.HEADERS[compression]
+        self._compress = self._build_compressor(compression, level)
+        self._decompressors = self._build_decompressors()
+        self._lock = Lock()
+        self._compressed = 0
+        self._skipped = 0
+        self._decompressed = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._compress_time = 0.0
+        self._decompress_time = 0.0
+        self._build_logger()
+
+    @staticmethod
+    def get_available_compressions():
+        compressions = ['zlib']
+
+        if lz4_frame is not None:
+            compressions.append('lz4')
+
+        if zstandard is not None:
+            compressions.append('zstd')
+
+        return tuple(compressions)
+
+    def _build_compressor(self, compression, level):
+        if compression == 'lz4':
+            return lambda data: lz4_frame.compress(data, compression_level=level or 0)
+
+        if compression == 'zstd':
+            return zstandard.ZstdCompressor(level=3 if level is None else level).compress
+
+        return lambda data: zlib.compress(data, 6 if level is None else level)
+
+    def _build_decompressors(self):
+        decompressors = {self.HEADERS['zlib']: zlib.decompress}
+
+        if lz4_frame is not None:
+            decompressors[self.HEADERS['lz4']] = lz4_frame.decompress
+
+        if zstandard is not None:
+            decompressors[self.HEADERS['zstd']] = zstandard.ZstdDecompressor().decompress
+
+        return decompressors
+
+    def compress(self, data):
+        if len(data) < self.min_size:
+            with self._lock:
+                self._skipped += 1
+            return data
+
+        start = perf_counter()
+        blob = self._header + self._compress(data)
+        elapsed = perf_counter() - start
+
+        if len(blob) >= len(data):
+            blob = data
+
+        with self._lock:
+            self._compressed += 1
+            self._bytes_in += len(data)
+            self._bytes_out += len(blob)
+            self._compress_time += elapsed
+
+        return blob
+
+    def decompress(self, blob):
+        header = blob[:1]
+        if header not in self.HEADERS.values():
+            return blob
+
+        decompress = self._decompressors.get(header)
+        if decompress is None:
+            raise ModelBaseError(
+                "can't decompress blob with header {}, compression not available".format(header))
+
+        start = perf_counter()
+        data = decompress(blob[1:])
+        elapsed = perf_counter() - start
+
+        with self._lock:
+            self._decompressed += 1
+            self._decompress_time += elapsed
+
+        return data
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                'compression': self.compression,
+                'compressed': self._compressed,
+                'skipped': self._skipped,
+                'decompressed': self._decompressed,
+                'bytes_in': self._bytes_in,
+                'bytes_out': self._bytes_out,
+                'compression_ratio':
+                    self._bytes_in / self._bytes_out if self._bytes_out else 0.0,
+                'compress_time': self._compress_time,
+                'decompress_time': self._decompress_time
+            }
@@ -23,19 +23,21 @@
 
 from falconswagger.router import Route
 from falconswagger.utils import build_validator
-from falconswagger.exceptions import ModelBaseError, JSONError
+from falconswagger.exceptions import ModelBaseError, JSONError, JobsQueueFullError
+from falconswagger.jobs import JobsExecutor
 from falconswagger.models.logger import ModelLoggerMetaMixin
 from falconswagger.models.http import ModelHttpMetaMixin
 from falcon.errors import HTTPNotFound, HTTPMethodNotAllowed
 from falcon import HTTP_CREATED, HTTP_NO_CONTENT, HTTP_METHODS
 from falcon.responders import create_default_options
-from jsonschema import ValidationError
+from jsonschema import ValidationError, Draft4Validator
+from sqlalchemy.exc import SQLAlchemyError
 from collections import defaultdict
 from copy import deepcopy
 from importlib import import_module
-from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from datetime import datetime
+from functools import partial
 import json
 import os.path
 import logging
@@ -54,9 +56,33 @@ class _ModelContextMetaMixin(type):
         kwargs.update(parameters['query_string'])
         return session, req_body, id_, kwargs
 
+    def _normalize_fields(cls, kwargs):
+        fields = kwargs.pop('fields', None)
+        if isinstance(fields, str):
+            fields = fields.split(',')
+
+        if fields:
+            kwargs['fields'] = fields
+
+    def _iter_get_operations(cls, operation_id):
+        for uri_template, path in cls.__schema__.items():
+            if uri_template == 'definitions':
+                continue
+
+            method_schema = path.get('get')
+            if not method_schema or method_schema.get('operationId') != operation_id:
+                continue
+
+            parameters = method_schema.get('parameters', []) + path.get('parameters', [])
+            query_names = [
+                param.get('name') for param in parameters if param.get('in') == 'query']
+            yield method_schema, query_names
+
 
 
 class _ModelPostMetaMixin(_ModelContextMetaMixin):
+    INGEST_BATCH_SIZE = 1000
+    INGEST_ERRORS = (ModelBaseError, SQLAlchemyError, ValidationError, ValueError, TypeError)
 
     def post_by_body(cls, req, resp):
         cls._insert(req, resp)
@@ -81,6 +107,66 @@ class _ModelPostMetaMixin(_ModelContextMetaMixin):
     def post_by_uri_template(cls, req, resp):
         cls._insert(req, resp, with_update=True)
 
+    def post_by_ndjson(cls, req, resp):
+        session, _, _, kwargs = cls._get_context_values(req.context)
+
+        if 'application/x-ndjson' not in (req.content_type or ''):
+            raise ModelBaseError("Content-Type must be 'application/x-ndjson'")
+
+        batch_size = kwargs.pop('batch_size', cls.INGEST_BATCH_SIZE)
+        try:
+            batch_size = int(batch_size)
+            if batch_size < 1:
+                raise ValueError()
+        except (ValueError, TypeError):
+            raise ModelBaseError("invalid batch_size '{}'".format(batch_size))
+
+        body_schema = req.context.get('body_schema')
+        validator = None if body_schema is None else Draft4Validator(body_schema)
+        report = {'inserted': 0, 'failed': 0, 'failed_lines': []}
+        batch = []
+
+        for index, line in enumerate(iter(req.stream.readline, b'')):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                obj = json.loads(line.decode())
+                if validator is not None:
+                    validator.validate(obj)
+            except (ValueError, ValidationError):
+                report['failed_lines'].append(index)
+                continue
+
+            batch.append((index, obj))
+            if len(batch) == batch_size:
+                cls._insert_batch(session, batch, report, kwargs)
+                batch = []
+
+        if batch:
+            cls._insert_batch(session, batch, report, kwargs)
+
+        report['failed'] = len(report['failed_lines'])
+        report['failed_lines'].sort()
+        resp.body = json.dumps(report)
+
+    def _insert_batch(cls, session, batch, report, kwargs):
+        try:
+            cls.insert(session, [obj for _, obj in batch], commit=False, todict=False, **kwargs)
+            session.commit()
+        except cls.INGEST_ERRORS:
+            session.rollback()
+            if len(batch) == 1:
+                report['failed_lines'].append(batch[0][0])
+                return
+
+            for line in batch:
+                cls._insert_batch(session, [line], report, kwargs)
+
+        else:
+            report['inserted'] += len(batch)
+
 
 class _ModelPutMetaMixin(_ModelPostMetaMixin):
 
@@ -155,11 +241,61 @@ class _ModelDeleteMetaMixin(_ModelContextMetaMixin):
 
 class _ModelGetMetaMixin(_ModelContextMetaMixin):
 
+    def _set_cursor_parameters(cls):
+        for method_schema, query_names in cls._iter_get_operations('get_by_body'):
+            if 'limit' in query_names and 'cursor' not in query_names:
+                method_schema.setdefault('parameters', []).append({
+                    'name': 'cursor',
+                    'in': 'query',
+                    'type': 'string',
+                    'description': "The 'X-Next-Cursor' header value of the previous page"
+                })
+
+                response = method_schema.get('responses', {}).get('200')
+                if response is not None:
+                    response.setdefault('headers', {})['X-Next-Cursor'] = {
+                        'type': 'string',
+                        'description': 'Cursor of the next page, missing on the last page'
+                    }
+
+    def _set_stream_parameters(cls):
+        for method_schema, query_names in cls._iter_get_operations('get_by_body'):
+            if query_names and 'stream' not in query_names:
+                method_schema.setdefault('parameters', []).append({
+                    'name': 'stream',
+                    'in': 'query',
+                    'type': 'boolean',
+                    'description': 'Returns the objects as a chunked json array'
+                })
+
     def get_by_body(cls, req, resp):
         session, req_body, _, kwargs = cls._get_context_values(req.context)
+        cls._normalize_fields(kwargs)
+
+        if cls._build_stream_flag(kwargs.pop('stream', False)):
+            cls._stream(req, resp, session, req_body or None, kwargs)
+            return
+
+        cursor = kwargs.pop('cursor', None)
+
+        if req_body and cls._has_json_cache():
+            resp_body = cls.get_json(session, req_body, **kwargs)
+            if not resp_body:
+                raise HTTPNotFound()
+
+            resp.body = b''.join((b'[', b','.join(resp_body), b']'))
+            return
 
         if req_body:
             resp_body = cls.get(session, req_body, **kwargs)
+
+        elif cursor is not None or ('limit' in kwargs and 'offset' not in kwargs):
+            kwargs.pop('offset', None)
+            resp_body, next_cursor = cls.get_page(session, cursor=cursor, **kwargs)
+
+            if next_cursor is not None:
+                resp.set_header('X-Next-Cursor', next_cursor)
+
         else:
             resp_body = cls.get(session, **kwargs)
 
@@ -168,8 +304,56 @@ class _ModelGetMetaMixin(_ModelContextMetaMixin):
 
         resp.body = json.dumps(resp_body)
 
+    def _build_stream_flag(cls, stream):
+        if isinstance(stream, bool):
+            return stream
+
+        if stream in ('true', '1'):
+            return True
+
+        if stream in ('false', '0'):
+            return False
+
+        raise ModelBaseError("invalid stream '{}'".format(stream))
+
+    def _stream(cls, req, resp, session, ids, kwargs):
+        objs = cls.get_iter(session, ids, **kwargs)
+        first_obj = next(objs, None)
+
+        if first_obj is None:
+            raise HTTPNotFound()
+
+        req.context['session_on_stream'] = True
+        resp.stream = cls._build_json_array_stream(first_obj, objs)
+
+    def _build_json_array_stream(cls, first_obj, objs):
+        chunk = ['[', json.dumps(first_obj)]
+        counter = 1
+
+        for obj in objs:
+            chunk.append(',')
+            chunk.append(json.dumps(obj))
+            counter += 1
+
+            if counter == cls.STREAM_CHUNKS:
+                yield ''.join(chunk).encode()
+                chunk = []
+                counter = 0
+
+        chunk.append(']')
+        yield ''.join(chunk).encode()
+
     def get_by_uri_template(cls, req, resp):
         session, _, id_, kwargs = cls._get_context_values(req.context)
+        cls._normalize_fields(kwargs)
+
+        if cls._has_json_cache():
+            resp_body = cls.get_json(session, id_, **kwargs)
+            if not resp_body:
+                raise HTTPNotFound()
+
+            resp.body = resp_body[0]
+            return
 
         resp_body = cls.get(session, id_, **kwargs)
         if not resp_body:
@@ -177,36 +361,67 @@ class _ModelGetMetaMixin(_ModelContextMetaMixin):
 
         resp.body = json.dumps(resp_body[0])
 
+    def _has_json_cache(cls):
+        return getattr(cls, '__cache_encoding__', None) == 'json'
+
     def get_schema(cls, req, resp):
         resp.body = json.dumps(cls.__schema__)
 
 
 
-class ModelJobsMetaMixin(type):
+class ModelJobsMetaMixin(_ModelContextMetaMixin):
+    JOBS_TTL = 7*24*60*60
+    JOBS_RESULT_CHUNK_SIZE = 512*1024
+    JOBS_STREAM_CHUNKS = 8
+    JOBS_RESULTS_LIMIT = 1000
 
-    def post_job(cls, req, resp):
-        job_session = req.context['session']
-        job_session = type(job_session)(bind=job_session.bind.engine.connect(),
-                                        redis_bind=job_session.redis_bind)
-        req.context['job_session'] = job_session
+    def _set_job_parameters(cls):
+        for method_schema, query_names in cls._iter_get_operations('get_job'):
+            if 'offset' not in query_names:
+                method_schema.setdefault('parameters', []).append({
+                    'name': 'offset',
+                    'in': 'query',
+                    'type': 'integer',
+                    'minimum': 0,
+                    'description': "Returns the job partial results from this offset "
+                                   "instead of the final result"
+                })
 
+    def post_job(cls, req, resp):
+        session = req.context['session']
         job_hash = '{:x}'.format(random.getrandbits(128))
-        executor = ThreadPoolExecutor(2)
+        executor = cls._get_jobs_executor()
 
-        job = executor.submit(cls._run_job, req, resp)
-        executor.submit(cls._job_watcher, job, job_hash, job_session)
+        cls._set_job(job_hash, {'status': 'queued'}, session)
+
+        try:
+            executor.submit_job(cls, job_hash, req, resp, session)
+        except JobsQueueFullError:
+            cls._del_job(job_hash, session)
+            raise
 
         resp.body = json.dumps({'hash': job_hash})
 
+    def _get_jobs_executor(cls):
+        executor = getattr(cls, '__jobs_executor__', None)
+        return JobsExecutor.get_default() if executor is None else executor
+
     def _run_job(cls, req, resp):
         pass
 
-    def _job_watcher(cls, job, job_hash, session):
-        cls._set_job(job_hash, {'status': 'running'}, session)
+    def _job_watcher(cls, job_hash, req, resp, session_class, bind, redis_bind):
+        conn = None
+        session = None
         start_time = datetime.now()
 
         try:
-            result = job.result()
+            conn = bind if bind is None else bind.engine.connect()
+            session = session_class(bind=conn, redis_bind=redis_bind)
+            req.context['job_session'] = session
+            req.context['job_progress'] = partial(cls._set_job_progress, job_hash, session)
+
+            cls._set_job(job_hash, {'status': 'running'}, session)
+            result = cls._run_job(req, resp)
         except Exception as error:
             result = {'name': error.__class__.__name__, 'message': str(error)}
             status = 'error'
@@ -219,30 +434,137 @@ class ModelJobsMetaMixin(type):
         elapsed_time = str(end_time - start_time)[:-3]
         job_obj = {'status': status, 'result': result, 'elapsed_time': elapsed_time}
 
-        cls._set_job(job_hash, job_obj, session)
-        session.bind.close()
-        session.close()
+        try:
+            if session is None:
+                cls._set_job_on_redis(job_hash, job_obj, redis_bind)
+            else:
+                cls._set_job(job_hash, job_obj, session)
+        finally:
+            if conn is not None:
+                conn.close()
+
+            if session is not None:
+                session.close()
 
     def _set_job(cls, job_hash, status, session):
-        key = cls._build_jobs_key()
-        session.redis_bind.hset(key, job_hash, json.dumps(status))
-        if session.redis_bind.ttl(key) < 0:
-            session.redis_bind.expire(key, 7*24*60*60)
+        cls._set_job_on_redis(job_hash, status, session.redis_bind)
+
+    def _set_job_on_redis(cls, job_hash, status, redis_bind):
+        key = cls._build_job_key(job_hash)
+        chunks_key = cls._build_job_chunks_key(job_hash)
+        ttl = getattr(cls, '__jobs_ttl__', cls.JOBS_TTL)
+        chunk_size = getattr(cls, '__jobs_result_chunk_size__', cls.JOBS_RESULT_CHUNK_SIZE)
+        pipeline = redis_bind.pipeline()
+        pipeline.delete(chunks_key)
+
+        if 'result' in status:
+            result = json.dumps(status['result']).encode()
+
+            if len(result) > chunk_size:
+                status = status.copy()
+                status.pop('result')
+                status['result_chunks'] = 0
+
+                for i in range(0, len(result), chunk_size):
+                    pipeline.rpush(chunks_key, result[i:i+chunk_size])
+                    status['result_chunks'] += 1
+
+                pipeline.expire(chunks_key, ttl)
+
+        pipeline.set(key, json.dumps(status), ex=ttl)
+        pipeline.expire(cls._build_job_results_key(job_hash), ttl)
+        pipeline.execute()
+
+    def _set_job_progress(cls, job_hash, session, result=None, progress=None):
+        ttl = getattr(cls, '__jobs_ttl__', cls.JOBS_TTL)
+        pipeline = session.redis_bind.pipeline()
+
+        if result is not None:
+            results_key = cls._build_job_results_key(job_hash)
+            pipeline.rpush(results_key, json.dumps(result))
+            pipeline.expire(results_key, ttl)
+
+        if progress is not None:
+            status = {'status': 'running', 'progress': progress}
+            pipeline.set(cls._build_job_key(job_hash), json.dumps(status), ex=ttl)
+
+        pipeline.execute()
 
-    def _build_jobs_key(cls):
-        return cls.__key__ + '_jobs'
+    def _del_job(cls, job_hash, session):
+        session.redis_bind.delete(
+            cls._build_job_key(job_hash),
+            cls._build_job_chunks_key(job_hash),
+            cls._build_job_results_key(job_hash))
+
+    def _build_job_key(cls, job_hash):
+        return '{}_jobs:{}'.format(cls.__key__, job_hash)
+
+    def _build_job_chunks_key(cls, job_hash):
+        return cls._build_job_key(job_hash) + ':chunks'
+
+    def _build_job_results_key(cls, job_hash):
+        return cls._build_job_key(job_hash) + ':results'
 
     def get_job(cls, req, resp):
         job_hash = req.context['parameters']['query_string']['hash']
-        status = cls._get_job(job_hash, req.context['session'])
+        session = req.context['session']
+        status = session.redis_bind.get(cls._build_job_key(job_hash))
 
         if status is None:
             raise HTTPNotFound()
 
-        resp.body = status
+        offset = req.context['parameters']['query_string'].get('offset')
+        if offset is not None:
+            resp.body = cls._build_job_results(job_hash, status, offset, session)
+
+        elif b'"result_chunks"' in status:
+            resp.stream = cls._build_job_stream(job_hash, status, session.redis_bind)
+        else:
+            resp.body = status
 
     def _get_job(cls, job_hash, session):
-        return session.redis_bind.hget(cls._build_jobs_key(), job_hash)
+        status = session.redis_bind.get(cls._build_job_key(job_hash))
+        if status is None:
+            return None
+
+        return b''.join(cls._build_job_stream(job_hash, status, session.redis_bind))
+
+    def _build_job_results(cls, job_hash, status, offset, session):
+        try:
+            offset = int(offset)
+            if offset < 0:
+                raise ValueError()
+        except (ValueError, TypeError):
+            raise ModelBaseError("invalid offset '{}'".format(offset))
+
+        results = session.redis_bind.lrange(
+            cls._build_job_results_key(job_hash), offset, offset+cls.JOBS_RESULTS_LIMIT-1)
+        job = json.loads(status.decode())
+        job.pop('result', None)
+        job.pop('result_chunks', None)
+        job['next_offset'] = offset + len(results)
+
+        return json.dumps(job)[:-1].encode() \
+            + b', "results": [' + b', '.join(results) + b']}'
+
+    def _build_job_stream(cls, job_hash, status, redis_bind):
+        job = json.loads(status.decode())
+        chunks = job.pop('result_chunks', None)
+
+        if chunks is None:
+            yield status
+            return
+
+        chunks_key = cls._build_job_chunks_key(job_hash)
+        yield json.dumps(job)[:-1].encode() + b', "result": '
+
+        for i in range(0, chunks, cls.JOBS_STREAM_CHUNKS):
+            yield b''.join(redis_bind.lrange(chunks_key, i, i+cls.JOBS_STREAM_CHUNKS-1))
+
+        yield b'}'
+
+    def get_jobs_metrics(cls, req, resp):
+        resp.body = json.dumps(cls._get_jobs_executor().get_metrics())
 
 
 class ModelOrmHttpMetaMixin(
@@ -0,0 +1,166 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.mixins import LoggerMixin
+from collections import OrderedDict
+from threading import Lock, Thread
+import msgpack
+import time
+
+
+def _copy_obj(obj):
+    if isinstance(obj, dict):
+        return {key: _copy_obj(value) for key, value in obj.items()}
+
+    if isinstance(obj, list):
+        return [_copy_obj(value) for value in obj]
+
+    return obj
+
+
+class LocalCache(LoggerMixin):
+
+    def __init__(self, max_size=1000, ttl=60, redis_bind=None,
+                 channel='falconswagger_local_cache', poll_timeout=1):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis_bind = redis_bind
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._thread = None
+        self._pubsub = None
+        self._is_shutdown = False
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._build_logger()
+
+    def get_many(self, model_redis_key, keys, raw=False):
+        objs = []
+        now = time.time()
+
+        with self._lock:
+            for key in keys:
+                cache_key = (model_redis_key, key, raw)
+                entry = self._entries.get(cache_key)
+
+                if entry is not None and entry[0] is not None and entry[0] <= now:
+                    del self._entries[cache_key]
+                    self._expirations += 1
+                    entry = None
+
+                if entry is None:
+                    self._misses += 1
+                    objs.append(None)
+                else:
+                    self._hits += 1
+                    self._entries.move_to_end(cache_key)
+                    objs.append(entry[1])
+
+        return objs if raw else [_copy_obj(obj) for obj in objs]
+
+    def set_many(self, model_redis_key, objs, raw=False):
+        expires_at = None if self.ttl is None else time.time() + self.ttl
+
+        if not raw:
+            objs = {key: _copy_obj(obj) for key, obj in objs.items()}
+
+        with self._lock:
+            for key, obj in objs.items():
+                cache_key = (model_redis_key, key, raw)
+                self._entries[cache_key] = (expires_at, obj)
+                self._entries.move_to_end(cache_key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, keys):
+        with self._lock:
+            for model_redis_key, key in keys:
+                obj = self._entries.pop((model_redis_key, key, False), None)
+                raw_obj = self._entries.pop((model_redis_key, key, True), None)
+
+                if obj is not None or raw_obj is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def publish(self, redis_bind, keys):
+        return redis_bind.publish(self.channel, msgpack.dumps([list(key) for key in keys]))
+
+    def start(self):
+        if self._thread is None:
+            self._pubsub = self.redis_bind.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(self.channel)
+            self._thread = Thread(target=self._listen, name=type(self).__name__, daemon=True)
+            self._thread.start()
+
+        return self
+
+    def _listen(self):
+        while not self._is_shutdown:
+            try:
+                message = self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=self.poll_timeout)
+            except Exception:
+                self._logger.exception('Error listening the invalidations, clearing the cache')
+                self.clear()
+                time.sleep(self.poll_timeout)
+                continue
+
+            if message is not None and message['type'] == 'message':
+                self._handle_message(message['data'])
+
+    def _handle_message(self, data):
+        keys = msgpack.loads(data)
+        self.invalidate([(model_redis_key.decode(), key) for model_redis_key, key in keys])
+
+    def shutdown(self, wait=True):
+        self._is_shutdown = True
+
+        if self._thread is not None and wait:
+            self._thread.join()
+
+        if self._pubsub is not None:
+            self._pubsub.close()
+
+    def get_metrics(self):
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': self._hits / requests if requests else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations
+            }
@@ -22,7 +22,9 @@
 
 
 from falconswagger.models.orm.redis_base import ModelRedisBaseMeta, ModelRedisBase
+from falconswagger.exceptions import ModelBaseError
 from collections import OrderedDict
+from itertools import islice
 from copy import deepcopy
 from types import MethodType
 import msgpack
@@ -40,7 +42,7 @@ class ModelRedisMeta(ModelRedisBaseMeta):
         for obj in objs:
             obj = cls(obj)
             obj_key = obj.get_key()
-            ids_objs_map[obj_key] = msgpack.dumps(obj)
+            ids_objs_map[obj_key] = cls._pack_obj(obj)
             counter += 1
 
             if counter == cls.CHUNKS:
@@ -82,7 +84,7 @@ class ModelRedisMeta(ModelRedisBaseMeta):
                     keys_objs_map.pop(key)
                     continue
 
-                set_map[key] = msgpack.dumps(obj)
+                set_map[key] = cls._pack_obj(obj)
                 counter += 1
 
                 if counter == cls.CHUNKS:
@@ -117,27 +119,70 @@ class ModelRedisMeta(ModelRedisBaseMeta):
         if keys:
             session.redis_bind.hdel(cls.__key__, *keys)
 
-    def get(cls, session, ids=None, limit=None, offset=None, **kwargs):
+    def get(cls, session, ids=None, limit=None, offset=None, fields=None, **kwargs):
         if limit is not None and offset is not None:
             limit += offset
 
         elif ids is None and limit is None and offset is None:
-            return cls._unpack_objs(session.redis_bind.hgetall(cls.__key__))
+            return cls._unpack_objs(session.redis_bind.hgetall(cls.__key__), fields)
 
         if ids is None:
             keys = [k for k in session.redis_bind.hkeys(cls.__key__)][offset:limit]
             if keys:
-                return cls._unpack_objs(session.redis_bind.hmget(cls.__key__, *keys))
+                return cls._unpack_objs(session.redis_bind.hmget(cls.__key__, *keys), fields)
             else:
                 return []
         else:
             ids = [cls._build_key(id_) for id_ in cls._to_list(ids)]
-            return cls._unpack_objs(session.redis_bind.hmget(cls.__key__, *ids[offset:limit]))
+            objs = session.redis_bind.hmget(cls.__key__, *ids[offset:limit])
+            return cls._unpack_objs(objs, fields)
 
-    def _unpack_objs(cls, objs):
+    def get_page(cls, session, limit=None, cursor=None, fields=None, **kwargs):
+        offset = 0 if cursor is None else cls._decode_cursor(cursor)
+        if not isinstance(offset, int) or offset < 0:
+            raise ModelBaseError("invalid cursor '{}'".format(cursor))
+
+        objs = cls.get(session, limit=limit, offset=offset, fields=fields)
+        next_cursor = None
+
+        if limit is not None and len(objs) == limit:
+            next_cursor = cls._encode_cursor(offset + limit)
+
+        return objs, next_cursor
+
+    def get_iter(cls, session, ids=None, limit=None, offset=None, fields=None, **kwargs):
+        if limit is not None and offset is not None:
+            limit += offset
+
+        if ids is None:
+            objs = session.redis_bind.hscan_iter(cls.__key__, count=cls.STREAM_CHUNKS)
+            for _, obj in islice(objs, offset, limit):
+                yield cls._unpack_obj(obj, fields)
+
+        else:
+            keys = [cls._build_key(id_) for id_ in cls._to_list(ids)][offset:limit]
+            for i in range(0, len(keys), cls.STREAM_CHUNKS):
+                objs = session.redis_bind.hmget(cls.__key__, *keys[i:i+cls.STREAM_CHUNKS])
+                yield from cls._unpack_objs(objs, fields)
+
+    def _unpack_objs(cls, objs, fields=None):
         if isinstance(objs, dict):
             objs = objs.values()
-        return [msgpack.loads(obj, encoding='utf-8') for obj in objs if obj is not None]
+        return [cls._unpack_obj(obj, fields) for obj in objs if obj is not None]
+
+    def _pack_obj(cls, obj):
+        blob = msgpack.dumps(obj)
+        return blob if cls.__blob_codec__ is None else cls.__blob_codec__.compress(blob)
+
+    def _unpack_obj(cls, obj, fields=None):
+        if cls.__blob_codec__ is not None:
+            obj = cls.__blob_codec__.decompress(obj)
+
+        obj = msgpack.loads(obj, encoding='utf-8')
+        if fields:
+            obj = {key: value for key, value in obj.items() if key in fields}
+
+        return obj
 
 
 class _ModelRedis(dict, ModelRedisBase):
@@ -162,7 +207,8 @@ class _ModelRedis(dict, ModelRedisBase):
 class ModelRedisFactory(object):
 
     @staticmethod
-    def make(class_name, key, id_names, schema=None, metaclass=None, keys_separator=b'|'):
+    def make(class_name, key, id_names, schema=None, metaclass=None,
+             keys_separator=b'|', blob_codec=None):
         if metaclass is None:
             metaclass = ModelRedisMeta
 
@@ -170,7 +216,8 @@ class ModelRedisFactory(object):
             '__key__': key,
             '__id_names__': sorted(tuple(id_names)),
             '__keys_separator__': \
-                keys_separator.decode() if isinstance(keys_separator, str) else keys_separator
+                keys_separator.decode() if isinstance(keys_separator, str) else keys_separator,
+            '__blob_codec__': blob_codec
         }
         if schema is not None:
             attributes['__schema__'] = schema
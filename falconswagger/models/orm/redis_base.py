@@ -33,6 +33,7 @@ from jsonschema import ValidationError
 from collections import defaultdict
 from copy import deepcopy
 from importlib import import_module
+from base64 import urlsafe_b64encode, urlsafe_b64decode
 from concurrent.futures import ThreadPoolExecutor
 import json
 import os.path
@@ -41,11 +42,15 @@ import random
 
 
 class ModelRedisBaseMeta(ModelLoggerMetaMixin, ModelOrmHttpMetaMixin):
+    STREAM_CHUNKS = 1000
 
     def __init__(cls, name, base_classes, attributes):
         cls._set_logger()
 
         if hasattr(cls, '__schema__'):
+            cls._set_cursor_parameters()
+            cls._set_stream_parameters()
+            cls._set_job_parameters()
             cls._set_routes()
         else:
             cls._set_key()
@@ -53,6 +58,15 @@ class ModelRedisBaseMeta(ModelLoggerMetaMixin, ModelOrmHttpMetaMixin):
     def _to_list(cls, objs):
         return objs if isinstance(objs, list) else [objs]
 
+    def _encode_cursor(cls, value):
+        return urlsafe_b64encode(json.dumps(value, sort_keys=True).encode()).decode()
+
+    def _decode_cursor(cls, cursor):
+        try:
+            return json.loads(urlsafe_b64decode(cursor.encode()).decode())
+        except ValueError:
+            raise ModelBaseError("invalid cursor '{}'".format(cursor))
+
     def get_filters_names_key(cls):
         return cls.__key__ + '_filters_names'
 
@@ -23,18 +23,21 @@
 
 from sqlalchemy.orm import sessionmaker, Session as SessionSA
 from sqlalchemy.orm.query import Query
-from sqlalchemy import event, or_
+from sqlalchemy import event, inspect, or_
 from collections import defaultdict
 
-import msgpack
 
 class _SessionBase(SessionSA):
     def __init__(
             self, bind=None, autoflush=True,
             expire_on_commit=True, _enable_transaction_accounting=True,
             autocommit=False, twophase=False, weak_identity_map=True,
-            binds=None, extension=None, info=None, query_cls=Query, redis_bind=None):
+            binds=None, extension=None, info=None, query_cls=Query, redis_bind=None,
+            redis_transaction=False, redis_write_behind=None):
         self.redis_bind = redis_bind
+        self.redis_transaction = redis_transaction
+        self.redis_write_behind = redis_write_behind
+        self.redis_commit_stats = {'round_trips': 0, 'commands': 0}
         self.user = None
         self._clean_redis_sets()
         SessionSA.__init__(
@@ -46,78 +49,205 @@ class _SessionBase(SessionSA):
     def _clean_redis_sets(self):
         self._insts_to_hdel = set()
         self._insts_to_hmset = set()
+        self._insts_to_not_found_hdel = set()
 
     def commit(self):
         try:
             SessionSA.commit(self)
-            if self.redis_bind is not None:
-                self._exec_hdel(self._insts_to_hdel)
+            if self.redis_bind is not None and self.redis_write_behind is not None:
+                self._clear_not_found_markers()
+                self.redis_write_behind.put(self._insts_to_hdel, self._insts_to_hmset)
+            elif self.redis_bind is not None:
                 self._update_objects_on_redis()
         finally:
             self._clean_redis_sets()
 
+    def rollback(self):
+        try:
+            SessionSA.rollback(self)
+        finally:
+            self._clean_redis_sets()
+
     def delete(self, instance):
-        self._insts_to_hmset.update(instance.get_related(self))
+        if self.redis_bind is not None:
+            self._insts_to_hmset.update(self._get_related_many([instance]))
+
         return SessionSA.delete(self, instance)
 
-    def _update_objects_on_redis(self):
-        insts_to_hmset = set.union(self._insts_to_hdel, self._insts_to_hmset)
-        insts_to_hmset_count = 0
+    def delete_all(self, instances):
+        if self.redis_bind is not None:
+            self._insts_to_hmset.update(self._get_related_many(instances))
+
+        for instance in instances:
+            SessionSA.delete(self, instance)
+
+    def _get_related_many(self, insts):
+        models_insts_map = defaultdict(list)
+        related = set()
+
+        for inst in insts:
+            models_insts_map[type(inst)].append(inst)
 
-        while len(insts_to_hmset) != insts_to_hmset_count:
-            insts_to_hmset_count = len(insts_to_hmset)
-            insts_to_hmset_copy = insts_to_hmset.copy()
-            [insts_to_hmset.update(inst.get_related(self)) for inst in insts_to_hmset_copy]
+        for model, model_insts in models_insts_map.items():
+            related.update(model.get_related_many(self, model_insts))
 
+        return related
+
+    def _update_objects_on_redis(self):
+        keys_to_hdel = [(type(inst), get_identity_key(inst))
+                        for inst in set.union(self._insts_to_hdel, self._insts_to_not_found_hdel)]
+        insts_to_hmset = self._get_related_closure(
+            set.union(self._insts_to_hdel, self._insts_to_hmset))
         insts_to_hmset.difference_update(self._insts_to_hdel)
-        self._exec_hmset(insts_to_hmset)
+        self._exec_redis_updates(insts_to_hmset, keys_to_hdel)
+
+    def _clear_not_found_markers(self):
+        if not self._insts_to_not_found_hdel:
+            return
+
+        keys = [(type(inst), get_identity_key(inst)) for inst in self._insts_to_not_found_hdel]
+        filters_names_map = self._get_filters_names_map({model for model, _ in keys})
+        pipeline = self.redis_bind.pipeline(transaction=False)
+        commands = self._exec_hdel(pipeline, keys, filters_names_map)
+
+        if commands:
+            pipeline.execute()
+            self.redis_commit_stats['round_trips'] += 1
+            self.redis_commit_stats['commands'] += commands
+
+    def _get_related_closure(self, insts):
+        insts = set(insts)
+        new_insts = insts
+
+        while new_insts:
+            new_insts = self._get_related_many(new_insts).difference(insts)
+            insts.update(new_insts)
+
+        return insts
+
+    def _exec_redis_updates(self, insts_to_hmset, keys_to_hdel):
+        insts_to_hdel = {inst for inst in insts_to_hmset
+                         if type(inst).__cache_policy__ == 'invalidate'}
+        insts_to_hmset = insts_to_hmset.difference(insts_to_hdel)
+        keys_to_hdel = list(keys_to_hdel)
+
+        for inst in insts_to_hdel:
+            keys_to_hdel.append((type(inst), get_identity_key(inst)))
+            inst_old_redis_key = getattr(inst, 'old_redis_key', None)
+            if inst_old_redis_key is not None:
+                keys_to_hdel.append((type(inst), inst_old_redis_key))
+
+        self.redis_commit_stats = {'round_trips': 0, 'commands': 0}
+        models = {type(inst) for inst in insts_to_hmset}
+        models.update([model for model, _ in keys_to_hdel])
+        filters_names_map = self._get_filters_names_map(models)
+
+        pipeline = self.redis_bind.pipeline(transaction=self.redis_transaction)
+        commands = self._exec_hdel(pipeline, keys_to_hdel, filters_names_map)
+        commands += self._exec_hmset(pipeline, insts_to_hmset, filters_names_map)
+        local_caches_keys = self._build_local_caches_keys(
+            insts_to_hmset, keys_to_hdel, filters_names_map)
+
+        for local_cache, keys in local_caches_keys.items():
+            local_cache.publish(pipeline, keys)
+            commands += 1
+
+        if commands:
+            pipeline.execute()
+            self.redis_commit_stats['round_trips'] += 1
+            self.redis_commit_stats['commands'] += commands
+
+        for local_cache, keys in local_caches_keys.items():
+            local_cache.invalidate(keys)
+
+    def _build_local_caches_keys(self, insts, keys, filters_names_map):
+        local_caches_keys = defaultdict(set)
+        keys = list(keys)
+
+        for inst in insts:
+            if type(inst).__local_cache__ is not None:
+                keys.append((type(inst), inst.get_key()))
+                inst_old_redis_key = getattr(inst, 'old_redis_key', None)
+                if inst_old_redis_key is not None:
+                    keys.append((type(inst), inst_old_redis_key))
+
+        for model, inst_redis_key in keys:
+            if model.__local_cache__ is None:
+                continue
+
+            for filters_names in filters_names_map.get(model, []):
+                model_redis_key = type(model).get_key(model, filters_names)
+                local_caches_keys[model.__local_cache__].add((model_redis_key, inst_redis_key))
+
+        return local_caches_keys
+
+    def _get_filters_names_map(self, models):
+        models = [model for model in models if model.__use_redis__]
+        if not models:
+            return {}
 
-    def _exec_hdel(self, insts):
+        pipeline = self.redis_bind.pipeline(transaction=False)
+        for model in models:
+            pipeline.smembers(model.get_filters_names_key())
+
+        filters_names_sets = pipeline.execute()
+        self.redis_commit_stats['round_trips'] += 1
+        self.redis_commit_stats['commands'] += len(models)
+
+        return {model: [filters_names.decode() for filters_names in filters_names_set]
+                for model, filters_names_set in zip(models, filters_names_sets)}
+
+    def _exec_hdel(self, pipeline, keys, filters_names_map):
         models_keys_insts_keys_map = defaultdict(set)
 
-        for inst in insts:
-            model = type(inst)
+        for model, inst_redis_key in keys:
             if not model.__use_redis__:
                 continue
 
-            filters_names_set = self._get_filters_names_set(inst)
-            for filters_names in filters_names_set:
-                model_redis_key = type(model).get_key(model, filters_names.decode())
-                inst_redis_key = inst.get_key()
-                models_keys_insts_keys_map[model_redis_key].add(inst_redis_key)
-
-        for model_key, insts_keys in models_keys_insts_keys_map.items():
-            self.redis_bind.hdel(model_key, *insts_keys)
+            for filters_names in filters_names_map.get(model, []):
+                model_redis_key = type(model).get_key(model, filters_names)
+                models_keys_insts_keys_map[(model, model_redis_key)].add(inst_redis_key)
 
-    def _get_filters_names_set(self, inst):
-        filters_names_key = type(inst).get_filters_names_key()
-        return self.redis_bind.smembers(filters_names_key)
+        return sum(model.queue_redis_delete(pipeline, model_key, insts_keys)
+                   for (model, model_key), insts_keys in models_keys_insts_keys_map.items())
 
-    def _exec_hmset(self, insts):
+    def _exec_hmset(self, pipeline, insts, filters_names_map):
         models_keys_insts_keys_insts_map = defaultdict(dict)
         models_keys_insts_keys_map = defaultdict(set)
+        serializers = {}
 
         for inst in insts:
             model = type(inst)
             if not model.__use_redis__:
                 continue
 
-            filters_names_set = self._get_filters_names_set(inst)
-            for filters_names in filters_names_set:
-                model_redis_key = type(model).get_key(model, filters_names.decode())
+            for filters_names in filters_names_map.get(model, []):
+                model_redis_key = type(model).get_key(model, filters_names)
                 inst_redis_key = inst.get_key()
 
                 inst_old_redis_key = getattr(inst, 'old_redis_key', None)
                 if inst_old_redis_key is not None and inst_old_redis_key != inst_redis_key:
-                    models_keys_insts_keys_map[model_redis_key].add(inst_old_redis_key)
+                    models_keys_insts_keys_map[(model, model_redis_key)].add(inst_old_redis_key)
+
+                serializer = serializers.get(model_redis_key)
+                if serializer is None:
+                    todict_schema = model.get_todict_schema(filters_names)
+                    serializer = serializers[model_redis_key] = \
+                        model.get_todict_serializer(todict_schema)
+
+                models_keys_insts_keys_insts_map[(model, model_redis_key)][inst_redis_key] = \
+                    model.dumps_redis_obj(serializer(inst))
+
+        commands = 0
 
-                models_keys_insts_keys_insts_map[model_redis_key][inst_redis_key] = msgpack.dumps(inst.todict())
+        for (model, model_key), insts_keys_insts_map in \
+                models_keys_insts_keys_insts_map.items():
+            commands += model.queue_redis_set(pipeline, model_key, insts_keys_insts_map)
 
-        for model_key, insts_keys_insts_map in models_keys_insts_keys_insts_map.items():
-            self.redis_bind.hmset(model_key, insts_keys_insts_map)
+        for (model, model_key), insts_keys in models_keys_insts_keys_map.items():
+            commands += model.queue_redis_delete(pipeline, model_key, insts_keys)
 
-        for model_key, insts_keys in models_keys_insts_keys_map.items():
-            self.redis_bind.hdel(model_key, *insts_keys)
+        return commands
 
     def mark_for_hdel(self, inst):
         self._insts_to_hdel.add(inst)
@@ -125,10 +255,34 @@ class _SessionBase(SessionSA):
     def mark_for_hmset(self, inst):
         self._insts_to_hmset.add(inst)
 
+    def mark_for_hmset_all(self, insts):
+        self._insts_to_hmset.update(insts)
+
+    def mark_for_not_found_hdel(self, inst):
+        self._insts_to_not_found_hdel.add(inst)
+
+    def mark_for_not_found_hdel_all(self, insts):
+        self._insts_to_not_found_hdel.update(insts)
+
 
 Session = sessionmaker(class_=_SessionBase)
 
 
+def get_identity_ids(inst):
+    state = inspect(inst)
+    if state.identity is None:
+        return None
+
+    mapper = state.mapper
+    return {mapper.get_property_by_column(column).key: value
+            for column, value in zip(mapper.primary_key, state.identity)}
+
+
+def get_identity_key(inst):
+    ids = get_identity_ids(inst)
+    return inst.get_key() if ids is None else type(inst).get_instance_key(ids)
+
+
 @event.listens_for(Session, 'persistent_to_deleted')
 def deleted_from_database(session, instance):
     if session.redis_bind is not None and instance is not None:
@@ -139,3 +293,6 @@ def deleted_from_database(session, instance):
 def added_to_database(session, instance):
     if session.redis_bind is not None and instance is not None:
         session.mark_for_hmset(instance)
+
+        if type(instance).__not_found_ttl__ is not None:
+            session.mark_for_not_found_hdel(instance)
@@ -0,0 +1,170 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.mixins import LoggerMixin
+from threading import Event, Lock
+from uuid import uuid4
+import time
+
+
+class _Flight(object):
+
+    def __init__(self, model_redis_key):
+        self.model_redis_key = model_redis_key
+        self.token = uuid4().hex.encode()
+        self.leading = []
+        self.waiting = []
+        self.local_keys = []
+        self.locked_keys = []
+        self.remote_keys = []
+        self.events = []
+        self.ended_keys = set()
+
+
+class SingleFlight(LoggerMixin):
+
+    def __init__(self, redis_lock=False, lock_timeout=5, wait_timeout=1, poll_interval=0.01):
+        self.redis_lock = redis_lock
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._flights = {}
+        self._lock = Lock()
+        self._leads = 0
+        self._local_waits = 0
+        self._remote_waits = 0
+        self._wait_timeouts = 0
+        self._build_logger()
+
+    def begin(self, redis_bind, model_redis_key, keys):
+        flight = _Flight(model_redis_key)
+
+        with self._lock:
+            for key in keys:
+                flight_key = (model_redis_key, key)
+                event = self._flights.get(flight_key)
+
+                if event is None:
+                    self._flights[flight_key] = Event()
+                    flight.local_keys.append(key)
+                else:
+                    flight.waiting.append(key)
+                    flight.events.append(event)
+                    self._local_waits += 1
+
+        if self.redis_lock and flight.local_keys:
+            pipeline = redis_bind.pipeline(transaction=False)
+            for key in flight.local_keys:
+                pipeline.set(self._build_lock_key(model_redis_key, key), flight.token,
+                             nx=True, px=int(self.lock_timeout * 1000))
+
+            for key, locked in zip(flight.local_keys, pipeline.execute()):
+                if locked:
+                    flight.locked_keys.append(key)
+                else:
+                    flight.remote_keys.append(key)
+
+            flight.leading = flight.locked_keys
+            flight.waiting.extend(flight.remote_keys)
+        else:
+            flight.leading = flight.local_keys
+
+        with self._lock:
+            self._leads += len(flight.leading)
+            self._remote_waits += len(flight.remote_keys)
+
+        return flight
+
+    def wait_remote(self, redis_bind, flight):
+        self.end(redis_bind, flight, flight.leading)
+        keys = flight.remote_keys
+        deadline = time.time() + self.wait_timeout
+
+        while keys:
+            pipeline = redis_bind.pipeline(transaction=False)
+            for key in keys:
+                pipeline.exists(self._build_lock_key(flight.model_redis_key, key))
+
+            keys = [key for key, exists in zip(keys, pipeline.execute()) if exists]
+            if not keys:
+                break
+
+            if time.time() >= deadline:
+                with self._lock:
+                    self._wait_timeouts += 1
+                break
+
+            time.sleep(self.poll_interval)
+
+    def end(self, redis_bind, flight, keys=None):
+        if keys is None:
+            keys = flight.local_keys
+
+        keys = [key for key in keys if key not in flight.ended_keys]
+        flight.ended_keys.update(keys)
+        locked_keys = set(flight.locked_keys).intersection(keys)
+
+        try:
+            if locked_keys:
+                self._delete_locks(redis_bind, flight, locked_keys)
+
+        finally:
+            with self._lock:
+                for key in keys:
+                    self._flights.pop((flight.model_redis_key, key)).set()
+
+    def _delete_locks(self, redis_bind, flight, keys):
+        locks_keys = [self._build_lock_key(flight.model_redis_key, key) for key in keys]
+
+        def delete_owned_locks(pipeline):
+            owned_locks_keys = [
+                lock_key for lock_key, token in zip(locks_keys, pipeline.mget(locks_keys))
+                if token == flight.token]
+            pipeline.multi()
+
+            if owned_locks_keys:
+                pipeline.delete(*owned_locks_keys)
+
+        redis_bind.transaction(delete_owned_locks, *locks_keys)
+
+    def wait_local(self, flight):
+        deadline = time.time() + self.wait_timeout
+
+        for event in flight.events:
+            if not event.wait(max(deadline - time.time(), 0)):
+                with self._lock:
+                    self._wait_timeouts += 1
+                break
+
+    def _build_lock_key(self, model_redis_key, key):
+        return b':'.join((model_redis_key.encode(), key, b'lock'))
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'leads': self._leads,
+                'local_waits': self._local_waits,
+                'remote_waits': self._remote_waits,
+                'wait_timeouts': self._wait_timeouts
+            }
@@ -28,25 +28,38 @@ from sqlalchemy.ext.declarative.clsregistry import _class_resolver
 from sqlalchemy.orm.properties import RelationshipProperty, ColumnProperty
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 from sqlalchemy.orm.collections import InstrumentedList
-from sqlalchemy import or_, and_
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm import load_only, lazyload, make_transient_to_detached
+from sqlalchemy import orm
+from sqlalchemy import or_, and_, inspect, tuple_, false
 from copy import deepcopy
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from importlib import import_module
 from re import match as re_match, sub as re_sub
 from glob import glob
+from keyword import iskeyword
 
 from falconswagger.exceptions import ModelBaseError
 from falconswagger.models.orm.redis_base import ModelRedisBaseMeta, ModelRedisBase
+from falconswagger.models.orm.session import get_identity_ids
 from falconswagger.models.logger import ModelLoggerMetaMixin
 from falconswagger.models.http import ModelHttpMetaMixin
 
 import json
 import msgpack
 import os.path
+import time
+
+
+_NOT_FOUND = object()
 
 
 class ModelSQLAlchemyRedisInitMetaMixin(
     DeclarativeMeta, ModelRedisBaseMeta):
+    CACHE_POLICIES = ('refresh', 'invalidate')
+    CACHE_LAYOUTS = ('hash', 'keys')
+    CACHE_ENCODINGS = ('msgpack', 'json')
+    NOT_FOUND_MARKER = b'\xc1'
 
     def __init__(cls, name, bases_classes, attributes):
         DeclarativeMeta.__init__(cls, name, bases_classes, attributes)
@@ -65,19 +78,50 @@ class ModelSQLAlchemyRedisInitMetaMixin(
                     "'{}' class must inherit from '{}'".format(
                         name, cls.__baseclass_name__))
 
-            cls.__backrefs__ = set()
             cls.__relationships__ = dict()
             cls.__columns__ = set(cls.__table__.c)
             cls.__key__ = str(cls.__table__.name)
             cls.__use_redis__ = getattr(cls, '__use_redis__', True)
+            cls.__cache_policy__ = getattr(cls, '__cache_policy__', 'refresh')
+            cls.__local_cache__ = getattr(cls, '__local_cache__', None)
+            cls.__single_flight__ = getattr(cls, '__single_flight__', None)
+            cls.__not_found_ttl__ = getattr(cls, '__not_found_ttl__', None)
+            cls.__cache_layout__ = getattr(cls, '__cache_layout__', 'hash')
+            cls.__cache_ttl__ = getattr(cls, '__cache_ttl__', None)
+            cls.__cache_encoding__ = getattr(cls, '__cache_encoding__', 'msgpack')
+            cls.__blob_codec__ = getattr(cls, '__blob_codec__', None)
+
+            if cls.__cache_policy__ not in cls.CACHE_POLICIES:
+                raise ModelBaseError(
+                    "invalid cache policy '{}', must be one of: {}".format(
+                        cls.__cache_policy__, ', '.join(cls.CACHE_POLICIES)))
+
+            if cls.__cache_layout__ not in cls.CACHE_LAYOUTS:
+                raise ModelBaseError(
+                    "invalid cache layout '{}', must be one of: {}".format(
+                        cls.__cache_layout__, ', '.join(cls.CACHE_LAYOUTS)))
+
+            if cls.__cache_ttl__ is not None and cls.__cache_layout__ != 'keys':
+                raise ModelBaseError(
+                    "cache ttl requires the 'keys' cache layout, got '{}'".format(
+                        cls.__cache_layout__))
+
+            if cls.__cache_encoding__ not in cls.CACHE_ENCODINGS:
+                raise ModelBaseError(
+                    "invalid cache encoding '{}', must be one of: {}".format(
+                        cls.__cache_encoding__, ', '.join(cls.CACHE_ENCODINGS)))
+
             cls.__todict_schema__ = {}
+            cls.__todict_serializers__ = {}
             base_class.__all_models__[cls.__key__] = cls
-            cls._build_backrefs_for_all_models(base_class.__all_models__.values())
+            base_class.__all_backrefs__.clear()
+            cls._build_relationships()
             ModelRedisBaseMeta.__init__(cls, name, bases_classes, attributes)
 
         else:
             cls.__baseclass_name__= name
             cls.__all_models__ = dict()
+            cls.__all_backrefs__ = dict()
 
     def _build_primary_keys(cls):
         primaries_keys = {}
@@ -96,18 +140,34 @@ class ModelSQLAlchemyRedisInitMetaMixin(
                 and [col for col in attr.prop.columns if col.primary_key]:
             return attr
 
-    def _build_backrefs_for_all_models(cls, all_models):
-        all_relationships = set()
+    @property
+    def __backrefs__(cls):
+        if not cls.__all_backrefs__:
+            cls.build_backrefs()
+
+        return cls.__all_backrefs__.get(cls, set())
+
+    def build_backrefs(cls):
+        if cls.__all_backrefs__:
+            return
+
+        all_models = list(cls.__all_models__.values())
+        all_backrefs = {model: set() for model in all_models}
+        models_by_name = {}
 
         for model in all_models:
-            model._build_relationships()
-            all_relationships.update(model.__relationships__.values())
+            models_by_name.setdefault(model.__name__, model)
 
         for model in all_models:
-            for relationship in all_relationships:
-                if model != cls.get_model_from_rel(relationship, all_models, parent=True) and \
-                        model == cls.get_model_from_rel(relationship, all_models):
-                    model.__backrefs__.add(relationship)
+            for relationship in model.__relationships__.values():
+                argument = relationship.prop.argument
+                rel_model = models_by_name.get(argument.arg) \
+                    if isinstance(argument, _class_resolver) else argument
+
+                if rel_model is not model and rel_model in all_backrefs:
+                    all_backrefs[rel_model].add(relationship)
+
+        cls.__all_backrefs__.update(all_backrefs)
 
     def _build_relationships(cls):
         if cls.__relationships__:
@@ -145,25 +205,163 @@ class ModelSQLAlchemyRedisInitMetaMixin(
 
 
 class ModelSQLAlchemyRedisOperationsMetaMixin(type):
+    IDS_CHUNKS = 1000
 
     def insert(cls, session, objs, commit=True, todict=True, **kwargs):
         input_ = deepcopy(objs)
         objs = cls._to_list(objs)
-        new_insts = set()
 
-        for obj in objs:
-            instance = cls(session, input_, **obj)
-            new_insts.add(instance)
+        if cls._is_flat(objs):
+            new_insts = cls._bulk_insert(session, objs)
+        else:
+            # attribution made just to keep the references on session identity_map
+            prefetched = cls._prefetch_relationships(session, objs)
+            new_insts = set()
 
-        session.add_all(new_insts)
+            for obj in objs:
+                instance = cls(session, input_, **obj)
+                new_insts.add(instance)
+
+            session.add_all(new_insts)
 
         if commit:
             session.commit()
 
         return cls._build_todict_list(new_insts) if todict else list(new_insts)
 
-    def _build_todict_list(cls, insts):
-        return [inst.todict() for inst in insts]
+    def _is_flat(cls, objs):
+        base = _ModelSQLAlchemyRedisBase
+        if cls.__mapper__.class_manager.original_init is not base.__init__ \
+                or cls._setattr is not base._setattr:
+            return False
+
+        columns_names = {prop.key for prop in cls.__mapper__.column_attrs}
+        return all(isinstance(obj, dict) and columns_names.issuperset(obj) for obj in objs)
+
+    def _bulk_insert(cls, session, objs):
+        new_instance = cls.__mapper__.class_manager.new_instance
+        new_insts = []
+
+        for obj in objs:
+            instance = new_instance()
+            for attr_name, value in obj.items():
+                setattr(instance, attr_name, value)
+
+            instance._validate()
+            new_insts.append(instance)
+
+        has_all_ids = all(obj.get(id_name) is not None
+                          for obj in objs for id_name in cls.primaries_keys)
+        session.bulk_save_objects(new_insts, return_defaults=not has_all_ids)
+
+        for instance in new_insts:
+            if inspect(instance).key is None:
+                make_transient_to_detached(instance)
+
+        session.add_all(new_insts)
+
+        if session.redis_bind is not None:
+            session.mark_for_hmset_all(new_insts)
+
+            if cls.__not_found_ttl__ is not None:
+                session.mark_for_not_found_hdel_all(new_insts)
+
+        return new_insts
+
+    def _build_todict_list(cls, insts, schema=None):
+        serializer = cls.get_todict_serializer(schema)
+        return [serializer(inst) if type(inst) is cls else inst.todict(schema) for inst in insts]
+
+    def get_todict_serializer(cls, schema=None):
+        if cls.todict is not _ModelSQLAlchemyRedisBase.todict:
+            return lambda inst: inst.todict(schema)
+
+        return cls._get_compiled_todict(schema)
+
+    def _get_compiled_todict(cls, schema=None):
+        if schema is None:
+            schema = cls.__todict_schema__
+
+        schema_key = cls._build_todict_schema_key(schema)
+        serializer = cls.__todict_serializers__.get(schema_key)
+
+        if serializer is None:
+            serializer = cls._build_todict_serializer(schema)
+            cls.__todict_serializers__[schema_key] = serializer
+
+        return serializer
+
+    def _build_todict_schema_key(cls, schema):
+        return frozenset(
+            (name, cls._build_todict_schema_key(value) if isinstance(value, dict) else value)
+            for name, value in schema.items())
+
+    def _build_todict_serializer(cls, schema):
+        base = _ModelSQLAlchemyRedisBase
+        if any(getattr(cls, method_name) is not getattr(base, method_name)
+               for method_name in ('_todict', '_todict_columns',
+                                   '_todict_relationships', '_attribute_in_schema')):
+            return cls._build_reflective_todict_serializer(schema)
+
+        namespace = {'_schema': schema}
+        lines = ['def serializer(inst):', '    dict_inst = {}']
+
+        for col in cls.__columns__:
+            col_name = str(col.name)
+            if schema.get(col_name, True):
+                lines.append('    dict_inst[{!r}] = {}'.format(
+                    col_name, cls._build_todict_getattr_source(col_name)))
+
+        for i, (rel_name, relationship) in enumerate(cls.__relationships__.items()):
+            if not schema.get(rel_name, True):
+                continue
+
+            rel_schema = schema.get(rel_name)
+            rel_schema = rel_schema if isinstance(rel_schema, dict) else None
+            rel_serializer_name = '_rel_serializer_{}'.format(i)
+            namespace[rel_serializer_name] = cls._build_rel_todict_serializer(
+                cls.get_model_from_rel(relationship), rel_schema)
+
+            lines.append('    attr = {}'.format(cls._build_todict_getattr_source(rel_name)))
+            if relationship.prop.uselist is True:
+                lines.append('    dict_inst[{!r}] = [{}(rel) for rel in attr]'.format(
+                    rel_name, rel_serializer_name))
+            else:
+                lines.append('    dict_inst[{!r}] = None if attr is None else {}(attr)'.format(
+                    rel_name, rel_serializer_name))
+
+        if cls._format_output_json is not base._format_output_json:
+            lines.append('    inst._format_output_json(dict_inst, _schema)')
+
+        lines.append('    return dict_inst')
+        source = '\n'.join(lines)
+        exec(compile(source, '<{}_todict_serializer>'.format(cls.__key__), 'exec'), namespace)
+        return namespace['serializer']
+
+    def _build_todict_getattr_source(cls, attr_name):
+        if attr_name.isidentifier() and not iskeyword(attr_name):
+            return 'inst.{}'.format(attr_name)
+
+        return 'getattr(inst, {!r})'.format(attr_name)
+
+    def _build_reflective_todict_serializer(cls, schema):
+        def serializer(inst):
+            dict_inst = inst._todict(schema)
+            inst._format_output_json(dict_inst, schema)
+            return dict_inst
+
+        return serializer
+
+    def _build_rel_todict_serializer(cls, rel_model, schema):
+        # resolved on each call, the related model can be still not compiled
+        # and its __todict_schema__ can change after this serializer is built
+        def serializer(inst):
+            if type(inst) is not rel_model:
+                return inst.todict(schema)
+
+            return rel_model.get_todict_serializer(schema)(inst)
+
+        return serializer
 
     def get_ids_from_values(cls, values):
         cast = lambda id_name, value: getattr(cls, id_name).type.python_type(value) \
@@ -179,33 +377,163 @@ class ModelSQLAlchemyRedisOperationsMetaMixin(type):
             obj) for obj in objs] if not ids else cls._to_list(ids)
 
         insts = cls.get(session, ids, todict=False)
+        objs_by_ids = {}
+
+        for id_, obj in zip(ids, objs):
+            objs_by_ids.setdefault(cls._build_ids_tuple(id_), obj)
+
+        ids_keys = ids[0].keys() if ids else None
+        insts_objs = [
+            (inst, objs_by_ids[cls._build_ids_tuple(inst.get_ids_map(ids_keys))])
+            for inst in insts]
 
         for inst in insts:
             inst.old_redis_key = inst.get_key()
 
-        id_insts_zip = [(inst.get_ids_map(ids[0].keys()), inst) for inst in insts]
+        if cls._is_flat(objs) and not cls.__mapper__.validators \
+                and not cls._has_ids_changes(insts_objs):
+            cls._bulk_update(session, insts_objs)
+        else:
+            # attribution made just to keep the references on session identity_map
+            prefetched = cls._prefetch_relationships(session, objs)
 
-        for id_, inst in id_insts_zip:
-            inst.__init__(session, input_, **objs[ids.index(id_)])
+            for inst, obj in insts_objs:
+                inst.__init__(session, input_, **obj)
 
         if commit:
             session.commit()
 
         return cls._build_todict_list(insts) if todict else insts
 
+    def _prefetch_relationships(cls, session, objs):
+        rels_values = defaultdict(list)
+        prefetched = []
+
+        for obj in objs:
+            if not isinstance(obj, dict):
+                continue
+
+            for attr_name, values in obj.items():
+                relationship = cls.__relationships__.get(attr_name)
+                if relationship is None or values is None:
+                    continue
+
+                if relationship.prop.uselist is not True:
+                    values = [values]
+
+                rels_values[attr_name].extend(
+                    [value for value in values if isinstance(value, dict)])
+
+        for attr_name, values in rels_values.items():
+            rel_model = cls.get_model_from_rel(cls.__relationships__[attr_name])
+            ids = [rel_model.get_ids_from_values(value) for value in values]
+            prefetched.extend(rel_model._get_instances_by_ids(session, ids))
+            prefetched.extend(rel_model._prefetch_relationships(session, values))
+
+        return prefetched
+
+    def _get_instances_by_ids(cls, session, ids):
+        instances = {}
+        ids_to_query = []
+
+        for id_ in ids:
+            if None in id_.values():
+                continue
+
+            instance = cls._get_from_identity_map(session, id_)
+            if instance is None:
+                ids_to_query.append(id_)
+            else:
+                instances[cls._build_ids_tuple(id_)] = instance
+
+        if ids_to_query:
+            ids_keys = ids_to_query[0].keys()
+            for instance in cls._query_by_ids(cls._build_query(session), ids_to_query):
+                instances[cls._build_ids_tuple(instance.get_ids_map(ids_keys))] = instance
+
+        return [instances.get(cls._build_ids_tuple(id_)) for id_ in ids]
+
+    def _get_from_identity_map(cls, session, id_):
+        mapper = cls.__mapper__
+        primary_key = [id_.get(mapper.get_property_by_column(column).key)
+                       for column in mapper.primary_key]
+        instance = session.identity_map.get(mapper.identity_key_from_primary_key(primary_key))
+
+        if instance is not None and not inspect(instance).expired \
+                and instance not in session.deleted:
+            return instance
+
+    def _build_ids_tuple(cls, ids):
+        return tuple(sorted(ids.items()))
+
+    def _has_ids_changes(cls, insts_objs):
+        return any(obj[id_name] != getattr(inst, id_name)
+                   for inst, obj in insts_objs
+                   for id_name in cls.primaries_keys if id_name in obj)
+
+    def _bulk_update(cls, session, insts_objs):
+        mappings_groups = defaultdict(list)
+
+        for inst, obj in insts_objs:
+            for attr_name, value in obj.items():
+                set_committed_value(inst, attr_name, value)
+
+            inst._validate()
+            mapping = {attr_name: value for attr_name, value in obj.items()
+                       if attr_name not in cls.primaries_keys}
+
+            if mapping:
+                mapping.update(inst.get_ids_map())
+                mappings_groups[frozenset(mapping)].append(mapping)
+
+        for mappings in mappings_groups.values():
+            session.bulk_update_mappings(cls, mappings)
+
+        if session.redis_bind is not None:
+            session.mark_for_hmset_all([inst for inst, _ in insts_objs])
+
     def delete(cls, session, ids, commit=True, **kwargs):
         ids = cls._to_list(ids)
-        filters = cls.build_filters_by_ids(ids)
-        instances = cls._build_query(session).filter(filters).all()
-        [session.delete(inst) for inst in instances]
+        instances = cls._query_by_ids(cls._build_query(session), ids)
+        session.delete_all(instances)
 
         if commit:
             session.commit()
 
+    def get_related_many(cls, session, instances):
+        related = set()
+        if not instances or not cls.__backrefs__:
+            return related
+
+        ids = [get_identity_ids(inst) or inst.get_ids_map() for inst in instances]
+
+        for relationship in cls.__backrefs__:
+            rel_model = cls.get_model_from_rel(relationship, parent=True)
+            query = rel_model._build_query(session).join(relationship)
+            related.update(cls._query_by_ids(query, ids))
+
+        return related
+
     def build_filters_by_ids(cls, ids):
+        if not ids:
+            return false()
+
         if len(ids) == 1:
             return cls._get_obj_i_comparison(ids[0])
 
+        attrs_names = sorted(ids[0].keys())
+        keys = ids[0].keys()
+        if any(id_.keys() != keys or None in id_.values() for id_ in ids):
+            return cls._build_or_filters_by_ids(ids)
+
+        if len(attrs_names) == 1:
+            attr_name = attrs_names[0]
+            return getattr(cls, attr_name).in_([id_[attr_name] for id_ in ids])
+
+        attrs = tuple_(*[getattr(cls, attr_name) for attr_name in attrs_names])
+        return attrs.in_([tuple([id_[attr_name] for attr_name in attrs_names]) for id_ in ids])
+
+    def _build_or_filters_by_ids(cls, ids):
         or_clause_args = []
         for i in range(0, len(ids)):
             comparison = cls._get_obj_i_comparison(ids[i])
@@ -229,9 +557,12 @@ class ModelSQLAlchemyRedisOperationsMetaMixin(type):
     def _build_attribute_comparison(cls, attr_name, attributes):
         return getattr(cls, attr_name) == attributes[attr_name]
 
-    def get(cls, session, ids=None, limit=None, offset=None, todict=True, **kwargs):
+    def get(cls, session, ids=None, limit=None, offset=None, todict=True, fields=None, **kwargs):
         if ids is None:
-            query = cls._build_query(session, kwargs)
+            query = cls._build_query(session, kwargs, fields, todict)
+
+            if limit is not None or offset is not None:
+                query = query.order_by(*cls.primaries_keys.values())
 
             if limit is not None:
                 query = query.limit(limit)
@@ -239,17 +570,111 @@ class ModelSQLAlchemyRedisOperationsMetaMixin(type):
             if offset is not None:
                 query = query.offset(offset)
 
-            return cls._build_todict_list(query.all()) if todict else query.all()
+            if todict:
+                return cls._build_todict_list(query.all(), cls._build_fields_schema(fields))
+            else:
+                return query.all()
 
         if limit is not None and offset is not None:
             limit += offset
 
         ids = cls._to_list(ids)
-        return cls._get_many(session, ids[offset:limit], todict, kwargs)
+        return cls._get_many(session, ids[offset:limit], todict, kwargs, fields)
+
+    def get_json(cls, session, ids, limit=None, offset=None, fields=None, **kwargs):
+        if limit is not None and offset is not None:
+            limit += offset
 
-    def _build_query(cls, session, kwargs=None):
+        ids = cls._to_list(ids)
+        return cls._get_many(session, ids[offset:limit], True, kwargs, fields, raw=True)
+
+    def get_iter(cls, session, ids=None, limit=None, offset=None,
+                 todict=True, fields=None, **kwargs):
+        if ids is not None:
+            if limit is not None and offset is not None:
+                limit += offset
+
+            ids = cls._to_list(ids)[offset:limit]
+            for i in range(0, len(ids), cls.STREAM_CHUNKS):
+                yield from cls._get_many(
+                    session, ids[i:i+cls.STREAM_CHUNKS], todict, kwargs, fields)
+
+            return
+
+        schema = cls._build_fields_schema(fields)
+        last_ids = None
+        while limit is None or limit > 0:
+            chunk_size = cls.STREAM_CHUNKS if limit is None else min(limit, cls.STREAM_CHUNKS)
+            query = cls._build_keyset_query(session, kwargs, last_ids, fields, todict)
+
+            if last_ids is None and offset is not None:
+                query = query.offset(offset)
+
+            insts = query.limit(chunk_size).all()
+            yield from cls._build_todict_list(insts, schema) if todict else insts
+
+            if len(insts) < chunk_size:
+                break
+
+            if limit is not None:
+                limit -= len(insts)
+
+            last_ids = insts[-1].get_ids_map()
+
+    def get_page(cls, session, limit=None, cursor=None, todict=True, fields=None, **kwargs):
+        last_ids = None if cursor is None else cls._decode_ids_cursor(cursor)
+        query = cls._build_keyset_query(session, kwargs, last_ids, fields, todict)
+
+        if limit is not None:
+            query = query.limit(limit)
+
+        insts = query.all()
+        next_cursor = None
+
+        if limit is not None and insts and len(insts) == limit:
+            next_cursor = cls._encode_cursor(insts[-1].get_ids_map())
+
+        if todict:
+            insts = cls._build_todict_list(insts, cls._build_fields_schema(fields))
+
+        return insts, next_cursor
+
+    def _decode_ids_cursor(cls, cursor):
+        ids = cls._decode_cursor(cursor)
+        if not isinstance(ids, dict) or set(ids.keys()) != set(cls.primaries_keys.keys()):
+            raise ModelBaseError("invalid cursor '{}'".format(cursor))
+
+        return cls.get_ids_from_values(ids)
+
+    def _build_keyset_query(cls, session, kwargs, last_ids=None, fields=None, todict=False):
+        query = cls._build_query(session, kwargs, fields, todict)
+        query = query.order_by(*cls.primaries_keys.values())
+
+        if last_ids is not None:
+            query = query.filter(cls._build_keyset_filter(last_ids))
+
+        return query
+
+    def _build_keyset_filter(cls, ids):
+        or_clause_args = []
+        equal_clause_args = []
+
+        for id_name, attr in cls.primaries_keys.items():
+            comparison = and_(*equal_clause_args, attr > ids[id_name])
+            or_clause_args.append(comparison)
+            equal_clause_args.append(attr == ids[id_name])
+
+        return or_(*or_clause_args)
+
+    def _build_query(cls, session, kwargs=None, fields=None, todict=False):
         query = session.query(cls)
 
+        if fields:
+            query = query.options(*cls._build_fields_options(fields))
+
+        if todict:
+            query = query.options(*cls._build_todict_options(cls._build_fields_schema(fields)))
+
         if kwargs:
             for prop_name, value in kwargs.items():
                 if isinstance(value, dict):
@@ -285,38 +710,268 @@ class ModelSQLAlchemyRedisOperationsMetaMixin(type):
 
         return query, filters
 
-    def _get_many(cls, session, ids, todict, kwargs):
+    def _get_many(cls, session, ids, todict, kwargs, fields=None, raw=False):
+        schema = cls._build_fields_schema(fields)
+
         if not todict or session.redis_bind is None:
-            filters = cls.build_filters_by_ids(ids)
-            insts = cls._build_query(session, kwargs).filter(filters).all()
+            insts = cls._query_by_ids(cls._build_query(session, kwargs, fields, todict), ids)
 
             if todict:
-                return [inst.todict() for inst in insts]
+                objs = cls._build_todict_list(insts, schema)
+                return cls._build_json_list(objs) if raw else objs
             else:
                 return insts
 
-        model_redis_key = type(cls).get_key(cls, '_'.join(kwargs.keys()))
+        filters_names = cls._build_filters_names(kwargs, fields)
+        model_redis_key = type(cls).get_key(cls, filters_names)
         ids_redis_keys = [cls.get_instance_key(id_, id_.keys()) for id_ in ids]
-        objs = session.redis_bind.hmget(model_redis_key, ids_redis_keys)
-        ids_not_cached = [id_ for i, (id_, obj) in enumerate(zip(ids, objs)) if obj is None]
-        objs = [msgpack.loads(obj, encoding='utf-8') for obj in objs if obj is not None]
+        local_cache = cls.__local_cache__
+        objs = [None] * len(ids) if local_cache is None \
+            else local_cache.get_many(model_redis_key, ids_redis_keys, raw)
+        indexes_not_cached = [i for i, obj in enumerate(objs) if obj is None]
+        indexes_to_cache = []
+        ids_not_cached = {}
+
+        if indexes_not_cached:
+            redis_objs = cls.get_redis_objs(
+                session.redis_bind, model_redis_key,
+                [ids_redis_keys[i] for i in indexes_not_cached])
+
+            for i, obj in zip(indexes_not_cached, redis_objs):
+                obj = cls._loads_redis_obj(obj, raw)
+                if obj is None:
+                    ids_not_cached[ids_redis_keys[i]] = ids[i]
+                elif obj is not _NOT_FOUND:
+                    objs[i] = obj
+                    indexes_to_cache.append(i)
 
         if ids_not_cached:
-            session.redis_bind.sadd(cls.get_filters_names_key(), model_redis_key)
-            filters = cls.build_filters_by_ids(ids_not_cached)
-            instances = cls._build_query(session).filter(filters).all()
-            if instances:
-                items_to_set = {
-                    inst.get_key(): msgpack.dumps(inst.todict()) for inst in instances}
-                session.redis_bind.hmset(model_redis_key, items_to_set)
-
-                for inst in instances:
-                    inst_ids = inst.get_ids_map(ids[0].keys())
-                    index = ids_not_cached.index(inst_ids)
-                    objs.insert(index, inst.todict())
+            loaded_objs = cls._load_not_cached(
+                session, model_redis_key, filters_names, fields, schema,
+                list(ids_not_cached.values()), list(ids_not_cached.keys()))
+
+            for i, obj in enumerate(objs):
+                if obj is None and ids_redis_keys[i] in loaded_objs:
+                    objs[i] = loaded_objs[ids_redis_keys[i]]
+                    indexes_to_cache.append(i)
+
+        if raw:
+            for i in indexes_to_cache:
+                if not isinstance(objs[i], bytes):
+                    objs[i] = json.dumps(objs[i]).encode()
+
+        if local_cache is not None and indexes_to_cache:
+            local_cache.set_many(
+                model_redis_key, {ids_redis_keys[i]: objs[i] for i in indexes_to_cache}, raw)
+
+        return [obj for obj in objs if obj is not None]
+
+    def _build_json_list(cls, objs):
+        return [obj if isinstance(obj, bytes) else json.dumps(obj).encode() for obj in objs]
+
+    def _load_not_cached(cls, session, model_redis_key, filters_names,
+                         fields, schema, ids, keys):
+        single_flight = cls.__single_flight__
+        if single_flight is None:
+            return cls._load_many(session, model_redis_key, filters_names, fields, schema, ids)
+
+        flight = single_flight.begin(session.redis_bind, model_redis_key, keys)
+        try:
+            leading = set(flight.leading)
+            objs = cls._load_many(
+                session, model_redis_key, filters_names, fields, schema,
+                [id_ for id_, key in zip(ids, keys) if key in leading])
+            single_flight.wait_remote(session.redis_bind, flight)
+        finally:
+            single_flight.end(session.redis_bind, flight)
+
+        if flight.waiting:
+            single_flight.wait_local(flight)
+            ids_map = dict(zip(keys, ids))
+            ids_not_loaded = []
+            redis_objs = cls.get_redis_objs(session.redis_bind, model_redis_key, flight.waiting)
+
+            for key, obj in zip(flight.waiting, redis_objs):
+                obj = cls._loads_redis_obj(obj)
+                if obj is None:
+                    ids_not_loaded.append(ids_map[key])
+                elif obj is not _NOT_FOUND:
+                    objs[key] = obj
+
+            if ids_not_loaded:
+                objs.update(cls._load_many(
+                    session, model_redis_key, filters_names, fields, schema, ids_not_loaded))
+
+        return objs
+
+    def _load_many(cls, session, model_redis_key, filters_names, fields, schema, ids):
+        if not ids:
+            return {}
+
+        session.redis_bind.sadd(cls.get_filters_names_key(), filters_names)
+        query = cls._build_query(session, fields=fields, todict=True)
+        instances = cls._query_by_ids(query, ids)
+        dicts = cls._build_todict_list(instances, schema)
+        ids_names = ids[0].keys()
+        objs = {inst.get_key(ids_names): dict_inst for inst, dict_inst in zip(instances, dicts)}
+        items_to_set = {inst.get_key(): cls.dumps_redis_obj(dict_inst)
+                        for inst, dict_inst in zip(instances, dicts)}
+
+        if cls.__not_found_ttl__ is not None:
+            not_found_marker = cls._build_not_found_marker()
+            for id_ in ids:
+                if id_.keys() != cls.primaries_keys.keys():
+                    continue
+
+                key = cls.get_instance_key(id_, id_.keys())
+                if key not in objs:
+                    items_to_set[key] = not_found_marker
+
+        if items_to_set:
+            cls._set_redis_objs(session.redis_bind, model_redis_key, items_to_set)
 
         return objs
 
+    def get_redis_objs(cls, redis_bind, model_redis_key, keys):
+        if cls.__cache_layout__ == 'hash':
+            return redis_bind.hmget(model_redis_key, keys)
+
+        return redis_bind.mget([cls.get_redis_instance_key(model_redis_key, key)
+                                for key in keys])
+
+    def _set_redis_objs(cls, redis_bind, model_redis_key, objs):
+        if cls.__cache_layout__ == 'hash':
+            redis_bind.hmset(model_redis_key, objs)
+        else:
+            pipeline = redis_bind.pipeline(transaction=False)
+            cls.queue_redis_set(pipeline, model_redis_key, objs)
+            pipeline.execute()
+
+    def queue_redis_set(cls, pipeline, model_redis_key, objs):
+        if cls.__cache_layout__ == 'hash':
+            pipeline.hmset(model_redis_key, objs)
+            return 1
+
+        for key, obj in objs.items():
+            pipeline.set(cls.get_redis_instance_key(model_redis_key, key),
+                         obj, ex=cls.__cache_ttl__)
+
+        return len(objs)
+
+    def queue_redis_delete(cls, pipeline, model_redis_key, keys):
+        if cls.__cache_layout__ == 'hash':
+            pipeline.hdel(model_redis_key, *keys)
+        else:
+            pipeline.delete(*[cls.get_redis_instance_key(model_redis_key, key) for key in keys])
+
+        return 1
+
+    def get_redis_instance_key(cls, model_redis_key, key):
+        return b':'.join((model_redis_key.encode(), key))
+
+    def _build_not_found_marker(cls):
+        expires_at = time.time() + cls.__not_found_ttl__
+        return cls.NOT_FOUND_MARKER + repr(expires_at).encode()
+
+    def dumps_redis_obj(cls, obj):
+        if cls.__cache_encoding__ == 'json':
+            blob = json.dumps(obj).encode()
+        else:
+            blob = msgpack.dumps(obj)
+
+        return blob if cls.__blob_codec__ is None else cls.__blob_codec__.compress(blob)
+
+    def _loads_redis_obj(cls, obj, raw=False):
+        if obj is None:
+            return None
+
+        if obj[:1] == cls.NOT_FOUND_MARKER:
+            return _NOT_FOUND if float(obj[1:]) > time.time() else None
+
+        if cls.__blob_codec__ is not None:
+            obj = cls.__blob_codec__.decompress(obj)
+
+        if cls.__cache_encoding__ == 'json':
+            return obj if raw else json.loads(obj.decode())
+
+        return msgpack.loads(obj, encoding='utf-8')
+
+    def _query_by_ids(cls, query, ids):
+        if len(ids) <= cls.IDS_CHUNKS:
+            return query.filter(cls.build_filters_by_ids(ids)).all()
+
+        instances = []
+        for i in range(0, len(ids), cls.IDS_CHUNKS):
+            filters = cls.build_filters_by_ids(ids[i:i+cls.IDS_CHUNKS])
+            instances.extend(query.filter(filters).all())
+
+        return instances
+
+    def _build_filters_names(cls, kwargs, fields=None):
+        filters_names = '_'.join(kwargs.keys())
+
+        if fields:
+            filters_names = '{}:fields:{}'.format(filters_names, ','.join(sorted(fields)))
+
+        return filters_names
+
+    def get_todict_schema(cls, filters_names=None):
+        if filters_names and ':fields:' in filters_names:
+            return cls._build_fields_schema(filters_names.split(':fields:')[1].split(','))
+
+        return cls.__todict_schema__
+
+    def _build_fields_schema(cls, fields):
+        if not fields:
+            return None
+
+        attributes_names = set([str(col.name) for col in cls.__columns__])
+        attributes_names.update(cls.__relationships__.keys())
+
+        for field in fields:
+            if field not in attributes_names:
+                raise ModelBaseError("invalid field '{}'".format(field), input_=fields)
+
+        return {attr_name: attr_name in fields for attr_name in attributes_names}
+
+    def _build_fields_options(cls, fields):
+        columns_names = set(cls.primaries_keys.keys())
+        options = []
+
+        for rel_name, relationship in cls.__relationships__.items():
+            if rel_name in fields:
+                columns_names.update([str(col.name) for col in relationship.prop.local_columns])
+            else:
+                options.append(lazyload(relationship))
+
+        columns_names.update([field for field in fields if field not in cls.__relationships__])
+        options.append(load_only(*columns_names))
+        return options
+
+    def _build_todict_options(cls, schema=None, parent_loader=None, models=()):
+        if schema is None:
+            schema = cls.__todict_schema__
+
+        models = models + (cls,)
+        options = []
+
+        for rel_name, relationship in cls.__relationships__.items():
+            rel_model = cls.get_model_from_rel(relationship)
+            if not schema.get(rel_name, True) or rel_model in models:
+                continue
+
+            rel_schema = schema.get(rel_name)
+            rel_schema = rel_schema if isinstance(rel_schema, dict) else None
+            loader_name = 'subqueryload' if relationship.prop.uselist is True else 'joinedload'
+            loader = getattr(orm, loader_name) if parent_loader is None \
+                else getattr(parent_loader, loader_name)
+            loader = loader(relationship)
+
+            rel_options = rel_model._build_todict_options(rel_schema, loader, models)
+            options.extend(rel_options if rel_options else [loader])
+
+        return options
+
 
 class ModelSQLAlchemyRedisMeta(
         ModelSQLAlchemyRedisInitMetaMixin,
@@ -365,16 +1020,7 @@ class _ModelSQLAlchemyRedisBase(ModelRedisBase):
         if not ids_to_get:
             return []
 
-        # attribution made just to keep the reference on session identity_map
-        instances = rel_model.get(session, ids_to_get, todict=False)
-
-        rels_ints = []
-        for rel_ids in ids_to_get:
-            rel_inst = rel_model.get(session, rel_ids, todict=False)
-            rel_inst = rel_inst[0] if rel_inst else None
-            rels_ints.append(rel_inst)
-
-        return rels_ints
+        return rel_model._get_instances_by_ids(session, ids_to_get)
 
     def _get_ids_from_rels_values(self, rel_model, rels_values):
         ids = []
@@ -459,31 +1105,10 @@ class _ModelSQLAlchemyRedisBase(ModelRedisBase):
         pass
 
     def get_related(self, session):
-        related = set()
-        cls = type(self)
-        for relationship in cls.__backrefs__:
-            related_model_insts = self._get_related_model_insts(
-                session, relationship, parent=True)
-            related.update(related_model_insts)
-
-        return related
-
-    def _get_related_model_insts(self, session, relationship, parent=False):
-        cls = type(self)
-        rel_model = cls.get_model_from_rel(relationship, parent=parent)
-
-        filters = cls.build_filters_by_ids([self.get_ids_map()])
-        result = set(rel_model._build_query(session).join(
-            relationship).filter(filters).all())
-        return result
+        return type(self).get_related_many(session, [self])
 
     def todict(self, schema=None):
-        if schema is None:
-            schema = type(self).__todict_schema__
-
-        dict_inst = self._todict(schema)
-        self._format_output_json(dict_inst, schema)
-        return dict_inst
+        return type(self)._get_compiled_todict(schema)(self)
 
     def _todict(self, schema=None):
         dict_inst = dict()
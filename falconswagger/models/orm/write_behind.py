@@ -0,0 +1,207 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.mixins import LoggerMixin
+from falconswagger.models.orm.session import Session, get_identity_ids, get_identity_key
+from collections import OrderedDict, defaultdict
+from threading import Condition, Lock, Thread
+import atexit
+import time
+
+
+class RedisWriteBehind(LoggerMixin):
+
+    def __init__(self, bind, redis_bind, session_class=Session,
+                 max_staleness=1.0, max_batch_size=1000):
+        self.bind = bind
+        self.redis_bind = redis_bind
+        self.session_class = session_class
+        self.max_staleness = max_staleness
+        self.max_batch_size = max_batch_size
+        self._pending = OrderedDict()
+        self._pending_since = None
+        self._condition = Condition()
+        self._flush_lock = Lock()
+        self._thread = None
+        self._is_shutdown = False
+        self._queued_items = 0
+        self._coalesced_items = 0
+        self._flushes = 0
+        self._refreshed_items = 0
+        self._deleted_items = 0
+        self._errors = 0
+        self._max_lag = 0.0
+        self._build_logger()
+
+    def start(self):
+        with self._condition:
+            self._start_thread()
+
+        return self
+
+    def _start_thread(self):
+        if self._thread is None and not self._is_shutdown:
+            self._thread = Thread(target=self._run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def put(self, insts_to_hdel, insts_to_hmset):
+        items = [((type(inst), get_identity_key(inst)), None) for inst in insts_to_hdel]
+
+        for inst in insts_to_hmset.difference(insts_to_hdel):
+            ids = get_identity_ids(inst)
+            if ids is None:
+                continue
+
+            model = type(inst)
+            inst_redis_key = model.get_instance_key(ids)
+            inst_old_redis_key = getattr(inst, 'old_redis_key', None)
+
+            if inst_old_redis_key is not None and inst_old_redis_key != inst_redis_key:
+                items.append(((model, inst_old_redis_key), None))
+
+            items.append(((model, inst_redis_key), ids))
+
+        if not items:
+            return
+
+        with self._condition:
+            for item_key, ids in items:
+                if item_key in self._pending:
+                    self._coalesced_items += 1
+                    del self._pending[item_key]
+
+                self._pending[item_key] = ids
+
+            if self._pending_since is None:
+                self._pending_since = time.time()
+
+            self._queued_items += len(items)
+            is_shutdown = self._is_shutdown
+            self._start_thread()
+            self._condition.notify()
+
+        if is_shutdown:
+            self.flush()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._is_shutdown:
+                    self._condition.wait()
+
+                if not self._pending:
+                    return
+
+                deadline = self._pending_since + self.max_staleness
+                while not self._is_shutdown and len(self._pending) < self.max_batch_size:
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        break
+
+                    self._condition.wait(timeout)
+
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._condition:
+                items = list(self._pending.items())
+                pending_since = self._pending_since
+                self._pending = OrderedDict()
+                self._pending_since = None
+
+            if items:
+                self._flush_items(items)
+                with self._condition:
+                    self._max_lag = max(self._max_lag, time.time() - pending_since)
+
+    def _flush_items(self, items):
+        session = self.session_class(
+            bind=self.bind, redis_bind=self.redis_bind, redis_write_behind=None)
+        keys_to_hdel = []
+        models_ids_map = defaultdict(list)
+
+        for (model, inst_redis_key), ids in items:
+            if ids is None:
+                keys_to_hdel.append((model, inst_redis_key))
+            else:
+                models_ids_map[model].append(ids)
+
+        try:
+            insts = set()
+            for model, ids in models_ids_map.items():
+                for id_, inst in zip(ids, model._get_instances_by_ids(session, ids)):
+                    if inst is None:
+                        keys_to_hdel.append((model, model.get_instance_key(id_)))
+                    else:
+                        insts.add(inst)
+
+            insts = session._get_related_closure(insts)
+            session._exec_redis_updates(insts, keys_to_hdel)
+
+            with self._condition:
+                self._flushes += 1
+                self._refreshed_items += len(insts)
+                self._deleted_items += len(keys_to_hdel)
+
+        except Exception:
+            with self._condition:
+                self._errors += 1
+
+            self._logger.exception('Error refreshing the redis cache, invalidating it')
+            self._invalidate(session, [item_key for item_key, _ in items])
+
+        finally:
+            session.close()
+
+    def _invalidate(self, session, keys):
+        try:
+            session._exec_redis_updates(set(), keys)
+        except Exception:
+            self._logger.exception('Error invalidating the redis cache')
+
+    def shutdown(self, wait=True):
+        with self._condition:
+            self._is_shutdown = True
+            self._condition.notify_all()
+
+        if wait:
+            if self._thread is not None:
+                self._thread.join()
+
+            self.flush()
+
+    def get_metrics(self):
+        with self._condition:
+            return {
+                'pending_items': len(self._pending),
+                'queued_items': self._queued_items,
+                'coalesced_items': self._coalesced_items,
+                'flushes': self._flushes,
+                'refreshed_items': self._refreshed_items,
+                'deleted_items': self._deleted_items,
+                'errors': self._errors,
+                'max_lag': self._max_lag,
+                'max_staleness': self.max_staleness
+            }
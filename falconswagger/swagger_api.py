@@ -24,7 +24,8 @@
 from falcon import API, HTTP_INTERNAL_SERVER_ERROR, HTTP_BAD_REQUEST, HTTPError, HTTPNotFound
 from falconswagger.middlewares import SessionMiddleware
 from falconswagger.router import ModelRouter, Route
-from falconswagger.exceptions import JSONError, ModelBaseError, UnauthorizedError, SwaggerAPIError
+from falconswagger.exceptions import (JSONError, ModelBaseError, UnauthorizedError, SwaggerAPIError,
+    JobsQueueFullError)
 from falconswagger.mixins import LoggerMixin
 from falconswagger.utils import get_module_path
 from falconswagger.constants import SWAGGER_TEMPLATE, SWAGGER_SCHEMA
@@ -76,6 +77,7 @@ class SwaggerAPI(API, LoggerMixin):
         for model in models:
             self.associate_model(model)
 
+        [model.build_backrefs() for model in models if hasattr(model, 'build_backrefs')]
         self._set_swagger_json_route(authorizer)
 
         self.add_error_handler(Exception, self._handle_generic_error)
@@ -86,6 +88,7 @@ class SwaggerAPI(API, LoggerMixin):
         self.add_error_handler(JSONError)
         self.add_error_handler(ModelBaseError)
         self.add_error_handler(UnauthorizedError)
+        self.add_error_handler(JobsQueueFullError)
 
     def _set_swagger_template(self, swagger_template, title, version):
         if swagger_template is None:
@@ -0,0 +1,217 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.jobs import RedisJobsQueue
+from falconswagger.mixins import LoggerMixin
+from falconswagger.models.orm.http import ModelJobsMetaMixin
+from falconswagger.models.orm.session import Session
+from importlib import import_module
+from multiprocessing import Process
+from threading import Event, Thread
+import argparse
+import json
+import logging
+import signal
+
+
+class JobRequest(object):
+
+    def __init__(self, parameters):
+        self.context = {'parameters': parameters}
+
+
+class JobResponse(object):
+
+    def __init__(self):
+        self.body = None
+        self.status = None
+
+
+class JobsWorker(LoggerMixin):
+
+    def __init__(self, models, queue, bind=None, session_class=Session, poll_timeout=1):
+        self.models = {model.__key__: model for model in models}
+        self.queue = queue
+        self.bind = bind
+        self.session_class = session_class
+        self.poll_timeout = poll_timeout
+        self._stopped = Event()
+        self._build_logger()
+
+    def run_once(self, timeout=None):
+        timeout = self.poll_timeout if timeout is None else timeout
+
+        try:
+            raw_job = self.queue.pop_job(timeout)
+        except Exception:
+            self._logger.exception('Error popping a job from the queue')
+            self._stopped.wait(self.poll_timeout)
+            return False
+
+        if raw_job is None:
+            return False
+
+        try:
+            self._run_job(raw_job)
+        except Exception as error:
+            self._logger.exception('Error running the job {}'.format(raw_job))
+            self._set_job_error(raw_job, error)
+
+        try:
+            self.queue.ack_job(raw_job)
+        except Exception:
+            self._logger.exception('Error acking the job {}'.format(raw_job))
+
+        return True
+
+    def _run_job(self, raw_job):
+        job = self._loads_job(raw_job)
+        model = self.models.get(job['model'])
+        if model is None:
+            raise ValueError("Invalid model '{}'".format(job['model']))
+
+        model._job_watcher(job['hash'], JobRequest(job['parameters']), JobResponse(),
+                           self.session_class, self.bind, self.queue.redis_bind)
+
+    def _loads_job(self, raw_job):
+        if isinstance(raw_job, bytes):
+            raw_job = raw_job.decode()
+
+        return json.loads(raw_job)
+
+    def _set_job_error(self, raw_job, error):
+        try:
+            job = self._loads_job(raw_job)
+            model = self.models.get(job['model'])
+            if model is None:
+                model = ModelJobsMetaMixin('InvalidModel', (object,), {'__key__': job['model']})
+
+            result = {'name': error.__class__.__name__, 'message': str(error)}
+            model._set_job_on_redis(
+                job['hash'], {'status': 'error', 'result': result}, self.queue.redis_bind)
+        except Exception:
+            self._logger.exception("Can't set the error status of the job {}".format(raw_job))
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        self.queue.register_worker()
+        heartbeat = Thread(target=self._heartbeat, name='JobsWorkerHeartbeat', daemon=True)
+        heartbeat.start()
+
+        try:
+            while not self._stopped.is_set():
+                self.run_once()
+        finally:
+            self._stopped.set()
+            heartbeat.join()
+            self.queue.unregister_worker()
+
+    def _heartbeat(self):
+        while not self._stopped.is_set():
+            try:
+                self.queue.heartbeat()
+                requeued = self.queue.requeue_dead_workers_jobs()
+                if requeued:
+                    self._logger.warning('Requeued {} jobs of dead workers'.format(requeued))
+            except Exception:
+                self._logger.exception('Error sending the worker heartbeat')
+
+            self._stopped.wait(self.queue.heartbeat_ttl / 3)
+
+    def _stop(self, *args):
+        self._stopped.set()
+
+    def run_processes(self, processes=1):
+        workers = [Process(target=self._run_process) for _ in range(processes)]
+
+        for worker in workers:
+            worker.start()
+
+        signal.signal(signal.SIGTERM, lambda *args: self._terminate(workers))
+
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            self._terminate(workers)
+            for worker in workers:
+                worker.join()
+
+    def _terminate(self, workers):
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+
+    def _run_process(self):
+        if hasattr(self.bind, 'dispose'):
+            self.bind.dispose()
+
+        try:
+            self.run()
+        except KeyboardInterrupt:
+            pass
+
+
+def _import_models(paths):
+    models = []
+    for path in paths:
+        module_name, attr = path.split(':')
+        obj = getattr(import_module(module_name), attr)
+        models.extend(obj if isinstance(obj, (list, tuple)) else [obj])
+
+    return models
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(prog='falconswagger')
+    subparsers = parser.add_subparsers(dest='command')
+
+    worker = subparsers.add_parser('worker', help='run the jobs posted to a redis queue')
+    worker.add_argument('models', nargs='+', metavar='module:attribute',
+                        help='a model or a list of models to run the jobs of')
+    worker.add_argument('--redis-url', default='redis://localhost:6379/0')
+    worker.add_argument('--database-url')
+    worker.add_argument('--queue-key', default='falconswagger_jobs')
+    worker.add_argument('--processes', type=int, default=1)
+    worker.add_argument('--poll-timeout', type=int, default=1)
+    return parser
+
+
+def main(argv=None):
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command != 'worker':
+        parser.print_help()
+        return 1
+
+    from redis import StrictRedis
+    from sqlalchemy import create_engine
+
+    logging.basicConfig(level=logging.INFO)
+    bind = None if args.database_url is None else create_engine(args.database_url)
+    queue = RedisJobsQueue(StrictRedis.from_url(args.redis_url), args.queue_key)
+    worker = JobsWorker(_import_models(args.models), queue, bind,
+                        poll_timeout=args.poll_timeout)
+    worker.run_processes(args.processes)
+    return 0
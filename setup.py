@@ -63,7 +63,7 @@ if CYTHON:
         module_names = []
         for name in filenames:
             module, ext = path.splitext(path.basename(name))
-            if module != '__init__' and module != 'constants':
+            if module not in ('__init__', '__main__', 'constants'):
                 module_names.append(module)
 
         return module_names
@@ -119,6 +119,9 @@ setup(
     ],
     tests_require=tests_require,
     install_requires=install_requires,
+    entry_points={
+        'console_scripts': ['falconswagger=falconswagger.worker:main']
+    },
     cmdclass=cmdclass,
     ext_modules=ext_modules,
     classifiers=[
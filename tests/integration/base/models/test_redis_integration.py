@@ -62,7 +62,16 @@ def app():
             },
             'get': {
                 'operationId': 'get_by_body',
-                'responses': {'200': {'description': 'Got'}}
+                'responses': {'200': {'description': 'Got'}},
+                'parameters': [{
+                    'name': 'stream',
+                    'in': 'query',
+                    'type': 'boolean'
+                }, {
+                    'name': 'limit',
+                    'in': 'query',
+                    'type': 'integer'
+                }]
             },
         },
         '/test/{id}': {
@@ -119,8 +128,10 @@ def app():
             }
         }
     }
+    redis = FakeStrictRedis()
+    redis.flushall()
     return SwaggerAPI([ModelRedisFactory.make('TestModel', 'test', ['id'], schema)],
-                      redis_bind=FakeStrictRedis(), title='Test API')
+                      redis_bind=redis, title='Test API')
 
 
 class TestModelRedisPost(object):
@@ -168,3 +179,41 @@ class TestModelRedisPost(object):
         }
         resp = client.put('/test/1/', body=json.dumps(body))
         assert json.loads(resp.body) == body
+
+
+class TestModelRedisGet(object):
+    def test_get_with_stream(self, client):
+        bodies = [{
+            'id': i,
+            'field1': 'test',
+            'field2': {
+                'fid': '1'
+            }
+        } for i in range(1, 4)]
+        client.post('/test', body=json.dumps(bodies[0]))
+        client.post('/test', body=json.dumps(bodies[1]))
+        client.post('/test', body=json.dumps(bodies[2]))
+        resp = client.get('/test?stream=true')
+
+        assert resp.status_code == 200
+        assert sorted(json.loads(resp.body), key=lambda obj: obj['id']) == bodies
+
+    def test_get_with_stream_false(self, client):
+        body = {'id': 1, 'field1': 'test', 'field2': {'fid': '1'}}
+        client.post('/test', body=json.dumps(body))
+        resp = client.get('/test?stream=false')
+
+        assert resp.status_code == 200
+        assert json.loads(resp.body) == [body]
+
+    def test_get_with_stream_not_found(self, client):
+        resp = client.get('/test?stream=true')
+        assert resp.status_code == 404
+
+    def test_get_with_cursor_on_swagger(self, client):
+        resp = client.get('/swagger.json')
+        get_schema = json.loads(resp.body)['paths']['/test']['get']
+
+        assert [param['name'] for param in get_schema['parameters']] == \
+            ['stream', 'limit', 'cursor']
+        assert 'X-Next-Cursor' in get_schema['responses']['200']['headers']
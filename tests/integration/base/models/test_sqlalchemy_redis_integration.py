@@ -23,12 +23,19 @@
 
 from falconswagger.models.orm.sqlalchemy_redis import ModelSQLAlchemyRedisFactory
 from falconswagger.models.orm.session import Session
+from falconswagger.models.orm.single_flight import SingleFlight
+from falconswagger.models.orm.blob_codec import BlobCodec
 from falconswagger.exceptions import ModelBaseError
+from fakeredis import FakeStrictRedis
+from threading import Timer
+from falcon.errors import HTTPNotFound
 from unittest import mock
 
 import pytest
 import msgpack
 import sqlalchemy as sa
+import time
+import json
 
 
 @pytest.fixture
@@ -330,6 +337,35 @@ class TestModelBaseGetRelated(object):
         assert m11.model2 == [m21, m22]
         assert m21.get_related(session) == {m11}
 
+    def test_get_related_many_with_one_query_per_backref(
+            self, model1, model2, model3, session, selects_counter):
+        model1.insert(session, [{'id': i} for i in range(1, 11)])
+        model2.insert(session, [{'id': i, 'model1_id': i} for i in range(1, 11)])
+        model3.insert(session, [{'id': i, 'model1_id': i} for i in range(1, 6)])
+        m1s = session.query(model1).all()
+        selects_counter['selects'] = 0
+
+        related = model1.get_related_many(session, m1s)
+
+        assert selects_counter['selects'] == 2
+        assert related == set(session.query(model2).all()) | set(session.query(model3).all())
+
+    def test_get_related_many_without_instances(self, model1, model2, session, selects_counter):
+        assert model1.get_related_many(session, []) == set()
+        assert selects_counter['selects'] == 0
+
+    def test_delete_gets_related_with_one_query_per_backref(
+            self, model1, model2, session, selects_counter):
+        model1.insert(session, [{'id': i} for i in range(1, 11)])
+        model2.insert(session, [{'id': i} for i in range(1, 11)])
+        session.query(model1).all()
+        selects_counter['selects'] = 0
+
+        model1.delete(session, [{'id': i} for i in range(1, 11)], commit=False)
+
+        assert selects_counter['selects'] == 2
+        assert session.query(model1).all() == []
+
 
 class TestModelBaseInsert(object):
     def test_insert_with_one_object(self, model1, session):
@@ -659,6 +695,183 @@ class TestModelBaseInsert(object):
             model2.insert(session, {'model1': {'id': 1, '_operation': 'delete'}})
 
 
+    def test_insert_flat_objects_uses_bulk_insert(self, model1, session):
+        with mock.patch.object(model1, '_bulk_insert', wraps=model1._bulk_insert) as bulk_insert:
+            objs = model1.insert(session, [{'id': 1}, {'id': 2}])
+
+        assert bulk_insert.called
+        assert objs == [{'id': 1}, {'id': 2}]
+        assert model1.get(session) == [{'id': 1}, {'id': 2}]
+
+    def test_insert_flat_objects_without_ids(self, model1, session):
+        objs = model1.insert(session, [{}, {}], todict=False)
+
+        assert [obj.id for obj in objs] == [1, 2]
+        assert model1.get(session) == [{'id': 1}, {'id': 2}]
+
+    def test_insert_flat_objects_with_foreign_keys(self, model1, model2, session):
+        model1.insert(session, {'id': 1})
+        objs = model2.insert(session, [{'id': 1, 'model1_id': 1}])
+
+        assert objs == [{'id': 1, 'model1_id': 1, 'model1': {'id': 1}}]
+
+    def test_insert_nested_objects_not_uses_bulk_insert(self, model1, model2, session):
+        with mock.patch.object(model2, '_bulk_insert') as bulk_insert:
+            model2.insert(session, {'id': 1, 'model1': {'id': 1, '_operation': 'insert'}})
+
+        assert not bulk_insert.called
+
+    def test_insert_flat_objects_with_overrided_init_not_uses_bulk_insert(
+            self, model_base, session):
+        class model1(model_base):
+            __tablename__ = 'model1'
+            __table_args__ = {'mysql_engine':'innodb'}
+            id = sa.Column(sa.Integer, primary_key=True)
+            test = sa.Column(sa.String(100))
+
+            def __init__(self, session, input_=None, **kwargs):
+                kwargs.setdefault('test', 'default')
+                model_base.__init__(self, session, input_, **kwargs)
+
+        model_base.metadata.create_all()
+        objs = model1.insert(session, [{'id': 1}, {'id': 2}])
+
+        assert sorted(objs, key=lambda obj: obj['id']) == \
+            [{'id': 1, 'test': 'default'}, {'id': 2, 'test': 'default'}]
+
+    def test_insert_flat_objects_with_overrided_setattr_not_uses_bulk_insert(
+            self, model_base, session):
+        class model1(model_base):
+            __tablename__ = 'model1'
+            __table_args__ = {'mysql_engine':'innodb'}
+            id = sa.Column(sa.Integer, primary_key=True)
+            test = sa.Column(sa.String(100))
+
+            def _setattr(self, attr_name, value, session, input_):
+                if attr_name == 'test':
+                    value = value.upper()
+
+                model_base._setattr(self, attr_name, value, session, input_)
+
+        model_base.metadata.create_all()
+        objs = model1.insert(session, [{'id': 1, 'test': 'test'}])
+
+        assert objs == [{'id': 1, 'test': 'TEST'}]
+
+    def test_insert_flat_objects_with_invalid_attribute(self, model1, session):
+        with pytest.raises(TypeError):
+            model1.insert(session, [{'id': 1, 'invalid': 1}])
+
+
+@pytest.fixture
+def selects_counter(session, request):
+    counter = {'selects': 0, 'statements': []}
+
+    def count_selects(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith('SELECT'):
+            counter['selects'] += 1
+            counter['statements'].append(statement)
+
+    sa.event.listen(session.bind, 'before_cursor_execute', count_selects)
+    request.addfinalizer(
+        lambda: sa.event.remove(session.bind, 'before_cursor_execute', count_selects))
+    return counter
+
+
+class TestModelBaseNestedQueries(object):
+    def test_insert_resolves_nested_ids_with_one_query(
+            self, model1, model2_mtm, session, selects_counter):
+        model1.insert(session, [{'id': i} for i in range(1, 51)])
+        selects_counter['selects'] = 0
+
+        inst = model2_mtm.insert(
+            session, {'id': 1, 'model1': [{'id': i} for i in range(1, 51)]},
+            commit=False, todict=False)[0]
+
+        assert selects_counter['selects'] == 1
+        assert sorted(m1.id for m1 in inst.model1) == list(range(1, 51))
+
+    def test_insert_resolves_nested_tree_by_depth(
+            self, model1, model2_mtm, model3_mtm, session, selects_counter):
+        model1.insert(session, [{'id': i} for i in range(1, 21)])
+        model2_mtm.insert(session, [{'id': 1}, {'id': 2}])
+        selects_counter['selects'] = 0
+
+        insts = model3_mtm.insert(session, [{
+            'id': i,
+            'model2': {
+                'id': i,
+                '_operation': 'update',
+                'model1': [{'id': j} for j in range(1, 21)]
+            }
+        } for i in range(1, 3)], commit=False, todict=False)
+
+        # one query by nested level plus the lazy load of each updated 'model1' collection
+        assert selects_counter['selects'] == 4
+        assert sorted(len(inst.model2.model1) for inst in insts) == [20, 20]
+
+    def test_update_resolves_nested_ids_with_one_query(
+            self, model1, model2_mtm, session, selects_counter):
+        model1.insert(session, [{'id': i} for i in range(1, 51)])
+        model2_mtm.insert(session, {'id': 1})
+        selects_counter['selects'] = 0
+
+        model2_mtm.update(
+            session, {'id': 1, 'model1': [{'id': i} for i in range(1, 51)]}, commit=False)
+
+        # the model2 instance, the nested ids and the lazy load of the 'model1' collection
+        assert selects_counter['selects'] == 3
+
+
+class TestModelBaseEagerLoading(object):
+    def insert_objects(self, model1, model2_mtm, model3_mtm, session, size):
+        model1.insert(session, [{'id': i} for i in range(1, 4)])
+        model2_mtm.insert(session, [
+            {'id': i, 'model1': [{'id': j} for j in range(1, 4)]} for i in range(1, size+1)])
+        model3_mtm.insert(session, [
+            {'id': i, 'model1_id': 1, 'model2_id': i} for i in range(1, size+1)])
+        session.expunge_all()
+
+    def test_get_uses_constant_number_of_queries(
+            self, model1, model2_mtm, model3_mtm, session, selects_counter):
+        self.insert_objects(model1, model2_mtm, model3_mtm, session, 50)
+        selects_counter['selects'] = 0
+
+        objs = model3_mtm.get(session)
+
+        assert len(objs) == 50
+        assert objs[0] == {
+            'id': 1,
+            'model1_id': 1,
+            'model1': {'id': 1},
+            'model2_id': 1,
+            'model2': {'id': 1, 'model1': [{'id': 1}, {'id': 2}, {'id': 3}]}
+        }
+        assert selects_counter['selects'] == 2
+
+    def test_get_with_fields_loads_only_the_requested_relationships(
+            self, model1, model2_mtm, model3_mtm, session, selects_counter):
+        self.insert_objects(model1, model2_mtm, model3_mtm, session, 50)
+        selects_counter['selects'] = 0
+
+        objs = model3_mtm.get(session, fields=['id', 'model1'])
+
+        assert objs[0] == {'id': 1, 'model1': {'id': 1}}
+        assert selects_counter['selects'] == 1
+
+    def test_get_iter_uses_constant_number_of_queries(
+            self, model1, model2_mtm, model3_mtm, session, selects_counter):
+        self.insert_objects(model1, model2_mtm, model3_mtm, session, 50)
+        selects_counter['selects'] = 0
+        model3_mtm.STREAM_CHUNKS = 25
+
+        objs = list(model3_mtm.get_iter(session))
+
+        assert len(objs) == 50
+        # two queries by chunk plus the last empty chunk
+        assert selects_counter['selects'] == 5
+
+
 class TestModelBaseUpdate(object):
     def test_update_with_one_object(self, model1_nested, session):
         model1_nested.insert(session, {'id': 1})
@@ -855,6 +1068,77 @@ class TestModelBaseUpdate(object):
         assert session.query(model2_mtm).one().todict() == {'id': 1, 'model1': [{'id': 1}]}
 
 
+    def test_update_flat_objects_uses_bulk_update(self, model1_nested, model2, session):
+        model1_nested.insert(session, [{'id': 1}, {'id': 2}, {'id': 3}])
+        model2.insert(session, [{'id': 1}, {'id': 2}])
+
+        with mock.patch.object(session, 'bulk_update_mappings',
+                               wraps=session.bulk_update_mappings) as bulk_update:
+            objs = model2.update(session, [
+                {'id': 1, 'model1_id': 1},
+                {'id': 2, 'model1_id': 2},
+                {'id': 3, 'model1_id': 3}])
+
+        assert bulk_update.call_count == 1
+        assert sorted(objs, key=lambda obj: obj['id']) == [
+            {'id': 1, 'model1_id': 1, 'model1': {'id': 1, 'test': None}},
+            {'id': 2, 'model1_id': 2, 'model1': {'id': 2, 'test': None}}]
+
+    def test_update_flat_objects_groups_by_columns(self, model1_nested, model2, model3, session):
+        model1_nested.insert(session, [{'id': 1}, {'id': 2}])
+        model3.insert(session, [{'id': 1}, {'id': 2}, {'id': 3}])
+
+        with mock.patch.object(session, 'bulk_update_mappings',
+                               wraps=session.bulk_update_mappings) as bulk_update:
+            model3.update(session, [
+                {'id': 1, 'model1_id': 1},
+                {'id': 2, 'model1_id': 2},
+                {'id': 3, 'model1_id': 1, 'model2_id': None}])
+
+        assert bulk_update.call_count == 2
+        assert [(o.id, o.model1_id) for o in session.query(model3).order_by(model3.id)] == \
+            [(1, 1), (2, 2), (3, 1)]
+
+    def test_update_flat_objects_runs_validators(self, model_base, session):
+        class model1(model_base):
+            __tablename__ = 'model1'
+            __table_args__ = {'mysql_engine':'innodb'}
+            id = sa.Column(sa.Integer, primary_key=True)
+            test = sa.Column(sa.String(100))
+
+            @sa.orm.validates('test')
+            def validate_test(self, key, value):
+                return value.upper()
+
+        model_base.metadata.create_all()
+        model1.insert(session, [{'id': 1}, {'id': 2}])
+
+        with mock.patch.object(model1, '_bulk_update') as bulk_update:
+            model1.update(session, [{'id': 1, 'test': 'test1'}, {'id': 2, 'test': 'test2'}])
+
+        assert not bulk_update.called
+        assert [o.todict() for o in session.query(model1).order_by(model1.id)] == \
+            [{'id': 1, 'test': 'TEST1'}, {'id': 2, 'test': 'TEST2'}]
+
+    def test_update_flat_objects_with_ids(self, model1_nested, session):
+        model1_nested.insert(session, [{'id': 1}, {'id': 2}])
+        objs = model1_nested.update(session, {'test': 'test_updated'}, ids={'id': 2})
+
+        assert objs == [{'id': 2, 'test': 'test_updated'}]
+        assert [o.todict() for o in session.query(model1_nested).order_by(model1_nested.id)] == \
+            [{'id': 1, 'test': None}, {'id': 2, 'test': 'test_updated'}]
+
+    def test_update_flat_objects_with_id_change(self, model1_nested, session):
+        model1_nested.insert(session, [{'id': 1}])
+
+        with mock.patch.object(model1_nested, '_bulk_update') as bulk_update:
+            model1_nested.update(session, {'id': 2}, ids={'id': 1})
+
+        assert not bulk_update.called
+        assert [o.todict() for o in session.query(model1_nested).all()] == \
+            [{'id': 2, 'test': None}]
+
+
 class TestModelBaseGet(object):
     def test_if_query_get_calls_hmget_correctly(self, session, redis, model1):
         model1.get(session, {'id': 1})
@@ -919,12 +1203,51 @@ class TestModelBaseGet(object):
         model1.get(session, [{'id': 1}, {'id': 2}, {'id': 3}, {'id': 4}], limit=2, offset=1)
         assert redis.hmget.call_args_list == [mock.call('model1', [b'2', b'3'])]
 
+    def test_without_ids_and_with_limit_orders_subqueryload_by_primary_keys(
+            self, model1, model2_mtm, session, selects_counter):
+        model1.insert(session, [{'id': 1}, {'id': 2}])
+        model2_mtm.insert(session, [
+            {'id': 3, 'model1': [{'id': 1}]},
+            {'id': 1, 'model1': [{'id': 2}]},
+            {'id': 2, 'model1': [{'id': 1}, {'id': 2}]}
+        ])
+        selects_counter['statements'] = []
+
+        assert model2_mtm.get(session, limit=2, offset=1) == [
+            {'id': 2, 'model1': [{'id': 1}, {'id': 2}]},
+            {'id': 3, 'model1': [{'id': 1}]}
+        ]
+        assert len(selects_counter['statements']) == 2
+        assert all('ORDER BY' in statement for statement in selects_counter['statements'])
+
+    def test_with_ids_and_offset_past_end_without_todict(self, model1, session, redis):
+        session.add_all([model1(session, id=1), model1(session, id=2)])
+        session.commit()
+        assert model1.get(session, [{'id': 1}, {'id': 2}], offset=2, todict=False) == []
+
+    def test_with_empty_list_filter(self, model1, session, redis):
+        session.add_all([model1(session, id=1), model1(session, id=2)])
+        session.commit()
+        assert model1.get(session, id=[]) == []
+
     def test_with_missing_id(self, model1, session, redis):
         session.add(model1(session, id=1))
         session.commit()
         redis.hmget.return_value = [None, None]
         assert model1.get(session, [{'id': 1}, {'id': 2}]) == [{'id': 1}]
 
+    def test_with_partial_cache_keeps_ids_order(self, model1, session, redis):
+        model1.insert(session, [{}, {}, {}])
+        redis.hmget.return_value = [None, msgpack.dumps({'id': 2}), None]
+        assert model1.get(session, [{'id': 1}, {'id': 2}, {'id': 3}]) == \
+            [{'id': 1}, {'id': 2}, {'id': 3}]
+
+    def test_with_repeated_missing_ids(self, model1, session, redis):
+        model1.insert(session, [{}, {}])
+        redis.hmget.return_value = [None, None, None]
+        assert model1.get(session, [{'id': 2}, {'id': 1}, {'id': 2}]) == \
+            [{'id': 2}, {'id': 1}, {'id': 2}]
+
     def test_with_missing_all_ids(self, model1, session, redis):
         redis.hmget.return_value = [None, None]
         assert model1.get(session, [{'id': 1}, {'id': 2}]) == []
@@ -946,6 +1269,414 @@ class TestModelBaseGet(object):
         assert model1.get(session, limit=1, offset=1) == [{'id': 2}]
 
 
+@pytest.fixture
+def fake_redis(session):
+    redis = FakeStrictRedis()
+    redis.flushall()
+    session.redis_bind = redis
+    return redis
+
+
+@pytest.fixture
+def model1_single_flight(model_base):
+    class model1(model_base):
+        __tablename__ = 'model1'
+        __table_args__ = {'mysql_engine':'innodb'}
+        __single_flight__ = SingleFlight(redis_lock=True, wait_timeout=5)
+        id = sa.Column(sa.Integer, primary_key=True)
+
+    return model1
+
+
+class TestModelBaseGetWithSingleFlight(object):
+    def test_get_waits_in_flight_load(
+            self, model1_single_flight, session, fake_redis, selects_counter):
+        model1_single_flight.insert(session, {'id': 1})
+        fake_redis.delete('model1')
+        single_flight = model1_single_flight.__single_flight__
+        flight = single_flight.begin(fake_redis, 'model1', [b'1'])
+        selects_counter['selects'] = 0
+
+        def load():
+            fake_redis.hset('model1', b'1', msgpack.dumps({'id': 1}))
+            single_flight.end(fake_redis, flight)
+
+        Timer(0.01, load).start()
+
+        assert model1_single_flight.get(session, {'id': 1}) == [{'id': 1}]
+        assert selects_counter['selects'] == 0
+        assert single_flight.get_metrics()['local_waits'] == 1
+
+    def test_get_waits_load_locked_by_other_process(
+            self, model1_single_flight, session, fake_redis, selects_counter):
+        model1_single_flight.insert(session, {'id': 1})
+        fake_redis.delete('model1')
+        fake_redis.set(b'model1:1:lock', b'1')
+        selects_counter['selects'] = 0
+
+        def load():
+            fake_redis.hset('model1', b'1', msgpack.dumps({'id': 1}))
+            fake_redis.delete(b'model1:1:lock')
+
+        Timer(0.01, load).start()
+
+        assert model1_single_flight.get(session, {'id': 1}) == [{'id': 1}]
+        assert selects_counter['selects'] == 0
+        assert model1_single_flight.__single_flight__.get_metrics()['remote_waits'] == 1
+
+    def test_get_loads_when_in_flight_load_fails(
+            self, model1_single_flight, session, fake_redis, selects_counter):
+        model1_single_flight.insert(session, {'id': 1})
+        fake_redis.delete('model1')
+        single_flight = model1_single_flight.__single_flight__
+        flight = single_flight.begin(fake_redis, 'model1', [b'1'])
+        selects_counter['selects'] = 0
+        Timer(0.01, single_flight.end, (fake_redis, flight)).start()
+
+        assert model1_single_flight.get(session, {'id': 1}) == [{'id': 1}]
+        assert selects_counter['selects'] == 1
+
+    def test_get_releases_lock_after_load(self, model1_single_flight, session, fake_redis):
+        model1_single_flight.insert(session, {'id': 1})
+        fake_redis.delete('model1')
+
+        assert model1_single_flight.get(session, {'id': 1}) == [{'id': 1}]
+        assert not fake_redis.exists(b'model1:1:lock')
+        assert model1_single_flight.__single_flight__.get_metrics()['in_flight'] == 0
+
+
+@pytest.fixture
+def model1_not_found_ttl(model_base):
+    class model1(model_base):
+        __tablename__ = 'model1'
+        __table_args__ = {'mysql_engine':'innodb'}
+        __not_found_ttl__ = 60
+        id = sa.Column(sa.Integer, primary_key=True)
+        name = sa.Column(sa.String(255))
+
+    return model1
+
+
+class TestModelBaseGetWithNotFoundTTL(object):
+    def test_get_sets_not_found_marker(self, model1_not_found_ttl, session, fake_redis):
+        assert model1_not_found_ttl.get(session, {'id': 1}) == []
+        assert fake_redis.hget('model1', b'1').startswith(model1_not_found_ttl.NOT_FOUND_MARKER)
+
+    def test_get_skips_not_found_ids(
+            self, model1_not_found_ttl, session, fake_redis, selects_counter):
+        model1_not_found_ttl.insert(session, {'id': 1})
+        model1_not_found_ttl.get(session, [{'id': 1}, {'id': 2}])
+        selects_counter['selects'] = 0
+
+        assert model1_not_found_ttl.get(session, [{'id': 1}, {'id': 2}]) == \
+            [{'id': 1, 'name': None}]
+        assert selects_counter['selects'] == 0
+
+    def test_get_queries_expired_not_found_ids(
+            self, model1_not_found_ttl, session, fake_redis, selects_counter):
+        model1_not_found_ttl.get(session, {'id': 1})
+        selects_counter['selects'] = 0
+
+        with mock.patch('falconswagger.models.orm.sqlalchemy_redis.time.time',
+                        return_value=time.time() + 61):
+            assert model1_not_found_ttl.get(session, {'id': 1}) == []
+
+        assert selects_counter['selects'] == 1
+
+    def test_insert_clears_not_found_marker(self, model1_not_found_ttl, session, fake_redis):
+        fake_redis.sadd('model1_filters_names', '')
+        model1_not_found_ttl.get(session, {'id': 1})
+        model1_not_found_ttl.insert(session, {'id': 1})
+
+        assert model1_not_found_ttl.get(session, {'id': 1}) == [{'id': 1, 'name': None}]
+
+    def test_get_by_non_primary_ids_does_not_set_marker(
+            self, model1_not_found_ttl, session, fake_redis):
+        assert model1_not_found_ttl.get(session, {'name': 'test'}) == []
+        assert fake_redis.hkeys('model1') == []
+
+        model1_not_found_ttl.insert(session, {'id': 1, 'name': 'test'})
+        assert model1_not_found_ttl.get(session, {'name': 'test'}) == [{'id': 1, 'name': 'test'}]
+
+    def test_update_to_not_found_id_clears_marker(
+            self, model1_not_found_ttl, session, fake_redis):
+        fake_redis.sadd('model1_filters_names', '')
+        model1_not_found_ttl.insert(session, {'id': 1})
+        model1_not_found_ttl.get(session, {'id': 2})
+        model1_not_found_ttl.update(session, {'id': 2}, ids={'id': 1})
+
+        assert model1_not_found_ttl.get(session, {'id': 2}) == [{'id': 2, 'name': None}]
+
+    def test_get_without_not_found_ttl_does_not_set_marker(self, model1, session, fake_redis):
+        model1.get(session, {'id': 1})
+        assert fake_redis.hget('model1', b'1') is None
+
+
+@pytest.fixture
+def model1_keys_layout(model_base):
+    class model1(model_base):
+        __tablename__ = 'model1'
+        __table_args__ = {'mysql_engine':'innodb'}
+        __cache_layout__ = 'keys'
+        __cache_ttl__ = 60
+        id = sa.Column(sa.Integer, primary_key=True)
+        test = sa.Column(sa.String(100))
+
+    return model1
+
+
+class TestModelBaseGetWithKeysLayout(object):
+    def test_get_sets_instances_keys_with_ttl(self, model1_keys_layout, session, fake_redis):
+        model1_keys_layout.insert(session, [{'id': 1}, {'id': 2}])
+
+        assert model1_keys_layout.get(session, [{'id': 1}, {'id': 2}]) == \
+            [{'id': 1, 'test': None}, {'id': 2, 'test': None}]
+        assert fake_redis.exists('model1') is False
+        assert msgpack.loads(fake_redis.get(b'model1:1'), encoding='utf-8') == \
+            {'id': 1, 'test': None}
+        assert 0 < fake_redis.ttl(b'model1:2') <= 60
+
+    def test_get_reads_instances_keys_with_mget(
+            self, model1_keys_layout, session, fake_redis, selects_counter):
+        model1_keys_layout.insert(session, [{'id': 1}, {'id': 2}])
+        model1_keys_layout.get(session, [{'id': 1}, {'id': 2}])
+        selects_counter['selects'] = 0
+
+        with mock.patch.object(fake_redis, 'mget', wraps=fake_redis.mget) as mget:
+            assert model1_keys_layout.get(session, [{'id': 2}, {'id': 1}]) == \
+                [{'id': 2, 'test': None}, {'id': 1, 'test': None}]
+            assert mget.call_args_list == [mock.call([b'model1:2', b'model1:1'])]
+
+        assert selects_counter['selects'] == 0
+
+    def test_update_refreshes_instance_key(self, model1_keys_layout, session, fake_redis):
+        fake_redis.sadd('model1_filters_names', '')
+        model1_keys_layout.insert(session, {'id': 1})
+        model1_keys_layout.update(session, {'id': 1, 'test': 'test'})
+
+        assert msgpack.loads(fake_redis.get(b'model1:1'), encoding='utf-8') == \
+            {'id': 1, 'test': 'test'}
+        assert 0 < fake_redis.ttl(b'model1:1') <= 60
+
+    def test_update_with_new_id_deletes_old_instance_key(
+            self, model1_keys_layout, session, fake_redis):
+        fake_redis.sadd('model1_filters_names', '')
+        model1_keys_layout.insert(session, {'id': 1})
+        model1_keys_layout.update(session, {'id': 2}, ids={'id': 1})
+
+        assert fake_redis.get(b'model1:1') is None
+        assert msgpack.loads(fake_redis.get(b'model1:2'), encoding='utf-8') == \
+            {'id': 2, 'test': None}
+
+    def test_delete_deletes_instance_key(self, model1_keys_layout, session, fake_redis):
+        fake_redis.sadd('model1_filters_names', '')
+        model1_keys_layout.insert(session, {'id': 1})
+        model1_keys_layout.delete(session, {'id': 1})
+
+        assert fake_redis.get(b'model1:1') is None
+
+
+@pytest.fixture
+def model1_json_encoding(model_base):
+    class model1(model_base):
+        __tablename__ = 'model1'
+        __table_args__ = {'mysql_engine':'innodb'}
+        __cache_encoding__ = 'json'
+        id = sa.Column(sa.Integer, primary_key=True)
+        test = sa.Column(sa.String(100))
+
+    return model1
+
+
+def build_get_request(session, path=None, body=None):
+    parameters = {'path': path, 'body': body, 'headers': {}, 'query_string': {}}
+    return mock.MagicMock(context={'session': session, 'parameters': parameters})
+
+
+class TestModelBaseGetWithJsonEncoding(object):
+    def test_get_sets_json_on_redis(self, model1_json_encoding, session, fake_redis):
+        model1_json_encoding.insert(session, {'id': 1, 'test': 'test'})
+
+        assert model1_json_encoding.get(session, {'id': 1}) == [{'id': 1, 'test': 'test'}]
+        assert json.loads(fake_redis.hget('model1', b'1').decode()) == {'id': 1, 'test': 'test'}
+
+    def test_get_decodes_json_from_redis(self, model1_json_encoding, session, fake_redis):
+        fake_redis.hset('model1', b'1', b'{"id": 1, "test": "cached"}')
+
+        assert model1_json_encoding.get(session, {'id': 1}) == [{'id': 1, 'test': 'cached'}]
+
+    def test_get_json_returns_redis_bytes(self, model1_json_encoding, session, fake_redis):
+        fake_redis.hset('model1', b'1', b'{"id": 1, "test": "cached"}')
+        model1_json_encoding.insert(session, {'id': 2})
+
+        objs = model1_json_encoding.get_json(session, [{'id': 1}, {'id': 2}])
+
+        assert objs[0] == b'{"id": 1, "test": "cached"}'
+        assert json.loads(objs[1].decode()) == {'id': 2, 'test': None}
+
+    def test_get_json_without_redis(self, model1, session):
+        session.redis_bind = None
+        model1.insert(session, {'id': 1})
+
+        assert model1.get_json(session, {'id': 1}) == [b'{"id": 1}']
+
+    def test_get_by_uri_template_uses_redis_bytes(
+            self, model1_json_encoding, session, fake_redis):
+        fake_redis.hset('model1', b'1', b'{"id": 1, "test": "cached"}')
+        resp = mock.MagicMock()
+
+        model1_json_encoding.get_by_uri_template(build_get_request(session, {'id': 1}), resp)
+
+        assert resp.body == b'{"id": 1, "test": "cached"}'
+
+    def test_get_by_body_joins_redis_bytes(self, model1_json_encoding, session, fake_redis):
+        fake_redis.hset('model1', b'1', b'{"id": 1, "test": "cached"}')
+        model1_json_encoding.insert(session, {'id': 2})
+        resp = mock.MagicMock()
+
+        model1_json_encoding.get_by_body(
+            build_get_request(session, body=[{'id': 1}, {'id': 2}]), resp)
+
+        assert json.loads(resp.body.decode()) == \
+            [{'id': 1, 'test': 'cached'}, {'id': 2, 'test': None}]
+
+    def test_get_by_uri_template_not_found(self, model1_json_encoding, session, fake_redis):
+        with pytest.raises(HTTPNotFound):
+            model1_json_encoding.get_by_uri_template(
+                build_get_request(session, {'id': 1}), mock.MagicMock())
+
+
+@pytest.fixture
+def model1_blob_codec(model_base):
+    class model1(model_base):
+        __tablename__ = 'model1'
+        __table_args__ = {'mysql_engine':'innodb'}
+        __blob_codec__ = BlobCodec(min_size=100)
+        id = sa.Column(sa.Integer, primary_key=True)
+        test = sa.Column(sa.String(1000))
+
+    return model1
+
+
+class TestModelBaseGetWithBlobCodec(object):
+    def test_get_compresses_large_objects(self, model1_blob_codec, session, fake_redis):
+        model1_blob_codec.insert(session, [{'id': 1, 'test': 'test' * 100}, {'id': 2}])
+        model1_blob_codec.get(session, [{'id': 1}, {'id': 2}])
+
+        assert fake_redis.hget('model1', b'1')[:1] == BlobCodec.HEADERS['zlib']
+        assert msgpack.loads(fake_redis.hget('model1', b'2'), encoding='utf-8') == \
+            {'id': 2, 'test': None}
+
+    def test_get_decodes_compressed_and_old_objects(
+            self, model1_blob_codec, session, fake_redis):
+        model1_blob_codec.insert(session, {'id': 1, 'test': 'test' * 100})
+        model1_blob_codec.get(session, {'id': 1})
+        fake_redis.hset('model1', b'2', msgpack.dumps({'id': 2, 'test': 'old'}))
+
+        assert model1_blob_codec.get(session, [{'id': 1}, {'id': 2}]) == \
+            [{'id': 1, 'test': 'test' * 100}, {'id': 2, 'test': 'old'}]
+        assert model1_blob_codec.__blob_codec__.get_metrics()['decompressed'] == 1
+
+    def test_commit_compresses_large_objects(self, model1_blob_codec, session, fake_redis):
+        fake_redis.sadd('model1_filters_names', '')
+        model1_blob_codec.insert(session, {'id': 1, 'test': 'test' * 100})
+
+        blob = fake_redis.hget('model1', b'1')
+        assert blob[:1] == BlobCodec.HEADERS['zlib']
+        assert model1_blob_codec.get(session, {'id': 1}) == [{'id': 1, 'test': 'test' * 100}]
+
+
+class TestModelBaseGetWithFields(object):
+    def test_without_ids_with_fields(self, model1, model2, session, redis):
+        model2.insert(session, [{'model1': {'_operation': 'insert'}}])
+        assert model2.get(session, fields=['model1']) == [{'model1': {'id': 1}}]
+
+    def test_without_ids_with_fields_without_relationship(self, model1, model2, session, redis):
+        model2.insert(session, [{'model1': {'_operation': 'insert'}}])
+        assert model2.get(session, fields=['id']) == [{'id': 1}]
+
+    def test_with_ids_with_fields_uses_fields_namespace(self, model1, model2, session, redis):
+        model2.insert(session, [{'model1': {'_operation': 'insert'}}])
+        redis.hmget.return_value = [None]
+
+        assert model2.get(session, {'id': 1}, fields=['id']) == [{'id': 1}]
+        assert redis.hmget.call_args_list == [mock.call('model2_:fields:id', [b'1'])]
+        assert redis.hmset.call_args_list[-1] == \
+            mock.call('model2_:fields:id', {b'1': msgpack.dumps({'id': 1})})
+
+
+class TestModelBaseGetIter(object):
+    def test_get_iter_without_ids(self, model1, session, redis):
+        model1.insert(session, [{}, {}, {}])
+        assert list(model1.get_iter(session)) == [{'id': 1}, {'id': 2}, {'id': 3}]
+
+    def test_get_iter_without_ids_with_chunks(self, model1, session, redis):
+        model1.insert(session, [{}, {}, {}, {}, {}])
+        model1.STREAM_CHUNKS = 2
+        assert list(model1.get_iter(session)) == \
+            [{'id': 1}, {'id': 2}, {'id': 3}, {'id': 4}, {'id': 5}]
+
+    def test_get_iter_without_ids_with_chunks_and_limit_and_offset(self, model1, session, redis):
+        model1.insert(session, [{}, {}, {}, {}, {}])
+        model1.STREAM_CHUNKS = 2
+        assert list(model1.get_iter(session, limit=3, offset=1)) == \
+            [{'id': 2}, {'id': 3}, {'id': 4}]
+
+    def test_get_iter_without_ids_with_chunks_and_two_ids(self, model1_two_ids, session, redis):
+        model1_two_ids.insert(session, [
+            {'id': 1, 'id2': 2}, {'id': 1, 'id2': 1}, {'id': 2, 'id2': 1}])
+        model1_two_ids.STREAM_CHUNKS = 1
+        assert list(model1_two_ids.get_iter(session)) == [
+            {'id': 1, 'id2': 1}, {'id': 1, 'id2': 2}, {'id': 2, 'id2': 1}]
+
+    def test_get_iter_with_ids_with_chunks(self, model1, session, redis):
+        model1.insert(session, [{}, {}, {}])
+        model1.STREAM_CHUNKS = 2
+        redis.hmget.side_effect = [[None, None], [None]]
+        assert list(model1.get_iter(session, [{'id': 1}, {'id': 2}, {'id': 3}])) == \
+            [{'id': 1}, {'id': 2}, {'id': 3}]
+        assert redis.hmget.call_args_list == [
+            mock.call('model1', [b'1', b'2']), mock.call('model1', [b'3'])]
+
+
+class TestModelBaseGetPage(object):
+    def test_get_page_without_cursor(self, model1, session, redis):
+        model1.insert(session, [{}, {}, {}])
+        objs, cursor = model1.get_page(session, limit=2)
+
+        assert objs == [{'id': 1}, {'id': 2}]
+        assert cursor is not None
+
+    def test_get_page_with_cursor(self, model1, session, redis):
+        model1.insert(session, [{}, {}, {}])
+        _, cursor = model1.get_page(session, limit=2)
+        objs, cursor = model1.get_page(session, limit=2, cursor=cursor)
+
+        assert objs == [{'id': 3}]
+        assert cursor is None
+
+    def test_get_page_with_two_ids(self, model1_two_ids, session, redis):
+        model1_two_ids.insert(session, [
+            {'id': 1, 'id2': 2}, {'id': 1, 'id2': 1}, {'id': 2, 'id2': 1}])
+        objs, cursor = model1_two_ids.get_page(session, limit=1)
+        assert objs == [{'id': 1, 'id2': 1}]
+
+        objs, cursor = model1_two_ids.get_page(session, limit=1, cursor=cursor)
+        assert objs == [{'id': 1, 'id2': 2}]
+
+        objs, cursor = model1_two_ids.get_page(session, limit=2, cursor=cursor)
+        assert objs == [{'id': 2, 'id2': 1}]
+        assert cursor is None
+
+    def test_get_page_with_invalid_cursor(self, model1, session, redis):
+        cursor = model1._encode_cursor({'id2': 1})
+
+        with pytest.raises(ModelBaseError) as exc_info:
+            model1.get_page(session, limit=2, cursor=cursor)
+
+        assert exc_info.value.args == ("invalid cursor '{}'".format(cursor),)
+
+
 class TestModelBaseDelete(object):
     def test_delete(self, model1, session, redis):
         model1.insert(session, {})
@@ -959,6 +1690,11 @@ class TestModelBaseDelete(object):
         model1.delete(session , [{'id': 2}, {'id': 3}])
         assert model1.get(session) == [{'id': 1}]
 
+    def test_delete_with_empty_ids(self, model1, session, redis):
+        model1.insert(session, {})
+        model1.delete(session, [])
+        assert model1.get(session) == [{'id': 1}]
+
     def test_delete_with_two_ids(self, model1_two_ids, session, redis):
         model1_two_ids.insert(session, {'id2': 2})
         assert model1_two_ids.get(session) == [{'id': 1, 'id2': 2}]
@@ -25,8 +25,11 @@ from sqlalchemy.ext.declarative import declarative_base
 from unittest import mock
 
 from falconswagger.models.orm.session import Session
+from falconswagger.models.orm.local_cache import LocalCache
 from falconswagger.models.orm.sqlalchemy_redis import ModelSQLAlchemyRedisFactory
+from fakeredis import FakeStrictRedis
 
+import json
 import msgpack
 import pytest
 import sqlalchemy as sa
@@ -37,10 +40,31 @@ def model_base():
     return ModelSQLAlchemyRedisFactory.make()
 
 
+class RedisPipelineMock(object):
+
+    def __init__(self, redis, transaction=True):
+        self.redis = redis
+        self.transaction = transaction
+        self.results = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.results.append(getattr(self.redis, name)(*args, **kwargs))
+            return self
+
+        return command
+
+    def execute(self):
+        self.redis.execute(transaction=self.transaction)
+        results, self.results = self.results, []
+        return results
+
+
 @pytest.fixture
 def redis():
     r = mock.MagicMock()
     r.smembers = lambda x: {x.replace('_filters_names', '').encode()}
+    r.pipeline.side_effect = lambda transaction=True: RedisPipelineMock(r, transaction)
     return r
 
 
@@ -171,6 +195,90 @@ class TestSessionCommitRedisSet(object):
             assert call_ in expected
 
 
+class TestSessionCommitRedisPipeline(object):
+    def test_if_commit_uses_two_round_trips(self, session, model1, model2, redis):
+        session.add_all([model1(session, id=i) for i in range(1, 4)])
+        session.add_all([model2(session, id=i) for i in range(1, 3)])
+        session.commit()
+
+        assert redis.execute.call_args_list == [
+            mock.call(transaction=False), mock.call(transaction=False)]
+        assert session.redis_commit_stats == {'round_trips': 2, 'commands': 4}
+
+    def test_if_commit_deletes_and_sets_in_same_pipeline(self, session, model1, model2, redis):
+        inst1 = model1(session, id=1)
+        session.add_all([inst1, model2(session, id=1)])
+        session.commit()
+        redis.execute.reset_mock()
+
+        session.delete(inst1)
+        session.add(model2(session, id=2))
+        session.commit()
+
+        assert redis.execute.call_count == 2
+        assert session.redis_commit_stats == {'round_trips': 2, 'commands': 4}
+
+    def test_if_commit_uses_transaction(self, session, model1, redis):
+        session.redis_transaction = True
+        session.add(model1(session, id=1))
+        session.commit()
+
+        assert redis.execute.call_args_list == [
+            mock.call(transaction=False), mock.call(transaction=True)]
+
+    def test_if_commit_without_instances_dont_use_redis(self, session, model1, redis):
+        session.commit()
+
+        assert redis.execute.call_args_list == []
+        assert session.redis_commit_stats == {'round_trips': 0, 'commands': 0}
+
+
+class TestSessionCommitRedisSetWithBulkInsert(object):
+    def test_if_bulk_inserted_instances_are_seted_on_redis(self, session, model1, redis):
+        model1.insert(session, [{'id': 1}, {'id': 2}])
+
+        assert redis.hmset.call_args_list == [
+            mock.call('test1', {b'1': msgpack.dumps({'id': 1}), b'2': msgpack.dumps({'id': 2})})]
+
+    def test_if_rollback_cleans_instances_to_set_on_redis(self, session, model1, redis):
+        model1.insert(session, [{'id': 1}, {'id': 2}], commit=False)
+        session.rollback()
+        session.commit()
+
+        assert redis.hmset.call_args_list == []
+        assert model1.get(session) == []
+
+    def test_if_bulk_updated_instances_are_seted_on_redis(self, session, model1_related, redis):
+        model1_related.insert(session, [{'id': 1}, {'id': 2}])
+        redis.hmset.reset_mock()
+
+        with mock.patch('falconswagger.models.orm.sqlalchemy_redis.msgpack',
+                        new=mock.MagicMock(dumps=lambda x: x)):
+            model1_related.update(session, [{'id': 1, 'test': 'test1'}, {'id': 2, 'test': 'test2'}])
+
+        assert redis.hmset.call_args_list == [mock.call('test1', {
+            b'1': {'id': 1, 'test': 'test1'},
+            b'2': {'id': 2, 'test': 'test2'}})]
+
+
+@mock.patch('falconswagger.models.orm.sqlalchemy_redis.msgpack', new=mock.MagicMock(dumps=lambda x: x))
+class TestSessionCommitRedisSetWithFields(object):
+    def test_if_instance_is_seted_on_fields_namespace(self, session, model1_related, redis):
+        redis.smembers = lambda x: {b'', b':fields:id'}
+        session.add(model1_related(session, id=1, test='test'))
+        session.commit()
+
+        expected = [
+            mock.call('test1', {b'1': {'id': 1, 'test': 'test'}}),
+            mock.call('test1_:fields:id', {b'1': {'id': 1}})
+        ]
+
+        assert len(expected) == len(redis.hmset.call_args_list)
+
+        for call_ in redis.hmset.call_args_list:
+            assert call_ in expected
+
+
 class TestSessionCommitRedisSetWithoutUseRedisFlag(object):
     def test_if_instance_is_seted_on_redis(self, session, model1_no_redis, redis):
         session.add(model1_no_redis(session, id=1))
@@ -292,6 +400,101 @@ class TestSessionCommitRedisDeleteWithoutUseRedisFlag(object):
         assert redis.hdel.call_args_list == []
 
 
+@pytest.fixture
+def model1_invalidate(request, model_base, redis, session):
+    class model_(model_base):
+        __tablename__ = 'test1'
+        __table_args__ = {'mysql_engine':'innodb'}
+        __cache_policy__ = 'invalidate'
+        id = sa.Column(sa.Integer, primary_key=True)
+        test = sa.Column(sa.String(255))
+
+    model_base.metadata.create_all()
+    return model_
+
+
+@pytest.fixture
+def model2_refresh(request, model_base, redis, session, model1_invalidate):
+    class model_(model_base):
+        __tablename__ = 'test2'
+        __table_args__ = {'mysql_engine':'innodb'}
+        id = sa.Column(sa.Integer, primary_key=True)
+        model1_id = sa.Column(sa.ForeignKey('test1.id'))
+        model1 = sa.orm.relationship(model1_invalidate)
+
+    model_base.metadata.create_all()
+    return model_
+
+
+class TestSessionCommitRedisInvalidatePolicy(object):
+    def test_if_insert_only_deletes_from_redis(self, session, model1_invalidate, redis):
+        model1_invalidate.insert(session, [{'id': 1}, {'id': 2}])
+
+        assert redis.hmset.call_args_list == []
+        assert (redis.hdel.call_args_list == [mock.call('test1', b'1', b'2')] or
+            redis.hdel.call_args_list == [mock.call('test1', b'2', b'1')])
+
+    def test_if_insert_dont_reload_instances_after_commit(
+            self, session, model1_invalidate, redis):
+        session.add_all([model1_invalidate(session, id=i) for i in range(1, 4)])
+        selects = []
+
+        def count_selects(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith('SELECT'):
+                selects.append(statement)
+
+        sa.event.listen(session.bind, 'before_cursor_execute', count_selects)
+        try:
+            session.commit()
+        finally:
+            sa.event.remove(session.bind, 'before_cursor_execute', count_selects)
+
+        assert selects == []
+        assert set(redis.hdel.call_args[0][1:]) == {b'1', b'2', b'3'}
+
+    def test_if_update_only_deletes_from_redis(self, session, model1_invalidate, redis):
+        model1_invalidate.insert(session, {'id': 1})
+        redis.hdel.reset_mock()
+        model1_invalidate.update(session, {'id': 1, 'test': 'test'})
+
+        assert redis.hmset.call_args_list == []
+        assert redis.hdel.call_args_list == [mock.call('test1', b'1')]
+
+    def test_if_update_with_new_id_deletes_both_keys(self, session, model1_invalidate, redis):
+        model1_invalidate.insert(session, {'id': 1})
+        redis.hdel.reset_mock()
+        model1_invalidate.update(session, {'id': 2}, ids={'id': 1})
+
+        assert redis.hdel.call_count == 1
+        assert set(redis.hdel.call_args[0][1:]) == {b'1', b'2'}
+
+    @mock.patch('falconswagger.models.orm.sqlalchemy_redis.msgpack', new=mock.MagicMock(dumps=lambda x: x))
+    def test_if_related_refresh_model_is_seted_on_redis(
+            self, session, model1_invalidate, model2_refresh, redis):
+        model1_invalidate.insert(session, {'id': 1})
+        model2_refresh.insert(session, {'id': 1, 'model1_id': 1})
+        redis.hmset.reset_mock()
+        redis.hdel.reset_mock()
+
+        model1_invalidate.update(session, {'id': 1, 'test': 'test'})
+
+        assert redis.hdel.call_args_list == [mock.call('test1', b'1')]
+        assert redis.hmset.call_args_list == [mock.call('test2', {
+            b'1': {'id': 1, 'model1_id': 1, 'model1': {'id': 1, 'test': 'test'}}})]
+
+    def test_if_get_repopulates_redis(self, session, model1_invalidate):
+        redis = FakeStrictRedis()
+        redis.flushall()
+        redis.sadd('test1_filters_names', '')
+        session.redis_bind = redis
+        model1_invalidate.insert(session, {'id': 1, 'test': 'test'})
+
+        assert redis.hgetall('test1') == {}
+        assert model1_invalidate.get(session, {'id': 1}) == [{'id': 1, 'test': 'test'}]
+        assert msgpack.loads(redis.hget('test1', b'1'), encoding='utf-8') == \
+            {'id': 1, 'test': 'test'}
+
+
 @pytest.fixture
 def model1_related(request, model_base, redis, session):
     class model_(model_base):
@@ -335,7 +538,7 @@ def model3_related(request, model_base, redis, session, model2_related):
     return model_
 
 
-@mock.patch('falconswagger.models.orm.session.msgpack', new=mock.MagicMock(dumps=lambda x: x))
+@mock.patch('falconswagger.models.orm.sqlalchemy_redis.msgpack', new=mock.MagicMock(dumps=lambda x: x))
 class TestSessionCommitWithNestedRelatedModels(object):
     def test_redis_update_nested_related(self, session, model1_related, model2_related, model3_related, redis):
         m1 = model1_related(session)
@@ -405,3 +608,145 @@ class TestSessionCommitWithNestedRelatedModels(object):
 
         assert redis.hmset.call_args_list == [call2, call3] or \
             redis.hmset.call_args_list == [call3, call2]
+
+
+@pytest.fixture
+def local_cache(request):
+    local_cache_ = LocalCache()
+    request.addfinalizer(local_cache_.shutdown)
+    return local_cache_
+
+
+@pytest.fixture
+def model1_local_cache(request, model_base, redis, session, local_cache):
+    class model_(model_base):
+        __tablename__ = 'test1'
+        __table_args__ = {'mysql_engine':'innodb'}
+        __local_cache__ = local_cache
+        id = sa.Column(sa.Integer, primary_key=True)
+        test = sa.Column(sa.String(255))
+
+    model_base.metadata.create_all()
+    return model_
+
+
+@pytest.fixture
+def fake_redis(session):
+    redis = FakeStrictRedis()
+    redis.flushall()
+    redis.sadd('test1_filters_names', '')
+    session.redis_bind = redis
+    return redis
+
+
+class TestSessionCommitWithLocalCache(object):
+    def test_if_get_uses_local_cache(self, session, model1_local_cache, local_cache, fake_redis):
+        model1_local_cache.insert(session, {'id': 1, 'test': 'test'})
+        model1_local_cache.get(session, {'id': 1})
+
+        with mock.patch.object(fake_redis, 'hmget') as hmget:
+            assert model1_local_cache.get(session, {'id': 1}) == [{'id': 1, 'test': 'test'}]
+            assert not hmget.called
+
+        assert local_cache.get_metrics()['hits'] == 1
+
+    def test_if_get_result_dont_share_local_cache_objects(
+            self, session, model1_local_cache, local_cache, fake_redis):
+        model1_local_cache.insert(session, {'id': 1, 'test': 'test'})
+        model1_local_cache.get(session, {'id': 1})[0]['test'] = 'changed'
+        model1_local_cache.get(session, {'id': 1})[0]['test'] = 'changed'
+
+        assert model1_local_cache.get(session, {'id': 1}) == [{'id': 1, 'test': 'test'}]
+        assert local_cache.get_metrics()['hits'] == 2
+
+    def test_if_get_json_uses_local_cache_without_encoding(
+            self, session, model1_local_cache, local_cache, fake_redis):
+        model1_local_cache.insert(session, {'id': 1, 'test': 'test'})
+        objs = model1_local_cache.get_json(session, {'id': 1})
+
+        with mock.patch.object(fake_redis, 'hmget') as hmget, \
+                mock.patch('falconswagger.models.orm.sqlalchemy_redis.json') as json_:
+            assert model1_local_cache.get_json(session, {'id': 1}) == objs
+            assert not hmget.called
+            assert not json_.dumps.called
+
+        assert json.loads(objs[0].decode()) == {'id': 1, 'test': 'test'}
+
+    def test_if_update_invalidates_local_cache(
+            self, session, model1_local_cache, local_cache, fake_redis):
+        model1_local_cache.insert(session, {'id': 1, 'test': 'test'})
+        model1_local_cache.get(session, {'id': 1})
+        model1_local_cache.update(session, {'id': 1, 'test': 'test2'})
+
+        assert local_cache.get_many('test1', [b'1']) == [None]
+        assert model1_local_cache.get(session, {'id': 1}) == [{'id': 1, 'test': 'test2'}]
+
+    def test_if_commit_publishes_invalidated_keys(
+            self, session, model1_local_cache, local_cache, fake_redis):
+        pubsub = fake_redis.pubsub()
+        pubsub.subscribe(local_cache.channel)
+        pubsub.get_message()
+        model1_local_cache.insert(session, {'id': 1})
+
+        message = pubsub.get_message()
+        assert msgpack.loads(message['data']) == [[b'test1', b'1']]
+
+
+@pytest.fixture
+def model1_not_found_ttl(request, model_base, redis, session):
+    class model_(model_base):
+        __tablename__ = 'test1'
+        __table_args__ = {'mysql_engine':'innodb'}
+        __not_found_ttl__ = 60
+        id = sa.Column(sa.Integer, primary_key=True)
+
+    model_base.metadata.create_all()
+    return model_
+
+
+class TestSessionCommitClearsNotFoundMarkers(object):
+    def test_if_insert_deletes_marker_and_sets_object(
+            self, session, model1_not_found_ttl, fake_redis):
+        model1_not_found_ttl.get(session, {'id': 1})
+        model1_not_found_ttl.insert(session, {'id': 1})
+
+        assert msgpack.loads(fake_redis.hget('test1', b'1')) == {b'id': 1}
+        assert session.redis_commit_stats['round_trips'] == 2
+
+    def test_if_insert_with_write_behind_deletes_marker_on_commit(
+            self, session, model1_not_found_ttl, fake_redis):
+        model1_not_found_ttl.get(session, {'id': 1})
+        session.redis_write_behind = mock.MagicMock()
+        model1_not_found_ttl.insert(session, {'id': 1})
+
+        assert fake_redis.hget('test1', b'1') is None
+        assert session.redis_write_behind.put.call_count == 1
+
+    def test_if_insert_with_write_behind_dont_reload_instances(
+            self, session, model1_not_found_ttl, fake_redis):
+        model1_not_found_ttl.get(session, [{'id': i} for i in range(1, 4)])
+        session.redis_write_behind = mock.MagicMock()
+        session.add_all([model1_not_found_ttl(session, id=i) for i in range(1, 4)])
+        selects = []
+
+        def count_selects(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith('SELECT'):
+                selects.append(statement)
+
+        sa.event.listen(session.bind, 'before_cursor_execute', count_selects)
+        try:
+            session.commit()
+        finally:
+            sa.event.remove(session.bind, 'before_cursor_execute', count_selects)
+
+        assert selects == []
+        assert fake_redis.hkeys('test1') == []
+
+    def test_if_update_with_new_id_and_write_behind_deletes_marker(
+            self, session, model1_not_found_ttl, fake_redis):
+        model1_not_found_ttl.insert(session, {'id': 1})
+        model1_not_found_ttl.get(session, {'id': 2})
+        session.redis_write_behind = mock.MagicMock()
+        model1_not_found_ttl.update(session, {'id': 2}, ids={'id': 1})
+
+        assert fake_redis.hget('test1', b'2') is None
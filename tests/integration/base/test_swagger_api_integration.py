@@ -98,6 +98,14 @@ def client_with_schema(model1_with_schema, session):
     return Client(app_)
 
 
+class TestSwaggerAPIBuildBackrefs(object):
+
+    def test_builds_models_backrefs(self, model_base, model1, session):
+        assert model_base.__all_backrefs__ == {}
+        SwaggerAPI([model1], session.bind, session.redis_bind, title='Test API')
+        assert model1 in model_base.__all_backrefs__
+
+
 class TestSwaggerAPIErrorHandlingPOST(object):
 
     def test_integrity_error_handling_with_duplicated_key(self, client, model1):
@@ -246,3 +254,77 @@ class TestSwaggerAPIErrorHandlingPOST(object):
                 'message': 'Something unexpected happened'
             }
         }
+
+
+@pytest.fixture
+def model1_ndjson(model_base):
+    class model2(model_base):
+        __tablename__ = 'model2'
+        __table_args__ = {'mysql_engine': 'innodb'}
+        id = sa.Column(sa.Integer, primary_key=True)
+
+    class model1(model_base):
+        __tablename__ = 'model1'
+        __table_args__ = {'mysql_engine': 'innodb'}
+        id = sa.Column(sa.Integer, primary_key=True)
+        m2_id = sa.Column(sa.ForeignKey('model2.id'))
+
+        __schema__ = {
+            '/model1/ndjson': {
+                'post': {
+                    'operationId': 'post_by_ndjson',
+                    'responses': {'200': {'description': 'test'}},
+                    'parameters': [{
+                        'name': 'body',
+                        'in': 'body',
+                        'schema': {'type': 'object'}
+                    }, {
+                        'name': 'batch_size',
+                        'in': 'query',
+                        'type': 'integer'
+                    }]
+                }
+            }
+        }
+
+    return model1
+
+
+@pytest.fixture
+def client_ndjson(model1_ndjson, session):
+    app_ = SwaggerAPI([model1_ndjson], session.bind, session.redis_bind, title='Test API')
+    return Client(app_)
+
+
+class TestSwaggerAPIPostByNdjson(object):
+
+    def test_post_by_ndjson_inserts_all_lines(self, client_ndjson, model1_ndjson, session):
+        data = '\n'.join(json.dumps({'id': i}) for i in range(1, 6)) + '\n'
+        resp = client_ndjson.post(
+            '/model1/ndjson?batch_size=2', data=data, content_type='application/x-ndjson')
+
+        assert resp.status_code == 200
+        assert json.loads(resp.body) == {'inserted': 5, 'failed': 0, 'failed_lines': []}
+        assert model1_ndjson.get(session, todict=False) == \
+            [model1_ndjson.get(session, {'id': i}, todict=False)[0] for i in range(1, 6)]
+
+    def test_post_by_ndjson_returns_failed_lines(self, client_ndjson, model1_ndjson, session):
+        data = '\n'.join([
+            '{"id": 1}',
+            '{"id": 1}',
+            '{invalid',
+            '',
+            '[1]',
+            '{"id": 2, "m2_id": 1}',
+            '{"id": 3}'
+        ])
+        resp = client_ndjson.post(
+            '/model1/ndjson?batch_size=3', data=data, content_type='application/x-ndjson')
+
+        assert json.loads(resp.body) == {'inserted': 2, 'failed': 4, 'failed_lines': [1, 2, 4, 5]}
+        assert [obj['id'] for obj in model1_ndjson.get(session)] == [1, 3]
+
+    def test_post_by_ndjson_with_json_content_type(self, client_ndjson):
+        resp = client_ndjson.post('/model1/ndjson', data='{"id": 1}')
+
+        assert resp.status_code == 400
@@ -0,0 +1,199 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.models.orm.sqlalchemy_redis import ModelSQLAlchemyRedisFactory
+from falconswagger.models.orm.write_behind import RedisWriteBehind
+from fakeredis import FakeStrictRedis
+import time
+
+import msgpack
+import pytest
+import sqlalchemy as sa
+
+
+@pytest.fixture
+def model_base():
+    return ModelSQLAlchemyRedisFactory.make()
+
+
+@pytest.fixture
+def redis():
+    redis_ = FakeStrictRedis()
+    redis_.flushall()
+    redis_.sadd('test1_filters_names', '')
+    redis_.sadd('test2_filters_names', '')
+    return redis_
+
+
+@pytest.fixture
+def model1(model_base, session):
+    class model1(model_base):
+        __tablename__ = 'test1'
+        __table_args__ = {'mysql_engine':'innodb'}
+        id = sa.Column(sa.Integer, primary_key=True)
+        name = sa.Column(sa.String(255))
+
+    model_base.metadata.create_all()
+    return model1
+
+
+@pytest.fixture
+def model2(model_base, model1, session):
+    class model2(model_base):
+        __tablename__ = 'test2'
+        __table_args__ = {'mysql_engine':'innodb'}
+        id = sa.Column(sa.Integer, primary_key=True)
+        model1_id = sa.Column(sa.ForeignKey('test1.id'))
+        model1 = sa.orm.relationship('model1')
+
+    model_base.metadata.create_all()
+    return model2
+
+
+@pytest.fixture
+def write_behind(session, redis, request):
+    write_behind_ = RedisWriteBehind(session.bind, redis, max_staleness=60)
+    session.redis_write_behind = write_behind_
+    request.addfinalizer(write_behind_.shutdown)
+    return write_behind_
+
+
+def get_cached(redis, key, inst_key):
+    obj = redis.hget(key, inst_key)
+    return obj if obj is None else msgpack.loads(obj, encoding='utf-8')
+
+
+class TestRedisWriteBehind(object):
+
+    def test_commit_dont_write_on_redis(self, session, model1, write_behind, redis):
+        model1.insert(session, {'id': 1, 'name': 'test'})
+
+        assert redis.hgetall('test1') == {}
+        assert write_behind.get_metrics()['pending_items'] == 1
+
+    def test_flush_writes_on_redis(self, session, model1, write_behind, redis):
+        model1.insert(session, {'id': 1, 'name': 'test'})
+        write_behind.flush()
+
+        assert get_cached(redis, 'test1', b'1') == {'id': 1, 'name': 'test'}
+        assert write_behind.get_metrics()['pending_items'] == 0
+
+    def test_coalesces_commits(self, session, model1, write_behind, redis):
+        model1.insert(session, {'id': 1, 'name': 'test'})
+        model1.update(session, {'id': 1, 'name': 'test2'})
+        model1.update(session, {'id': 1, 'name': 'test3'})
+
+        metrics = write_behind.get_metrics()
+        assert metrics['pending_items'] == 1
+        assert metrics['coalesced_items'] == 2
+
+        write_behind.flush()
+        assert get_cached(redis, 'test1', b'1') == {'id': 1, 'name': 'test3'}
+        assert write_behind.get_metrics()['flushes'] == 1
+
+    def test_flush_deletes_from_redis(self, session, model1, write_behind, redis):
+        model1.insert(session, {'id': 1, 'name': 'test'})
+        write_behind.flush()
+
+        model1.delete(session, {'id': 1})
+        write_behind.flush()
+
+        assert redis.hget('test1', b'1') is None
+        assert write_behind.get_metrics()['deleted_items'] == 1
+
+    def test_flush_deletes_by_identity_key(self, session, model1, write_behind, redis):
+        model1.insert(session, {'id': 1, 'name': 'test'})
+        write_behind.flush()
+
+        inst = session.query(model1).get(1)
+        inst.id = 2
+        session.delete(inst)
+        session.commit()
+        write_behind.flush()
+
+        assert redis.hget('test1', b'1') is None
+
+    def test_insert_and_delete_before_flush(self, session, model1, write_behind, redis):
+        model1.insert(session, {'id': 1, 'name': 'test'})
+        model1.delete(session, {'id': 1})
+        write_behind.flush()
+
+        assert redis.hget('test1', b'1') is None
+
+    def test_flush_refreshes_related(self, session, model1, model2, write_behind, redis):
+        model1.insert(session, {'id': 1, 'name': 'test'})
+        model2.insert(session, {'id': 1, 'model1_id': 1})
+        write_behind.flush()
+
+        model1.update(session, {'id': 1, 'name': 'test2'})
+        write_behind.flush()
+
+        assert get_cached(redis, 'test2', b'1') == {
+            'id': 1, 'model1_id': 1, 'model1': {'id': 1, 'name': 'test2'}}
+
+    def test_flush_invalidates_on_error(self, session, model1, write_behind, redis):
+        model1.insert(session, {'id': 1, 'name': 'test'})
+        write_behind.flush()
+        model1.update(session, {'id': 1, 'name': 'test2'})
+        model1.get_todict_serializer = lambda schema=None: 1 / 0
+        write_behind.flush()
+
+        assert redis.hget('test1', b'1') is None
+        assert write_behind.get_metrics()['errors'] == 1
+
+    def test_refreshes_in_background_within_max_staleness(
+            self, session, model1, write_behind, redis):
+        write_behind.max_staleness = 0.01
+        write_behind.start()
+        model1.insert(session, {'id': 1, 'name': 'test'})
+
+        for _ in range(200):
+            if redis.hget('test1', b'1') is not None:
+                break
+            time.sleep(0.01)
+
+        assert get_cached(redis, 'test1', b'1') == {'id': 1, 'name': 'test'}
+
+    def test_put_starts_the_flush_thread(self, session, model1, write_behind, redis):
+        write_behind.max_staleness = 0.01
+        model1.insert(session, {'id': 1, 'name': 'test'})
+
+        for _ in range(200):
+            if write_behind.get_metrics()['flushes']:
+                break
+            time.sleep(0.01)
+
+        assert get_cached(redis, 'test1', b'1') == {'id': 1, 'name': 'test'}
+
+    def test_shutdown_flushes_pending(self, session, model1, write_behind, redis):
+        write_behind.start()
+        model1.insert(session, {'id': 1, 'name': 'test'})
+        write_behind.shutdown()
+
+        assert get_cached(redis, 'test1', b'1') == {'id': 1, 'name': 'test'}
+
+    def test_put_after_shutdown_writes_on_redis(self, session, model1, write_behind, redis):
+        write_behind.shutdown()
+        model1.insert(session, {'id': 1, 'name': 'test'})
+
+        assert get_cached(redis, 'test1', b'1') == {'id': 1, 'name': 'test'}
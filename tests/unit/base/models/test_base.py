@@ -466,3 +466,195 @@ class TestModelBaseBuildsHeadersParameters(object):
         assert model.insert.call_args_list == [
             mock.call(req.context['session'], req.context['parameters']['body'], **kwargs_expected)
         ]
+
+
+class TestModelBaseCursorParameters(object):
+    def test_if_sets_cursor_parameter_with_limit(self):
+        schema = {
+            '/test': {
+                'get': {
+                    'responses': {'200': {'description': 'test'}},
+                    'operationId': 'get_by_body',
+                    'parameters': [{
+                        'name': 'limit',
+                        'in': 'query',
+                        'type': 'integer'
+                    }]
+                }
+            }
+        }
+        model = ModelRedisBaseMeta('TestModel', (ModelRedisBase,), {'__schema__': schema})
+        method_schema = model.__schema__['/test']['get']
+
+        assert method_schema['parameters'][1]['name'] == 'cursor'
+        assert method_schema['parameters'][1]['in'] == 'query'
+        assert method_schema['parameters'][1]['type'] == 'string'
+        assert 'X-Next-Cursor' in method_schema['responses']['200']['headers']
+
+    def test_if_not_sets_cursor_parameter_without_limit(self):
+        schema = {
+            '/test': {
+                'get': {
+                    'responses': {'200': {'description': 'test'}},
+                    'operationId': 'get_by_body'
+                }
+            }
+        }
+        model = ModelRedisBaseMeta('TestModel', (ModelRedisBase,), {'__schema__': schema})
+
+        assert 'parameters' not in model.__schema__['/test']['get']
+        assert 'headers' not in model.__schema__['/test']['get']['responses']['200']
+
+    def test_if_get_by_body_calls_get_page_with_cursor(self):
+        schema = {
+            '/test': {
+                'get': {
+                    'responses': {'200': {'description': 'test'}},
+                    'operationId': 'get_by_body',
+                    'parameters': [{
+                        'name': 'limit',
+                        'in': 'query',
+                        'type': 'integer'
+                    }]
+                }
+            }
+        }
+        model = ModelRedisBaseMeta('TestModel', (ModelRedisBase,), {'__schema__': schema})
+        model.get_page = mock.MagicMock(return_value=([{}], 'next'))
+        req = mock.MagicMock(
+            context={'session': mock.MagicMock()},
+            params={'limit': '1', 'cursor': 'test'},
+            path='/test',
+            method='GET')
+        req.get_header.return_value = None
+        req.content_length = None
+        resp = mock.MagicMock()
+        router = ModelRouter()
+        router.add_model(model)
+        route, _ = router.get_route_and_params(req)
+        route(req, resp)
+
+        assert model.get_page.call_args_list == [
+            mock.call(req.context['session'], cursor='test', limit=1)]
+        assert resp.set_header.call_args_list == [mock.call('X-Next-Cursor', 'next')]
+
+
+class TestModelBaseStreamParameters(object):
+    def test_if_sets_stream_parameter_with_query_parameters(self):
+        schema = {
+            '/test': {
+                'get': {
+                    'responses': {'200': {'description': 'test'}},
+                    'operationId': 'get_by_body',
+                    'parameters': [{
+                        'name': 'limit',
+                        'in': 'query',
+                        'type': 'integer'
+                    }]
+                }
+            }
+        }
+        model = ModelRedisBaseMeta('TestModel', (ModelRedisBase,), {'__schema__': schema})
+        parameters = model.__schema__['/test']['get']['parameters']
+
+        assert [param['name'] for param in parameters] == ['limit', 'cursor', 'stream']
+        assert parameters[2]['in'] == 'query'
+        assert parameters[2]['type'] == 'boolean'
+
+    def test_if_get_by_body_not_streams_with_stream_false(self):
+        schema = {
+            '/test': {
+                'get': {
+                    'responses': {'200': {'description': 'test'}},
+                    'operationId': 'get_by_body',
+                    'parameters': [{
+                        'name': 'limit',
+                        'in': 'query',
+                        'type': 'integer'
+                    }]
+                }
+            }
+        }
+        model = ModelRedisBaseMeta('TestModel', (ModelRedisBase,), {'__schema__': schema})
+        model.get = mock.MagicMock(return_value=[{}])
+        model._stream = mock.MagicMock()
+        req = mock.MagicMock(
+            context={'session': mock.MagicMock()},
+            params={'stream': 'false'},
+            path='/test',
+            method='GET')
+        req.get_header.return_value = None
+        req.content_length = None
+        resp = mock.MagicMock()
+        router = ModelRouter()
+        router.add_model(model)
+        route, _ = router.get_route_and_params(req)
+        route(req, resp)
+
+        assert model._stream.call_count == 0
+        assert model.get.call_args_list == [mock.call(req.context['session'])]
+
+    @pytest.mark.parametrize('stream,expected', [
+        ('true', True), ('1', True), ('false', False), ('0', False), (False, False)])
+    def test_if_builds_stream_flag_from_raw_values(self, stream, expected):
+        assert ModelRedisBaseMeta._build_stream_flag(ModelRedisBase, stream) is expected
+
+    def test_if_raises_error_on_invalid_stream(self):
+        with pytest.raises(ModelBaseError) as exc_info:
+            ModelRedisBaseMeta._build_stream_flag(ModelRedisBase, 'yes')
+
+        assert exc_info.value.args == ("invalid stream 'yes'",)
+
+
+class TestModelBasePostByNdjson(object):
+    @pytest.mark.parametrize('batch_size', ['test', '0'])
+    def test_if_raises_error_on_invalid_batch_size(self, batch_size):
+        schema = {
+            '/test': {
+                'post': {
+                    'responses': {'200': {'description': 'test'}},
+                    'operationId': 'post_by_ndjson'
+                }
+            }
+        }
+        model = ModelRedisBaseMeta('TestModel', (ModelRedisBase,), {'__schema__': schema})
+        req = mock.MagicMock(
+            context={
+                'session': mock.MagicMock(),
+                'parameters': {
+                    'body': {},
+                    'path': {},
+                    'headers': {},
+                    'query_string': {'batch_size': batch_size}
+                }
+            },
+            content_type='application/x-ndjson')
+
+        with pytest.raises(ModelBaseError) as exc_info:
+            model.post_by_ndjson(req, mock.MagicMock())
+
+        assert exc_info.value.args == ("invalid batch_size '{}'".format(batch_size),)
+
+
+class TestModelBaseJobParameters(object):
+    def test_if_sets_offset_parameter_on_get_job(self):
+        schema = {
+            '/test/job': {
+                'get': {
+                    'responses': {'200': {'description': 'test'}},
+                    'operationId': 'get_job',
+                    'parameters': [{
+                        'name': 'hash',
+                        'in': 'query',
+                        'type': 'string',
+                        'required': True
+                    }]
+                }
+            }
+        }
+        model = ModelRedisBaseMeta('TestModel', (ModelRedisBase,), {'__schema__': schema})
+        parameters = model.__schema__['/test/job']['get']['parameters']
+
+        assert parameters[1]['name'] == 'offset'
+        assert parameters[1]['in'] == 'query'
+        assert parameters[1]['type'] == 'integer'
@@ -0,0 +1,107 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.models.orm import blob_codec as blob_codec_module
+from falconswagger.models.orm.blob_codec import BlobCodec
+from falconswagger.exceptions import ModelBaseError
+import os
+import pytest
+import zlib
+
+
+DATA = b'test' * 1000
+
+
+class TestBlobCodec(object):
+
+    def test_does_not_compress_small_blobs(self):
+        codec = BlobCodec(min_size=len(DATA) + 1)
+
+        assert codec.compress(DATA) == DATA
+        assert codec.get_metrics()['skipped'] == 1
+
+    def test_compresses_with_zlib_and_header(self):
+        codec = BlobCodec(min_size=10)
+        blob = codec.compress(DATA)
+
+        assert blob[:1] == b'\x01'
+        assert zlib.decompress(blob[1:]) == DATA
+        assert codec.decompress(blob) == DATA
+
+    def test_keeps_incompressible_blobs(self):
+        codec = BlobCodec(min_size=10)
+        data = b'\x80' + os.urandom(100)
+
+        assert codec.compress(data) == data
+        assert codec.decompress(data) == data
+
+    def test_decompresses_blobs_without_header(self):
+        codec = BlobCodec()
+        assert codec.decompress(b'\x81\xa2id\x01') == b'\x81\xa2id\x01'
+
+    def test_raises_model_error_with_unavailable_compression(self):
+        with pytest.raises(ModelBaseError) as error:
+            BlobCodec(compression='invalid')
+
+        assert error.value.args[0].startswith(
+            "compression 'invalid' is not available, must be one of: zlib")
+
+    def test_raises_model_error_decompressing_unavailable_compression(self):
+        codec = BlobCodec()
+        codec._decompressors.pop(b'\x02', None)
+
+        with pytest.raises(ModelBaseError):
+            codec.decompress(b'\x02test')
+
+    def test_get_metrics(self):
+        codec = BlobCodec(min_size=10)
+        blob = codec.compress(DATA)
+        codec.compress(b'test')
+        codec.decompress(blob)
+        metrics = codec.get_metrics()
+
+        assert metrics['compression'] == 'zlib'
+        assert metrics['compressed'] == 1
+        assert metrics['skipped'] == 1
+        assert metrics['decompressed'] == 1
+        assert metrics['bytes_in'] == len(DATA)
+        assert metrics['bytes_out'] == len(blob)
+        assert metrics['compression_ratio'] == len(DATA) / len(blob)
+        assert metrics['compress_time'] > 0
+        assert metrics['decompress_time'] > 0
+
+    @pytest.mark.skipif(blob_codec_module.lz4_frame is None, reason='lz4 is not installed')
+    def test_compresses_with_lz4(self):
+        codec = BlobCodec(min_size=10, compression='lz4')
+        blob = codec.compress(DATA)
+
+        assert blob[:1] == b'\x02'
+        assert codec.decompress(blob) == DATA
+
+    @pytest.mark.skipif(blob_codec_module.zstandard is None, reason='zstandard is not installed')
+    def test_compresses_with_zstd(self):
+        codec = BlobCodec(min_size=10, compression='zstd')
+        blob = codec.compress(DATA)
+
+        assert blob[:1] == b'\x03'
+        assert codec.decompress(blob) == DATA
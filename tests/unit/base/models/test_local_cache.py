@@ -0,0 +1,132 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.models.orm.local_cache import LocalCache
+from fakeredis import FakeStrictRedis
+from unittest import mock
+import time
+
+import pytest
+
+
+@pytest.fixture
+def redis():
+    redis_ = FakeStrictRedis()
+    redis_.flushall()
+    return redis_
+
+
+@pytest.fixture
+def local_cache(request, redis):
+    local_cache_ = LocalCache(max_size=2, ttl=60, redis_bind=redis, poll_timeout=0.01)
+    request.addfinalizer(local_cache_.shutdown)
+    return local_cache_
+
+
+class TestLocalCache(object):
+
+    def test_get_many_without_entries(self, local_cache):
+        assert local_cache.get_many('test', [b'1', b'2']) == [None, None]
+
+    def test_get_many_with_entries(self, local_cache):
+        local_cache.set_many('test', {b'1': {'id': 1}})
+
+        assert local_cache.get_many('test', [b'1', b'2']) == [{'id': 1}, None]
+        assert local_cache.get_many('test2', [b'1']) == [None]
+
+    def test_get_many_returns_copies(self, local_cache):
+        obj = {'id': 1, 'model2': [{'id': 2}]}
+        local_cache.set_many('test', {b'1': obj})
+        obj['model2'].append({'id': 3})
+
+        cached = local_cache.get_many('test', [b'1'])[0]
+        cached['model2'][0]['id'] = 4
+
+        assert local_cache.get_many('test', [b'1']) == [{'id': 1, 'model2': [{'id': 2}]}]
+
+    def test_get_many_with_raw_entries(self, local_cache):
+        local_cache.set_many('test', {b'1': b'{"id": 1}'}, raw=True)
+
+        assert local_cache.get_many('test', [b'1'], raw=True) == [b'{"id": 1}']
+        assert local_cache.get_many('test', [b'1']) == [None]
+
+    def test_invalidate_drops_raw_entries(self, local_cache):
+        local_cache.set_many('test', {b'1': {'id': 1}})
+        local_cache.set_many('test', {b'1': b'{"id": 1}'}, raw=True)
+        local_cache.invalidate([('test', b'1')])
+
+        assert local_cache.get_many('test', [b'1']) == [None]
+        assert local_cache.get_many('test', [b'1'], raw=True) == [None]
+        assert local_cache.get_metrics()['invalidations'] == 1
+
+    def test_evicts_least_recently_used(self, local_cache):
+        local_cache.set_many('test', {b'1': {'id': 1}, b'2': {'id': 2}})
+        local_cache.get_many('test', [b'1'])
+        local_cache.set_many('test', {b'3': {'id': 3}})
+
+        assert local_cache.get_many('test', [b'1', b'2', b'3']) == [{'id': 1}, None, {'id': 3}]
+        assert local_cache.get_metrics()['evictions'] == 1
+
+    def test_expires_entries(self, local_cache):
+        local_cache.set_many('test', {b'1': {'id': 1}})
+
+        with mock.patch('falconswagger.models.orm.local_cache.time.time',
+                        return_value=time.time() + 61):
+            assert local_cache.get_many('test', [b'1']) == [None]
+
+        assert local_cache.get_metrics()['expirations'] == 1
+
+    def test_invalidate(self, local_cache):
+        local_cache.set_many('test', {b'1': {'id': 1}, b'2': {'id': 2}})
+        local_cache.invalidate([('test', b'1'), ('test', b'3')])
+
+        assert local_cache.get_many('test', [b'1', b'2']) == [None, {'id': 2}]
+        assert local_cache.get_metrics()['invalidations'] == 1
+
+    def test_get_metrics(self, local_cache):
+        local_cache.set_many('test', {b'1': {'id': 1}})
+        local_cache.get_many('test', [b'1', b'2'])
+        local_cache.get_many('test', [b'1'])
+
+        assert local_cache.get_metrics() == {
+            'size': 1,
+            'max_size': 2,
+            'hits': 2,
+            'misses': 1,
+            'hit_ratio': 2 / 3,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0
+        }
+
+    def test_invalidates_by_published_messages(self, local_cache, redis):
+        local_cache.start()
+        local_cache.set_many('test', {b'1': {'id': 1}, b'2': {'id': 2}})
+        local_cache.publish(redis, [('test', b'1')])
+
+        for _ in range(200):
+            if local_cache.get_metrics()['invalidations']:
+                break
+            time.sleep(0.01)
+
+        assert local_cache.get_many('test', [b'1', b'2']) == [None, {'id': 2}]
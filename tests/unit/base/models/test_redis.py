@@ -22,10 +22,12 @@
 
 
 from falconswagger.models.orm.redis import ModelRedisMeta, ModelRedisFactory
+from falconswagger.models.orm.blob_codec import BlobCodec
 from falconswagger.exceptions import ModelBaseError
 from unittest import mock
 import pytest
 import msgpack
+import zlib
 
 
 class TestModelRedisFactory(object):
@@ -260,6 +262,11 @@ class TestModelRedisMetaGetAll(object):
 
 class TestModelRedisMetaGetMany(object):
 
+    def test_get_many_with_fields(self, model):
+        session = mock.MagicMock()
+        session.redis_bind.hmget.return_value = [msgpack.dumps({'id': 1, 'field1': 'test'})]
+        assert model.get(session, {'id': 1}, fields=['field1']) == [{'field1': 'test'}]
+
     def test_get_many(self, model):
         session = mock.MagicMock()
         model.get(session, {'id': 1})
@@ -279,3 +286,91 @@ class TestModelRedisMetaGetMany(object):
         session = mock.MagicMock()
         model.get(session, [{'id': 1}, {'id': 2}, {'id': 3}], offset=2)
         assert session.redis_bind.hmget.call_args_list == [mock.call('test', b'3')]
+
+
+class TestModelRedisMetaGetIter(object):
+
+    def test_get_iter_all(self, model):
+        session = mock.MagicMock()
+        session.redis_bind.hscan_iter.return_value = iter([
+            (b'1', msgpack.dumps({'id': 1})), (b'2', msgpack.dumps({'id': 2}))])
+
+        assert list(model.get_iter(session)) == [{'id': 1}, {'id': 2}]
+        assert session.redis_bind.hscan_iter.call_args_list == [
+            mock.call('test', count=model.STREAM_CHUNKS)]
+
+    def test_get_iter_all_with_limit_and_offset(self, model):
+        session = mock.MagicMock()
+        session.redis_bind.hscan_iter.return_value = iter([
+            (b'1', msgpack.dumps({'id': 1})),
+            (b'2', msgpack.dumps({'id': 2})),
+            (b'3', msgpack.dumps({'id': 3}))])
+
+        assert list(model.get_iter(session, limit=1, offset=1)) == [{'id': 2}]
+
+    def test_get_iter_many_with_chunks(self, model):
+        session = mock.MagicMock()
+        session.redis_bind.hmget.side_effect = [
+            [msgpack.dumps({'id': 1})], [msgpack.dumps({'id': 2})]]
+        model.STREAM_CHUNKS = 1
+
+        assert list(model.get_iter(session, [{'id': 1}, {'id': 2}])) == [{'id': 1}, {'id': 2}]
+        assert session.redis_bind.hmget.call_args_list == [
+            mock.call('test', b'1'), mock.call('test', b'2')]
+
+
+class TestModelRedisMetaGetPage(object):
+
+    def test_get_page_without_cursor(self, model):
+        session = mock.MagicMock()
+        session.redis_bind.hkeys.return_value = [b'1', b'2', b'3']
+        session.redis_bind.hmget.return_value = [msgpack.dumps({'id': 1})]
+        objs, cursor = model.get_page(session, limit=1)
+
+        assert objs == [{'id': 1}]
+        assert session.redis_bind.hmget.call_args_list == [mock.call('test', b'1')]
+        assert model._decode_cursor(cursor) == 1
+
+    def test_get_page_with_cursor(self, model):
+        session = mock.MagicMock()
+        session.redis_bind.hkeys.return_value = [b'1', b'2', b'3']
+        session.redis_bind.hmget.return_value = [msgpack.dumps({'id': 3})]
+        objs, cursor = model.get_page(session, limit=2, cursor=model._encode_cursor(2))
+
+        assert objs == [{'id': 3}]
+        assert session.redis_bind.hmget.call_args_list == [mock.call('test', b'3')]
+        assert cursor is None
+
+    def test_get_page_with_invalid_cursor(self, model):
+        session = mock.MagicMock()
+
+        with pytest.raises(ModelBaseError) as exc_info:
+            model.get_page(session, limit=2, cursor='test')
+
+        assert exc_info.value.args == ("invalid cursor 'test'",)
+
+
+@pytest.fixture
+def model_blob_codec():
+    return ModelRedisFactory.make(
+        'TestModel', 'test', ['id'], {}, blob_codec=BlobCodec(min_size=0))
+
+
+class TestModelRedisMetaBlobCodec(object):
+
+    def test_insert_compresses_objects(self, model_blob_codec):
+        session = mock.MagicMock()
+        model_blob_codec.insert(session, [{'id': 1, 'field1': 'test' * 100}])
+
+        blob = session.redis_bind.hmset.call_args[0][1][b'1']
+        assert blob[:1] == BlobCodec.HEADERS['zlib']
+        assert msgpack.loads(zlib.decompress(blob[1:]), encoding='utf-8') == \
+            {'id': 1, 'field1': 'test' * 100}
+
+    def test_get_decompresses_new_and_old_objects(self, model_blob_codec):
+        session = mock.MagicMock()
+        session.redis_bind.hmget.return_value = [
+            BlobCodec.HEADERS['zlib'] + zlib.compress(msgpack.dumps({'id': 1})),
+            msgpack.dumps({'id': 2})]
+
+        assert model_blob_codec.get(session, [{'id': 1}, {'id': 2}]) == [{'id': 1}, {'id': 2}]
@@ -0,0 +1,145 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.models.orm.single_flight import SingleFlight
+from fakeredis import FakeStrictRedis
+from threading import Thread, Timer
+
+import pytest
+
+
+@pytest.fixture
+def redis():
+    redis_ = FakeStrictRedis()
+    redis_.flushall()
+    return redis_
+
+
+class TestSingleFlight(object):
+
+    def test_begin_leads_keys_not_in_flight(self, redis):
+        single_flight = SingleFlight()
+        flight = single_flight.begin(redis, 'test', [b'1', b'2'])
+
+        assert flight.leading == [b'1', b'2']
+        assert flight.waiting == []
+        assert single_flight.get_metrics()['in_flight'] == 2
+
+    def test_begin_waits_keys_in_flight(self, redis):
+        single_flight = SingleFlight()
+        single_flight.begin(redis, 'test', [b'1'])
+        flight = single_flight.begin(redis, 'test', [b'1', b'2'])
+
+        assert flight.leading == [b'2']
+        assert flight.waiting == [b'1']
+
+    def test_end_releases_waiters(self, redis):
+        single_flight = SingleFlight(wait_timeout=5)
+        leader = single_flight.begin(redis, 'test', [b'1'])
+        follower = single_flight.begin(redis, 'test', [b'1'])
+        Timer(0.01, single_flight.end, (redis, leader)).start()
+
+        single_flight.wait_local(follower)
+
+        assert single_flight.get_metrics() == {
+            'in_flight': 0,
+            'leads': 1,
+            'local_waits': 1,
+            'remote_waits': 0,
+            'wait_timeouts': 0
+        }
+
+    def test_wait_local_is_bounded(self, redis):
+        single_flight = SingleFlight(wait_timeout=0.01)
+        single_flight.begin(redis, 'test', [b'1'])
+        follower = single_flight.begin(redis, 'test', [b'1'])
+
+        single_flight.wait_local(follower)
+
+        assert single_flight.get_metrics()['wait_timeouts'] == 1
+
+    def test_begin_with_redis_lock_sets_lock_key(self, redis):
+        single_flight = SingleFlight(redis_lock=True)
+        flight = single_flight.begin(redis, 'test', [b'1'])
+
+        assert flight.leading == [b'1']
+        assert redis.exists(b'test:1:lock')
+
+        single_flight.end(redis, flight)
+        assert not redis.exists(b'test:1:lock')
+
+    def test_end_keeps_lock_taken_by_other_process(self, redis):
+        single_flight = SingleFlight(redis_lock=True)
+        flight = single_flight.begin(redis, 'test', [b'1'])
+        redis.set(b'test:1:lock', b'other')
+
+        single_flight.end(redis, flight)
+
+        assert redis.get(b'test:1:lock') == b'other'
+        assert single_flight.get_metrics()['in_flight'] == 0
+
+    def test_begin_with_redis_lock_held_by_other_process(self, redis):
+        redis.set(b'test:1:lock', b'1')
+        single_flight = SingleFlight(redis_lock=True)
+        flight = single_flight.begin(redis, 'test', [b'1', b'2'])
+
+        assert flight.leading == [b'2']
+        assert flight.waiting == [b'1']
+        assert flight.remote_keys == [b'1']
+
+    def test_wait_remote_until_lock_released(self, redis):
+        redis.set(b'test:1:lock', b'1')
+        single_flight = SingleFlight(redis_lock=True, wait_timeout=5)
+        flight = single_flight.begin(redis, 'test', [b'1'])
+        Timer(0.01, redis.delete, (b'test:1:lock',)).start()
+
+        single_flight.wait_remote(redis, flight)
+
+        assert single_flight.get_metrics()['wait_timeouts'] == 0
+
+    def test_wait_remote_is_bounded(self, redis):
+        redis.set(b'test:1:lock', b'1')
+        single_flight = SingleFlight(redis_lock=True, wait_timeout=0.01)
+        flight = single_flight.begin(redis, 'test', [b'1'])
+
+        single_flight.wait_remote(redis, flight)
+
+        assert single_flight.get_metrics()['wait_timeouts'] == 1
+
+    def test_wait_remote_releases_local_waiters_of_leading_keys(self, redis):
+        redis.set(b'test:1:lock', b'1')
+        single_flight = SingleFlight(redis_lock=True, wait_timeout=5)
+        leader = single_flight.begin(redis, 'test', [b'1', b'2'])
+        follower = single_flight.begin(redis, 'test', [b'2'])
+        thread = Thread(target=single_flight.wait_remote, args=(redis, leader))
+        thread.start()
+
+        assert follower.events[0].wait(1)
+        assert redis.exists(b'test:1:lock')
+        assert not redis.exists(b'test:2:lock')
+
+        redis.delete(b'test:1:lock')
+        thread.join()
+        single_flight.end(redis, leader)
+
+        assert single_flight.get_metrics()['in_flight'] == 0
@@ -161,6 +161,23 @@ class TestModelBaseInit(object):
     def test_if_builds_backrefs_correctly_with_two_models(self, model1, model2, model3):
         assert model1.__backrefs__ == {model2.model1, model3.model1}
 
+    def test_builds_backrefs_only_on_first_use(self, model_base, model1, model2):
+        assert model_base.__all_backrefs__ == {}
+        assert model1.__backrefs__ == {model2.model1}
+        assert model_base.__all_backrefs__ == {model1: {model2.model1}, model2: set()}
+
+    def test_rebuilds_backrefs_after_new_model(self, model_base, model1, model2):
+        assert model1.__backrefs__ == {model2.model1}
+
+        class model3(model_base):
+            __tablename__ = 'model3'
+            id = sa.Column(sa.Integer, primary_key=True)
+            model1_id = sa.Column(sa.ForeignKey('model1.id'))
+            model1 = sa.orm.relationship('model1')
+
+        assert model_base.__all_backrefs__ == {}
+        assert model1.__backrefs__ == {model2.model1, model3.model1}
+
     def test_if_builds_primaries_keys_correctly(self, model_base):
         class model(model_base):
                 __tablename__ = 'test'
@@ -170,6 +187,53 @@ class TestModelBaseInit(object):
 
         assert model.primaries_keys == {'id1': model.id1, 'id2': model.id2, 'id3': model.id3}
 
+    def test_sets_default_cache_policy(self, model1):
+        assert model1.__cache_policy__ == 'refresh'
+
+    def test_raises_model_error_with_invalid_cache_policy(self, model_base):
+        with pytest.raises(ModelBaseError) as error:
+            class model(model_base):
+                __tablename__ = 'test'
+                __cache_policy__ = 'invalid'
+                id = sa.Column(sa.Integer, primary_key=True)
+
+        assert error.value.args == (
+            "invalid cache policy 'invalid', must be one of: refresh, invalidate",)
+
+    def test_sets_default_cache_layout(self, model1):
+        assert model1.__cache_layout__ == 'hash'
+        assert model1.__cache_ttl__ is None
+
+    def test_raises_model_error_with_invalid_cache_layout(self, model_base):
+        with pytest.raises(ModelBaseError) as error:
+            class model(model_base):
+                __tablename__ = 'test'
+                __cache_layout__ = 'invalid'
+                id = sa.Column(sa.Integer, primary_key=True)
+
+        assert error.value.args == (
+            "invalid cache layout 'invalid', must be one of: hash, keys",)
+
+    def test_raises_model_error_with_cache_ttl_and_hash_layout(self, model_base):
+        with pytest.raises(ModelBaseError) as error:
+            class model(model_base):
+                __tablename__ = 'test'
+                __cache_ttl__ = 60
+                id = sa.Column(sa.Integer, primary_key=True)
+
+        assert error.value.args == (
+            "cache ttl requires the 'keys' cache layout, got 'hash'",)
+
+    def test_raises_model_error_with_invalid_cache_encoding(self, model_base):
+        with pytest.raises(ModelBaseError) as error:
+            class model(model_base):
+                __tablename__ = 'test'
+                __cache_encoding__ = 'invalid'
+                id = sa.Column(sa.Integer, primary_key=True)
+
+        assert error.value.args == (
+            "invalid cache encoding 'invalid', must be one of: msgpack, json",)
+
     def test_raises_model_error_with_invalid_base_class(self):
         class model(object):
             __baseclass_name__ = 'Test'
@@ -261,14 +325,164 @@ class TestModelBaseTodict(object):
             }
         }
 
+    def test_todict_with_uselist_relationship(self, model1, model2_uselist):
+        m2 = model2_uselist(mock.MagicMock(), id=1, model1=[{'id': 1, '_operation': 'insert'}])
+        assert m2.todict() == {'id': 1, 'model1_id': None, 'model1': [{'id': 1}]}
+
+    def test_todict_serializer_is_cached_by_schema(self, model1, model2):
+        serializer = model2.get_todict_serializer({'model1': False})
+
+        assert model2.get_todict_serializer({'model1': False}) is serializer
+        assert model2.get_todict_serializer({'model1': True}) is not serializer
+        assert model2.get_todict_serializer() is model2.get_todict_serializer({})
+
+    def test_todict_serializer_is_cached_by_nested_schema(self, model1, model2):
+        serializer = model2.get_todict_serializer({'model1': {'id': True}})
+
+        assert model2.get_todict_serializer({'model1': {'id': True}}) is serializer
+        assert model2.get_todict_serializer({'model1': {'id': False}}) is not serializer
+
+    def test_todict_follows_todict_schema_changes(self, model1, model2):
+        m2 = model2(mock.MagicMock(), id=1)
+        assert m2.todict() == {'id': 1, 'model1_id': None, 'model1': None}
+
+        model2.__todict_schema__ = {'model1_id': False}
+        assert m2.todict() == {'id': 1, 'model1': None}
+
+        model2.__todict_schema__['model1'] = False
+        assert m2.todict() == {'id': 1}
+
+    def test_todict_follows_related_todict_schema_changes(self, model1, model2):
+        m2 = model2(mock.MagicMock(), id=1, model1={'id': 2, '_operation': 'insert'})
+        assert m2.todict() == {'id': 1, 'model1_id': None, 'model1': {'id': 2}}
+
+        model1.__todict_schema__ = {'id': False}
+        assert m2.todict() == {'id': 1, 'model1_id': None, 'model1': {}}
+
+    def test_todict_does_not_dump_schema_to_json(self, model1, model2):
+        m2 = model2(mock.MagicMock(), id=1)
+        m2.todict({'model1': False})
+
+        with mock.patch('falconswagger.models.orm.sqlalchemy_redis.json') as json_:
+            assert m2.todict() == {'id': 1, 'model1_id': None, 'model1': None}
+            assert m2.todict({'model1': False}) == {'id': 1, 'model1_id': None}
+
+        assert not json_.dumps.called
+
+    def test_todict_serializer_calls_format_output_json(self, model1, model2):
+        def format_output_json(self, dict_inst, schema):
+            dict_inst['formatted'] = schema
+
+        model1._format_output_json = format_output_json
+        m2 = model2(mock.MagicMock(), id=1, model1={'id': 1, '_operation': 'insert'})
+
+        assert m2.todict({'model1': {'id': True}}) == {
+            'id': 1,
+            'model1_id': None,
+            'model1': {'id': 1, 'formatted': {'id': True}}
+        }
+
+    def test_todict_serializer_uses_overrided_todict_methods(self, model1, model2):
+        def todict_columns(self, dict_inst, schema):
+            dict_inst['overrided'] = True
+
+        model1._todict_columns = todict_columns
+        m2 = model2(mock.MagicMock(), id=1, model1={'id': 1, '_operation': 'insert'})
+
+        assert m2.todict()['model1'] == {'overrided': True}
+
+    def test_todict_serializer_uses_overrided_todict(self, model1, model2):
+        model1.todict = lambda self, schema=None: 'overrided'
+        m2 = model2(mock.MagicMock(), id=1, model1={'id': 1, '_operation': 'insert'})
+
+        assert m2.todict()['model1'] == 'overrided'
+        assert model1._build_todict_list([m2.model1]) == ['overrided']
+
+
+class TestModelBaseFields(object):
+
+    def test_build_fields_schema(self, model1, model2):
+        assert model2._build_fields_schema(['id', 'model1']) == {
+            'id': True,
+            'model1_id': False,
+            'model1': True
+        }
+
+    def test_build_fields_schema_with_invalid_field(self, model1, model2):
+        with pytest.raises(ModelBaseError) as exc_info:
+            model2._build_fields_schema(['id', 'test'])
+        assert exc_info.value.args == ("invalid field 'test'",)
+
+    def test_build_filters_names_with_fields(self, model1, model2):
+        assert model2._build_filters_names({}, ['model1', 'id']) == ':fields:id,model1'
+
+    def test_get_todict_schema_with_fields(self, model1, model2):
+        assert model2.get_todict_schema(':fields:id') == {
+            'id': True,
+            'model1_id': False,
+            'model1': False
+        }
+
+    def test_get_todict_schema_without_fields(self, model1, model2):
+        assert model2.get_todict_schema('') == model2.__todict_schema__
+
+    def test_todict_with_fields_schema(self, model1, model2):
+        m2 = model2(mock.MagicMock(), id=1, model1={'id': 1, '_operation': 'insert'})
+        assert m2.todict(model2._build_fields_schema(['model1'])) == {'model1': {'id': 1}}
+
 
 class TestModelBaseNestedOperations(object):
 
     def test_raises_model_error_with_invalid_nested_id(self, model1, model2_mtm):
         session = mock.MagicMock()
-        session.query().filter().all().__getitem__.return_value = model1(mock.MagicMock(), id=1)
+        session.identity_map.get.return_value = None
+        session.query().filter().all.return_value = [model1(mock.MagicMock(), id=1)]
         with pytest.raises(ModelBaseError) as exc_info:
             model2_mtm.insert(session, {
                               'model1': [{'id': 1, '_operation': 'remove'}]})
         assert exc_info.value.args == \
             ("can't remove model 'model1' on column(s) 'id' with value(s) 1",)
+
+
+@pytest.fixture
+def model1_two_ids(model_base):
+    class model1(model_base):
+        __tablename__ = 'model1'
+        id = sa.Column(sa.Integer, primary_key=True)
+        id2 = sa.Column(sa.Integer, primary_key=True)
+
+    return model1
+
+
+def compile_filters(filters):
+    return str(filters.compile(compile_kwargs={'literal_binds': True}))
+
+
+class TestModelBaseBuildFiltersByIds(object):
+    def test_build_filters_by_ids_with_one_id(self, model1):
+        filters = model1.build_filters_by_ids([{'id': 1}])
+        assert compile_filters(filters) == 'model1.id = 1'
+
+    def test_build_filters_by_ids_with_single_column(self, model1):
+        filters = model1.build_filters_by_ids([{'id': 1}, {'id': 2}, {'id': 3}])
+        assert compile_filters(filters) == 'model1.id IN (1, 2, 3)'
+
+    def test_build_filters_by_ids_with_composite_keys(self, model1_two_ids):
+        filters = model1_two_ids.build_filters_by_ids([{'id2': 2, 'id': 1}, {'id': 3, 'id2': 4}])
+        assert compile_filters(filters) == '(model1.id, model1.id2) IN ((1, 2), (3, 4))'
+
+    def test_build_filters_by_ids_with_none_value(self, model1_two_ids):
+        filters = model1_two_ids.build_filters_by_ids([{'id': 1, 'id2': None}, {'id': 3, 'id2': 4}])
+        assert compile_filters(filters) == \
+            'model1.id = 1 AND model1.id2 IS NULL OR model1.id = 3 AND model1.id2 = 4'
+
+    def test_query_by_ids_with_chunks(self, model1):
+        query = mock.MagicMock()
+        query.filter.return_value.all.side_effect = [[1, 2], [3]]
+        model1.IDS_CHUNKS = 2
+
+        instances = model1._query_by_ids(query, [{'id': 1}, {'id': 2}, {'id': 3}])
+
+        assert instances == [1, 2, 3]
+        assert [compile_filters(call[0][0]) for call in query.filter.call_args_list] == [
+            'model1.id IN (1, 2)', 'model1.id = 3']
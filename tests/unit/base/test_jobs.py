@@ -0,0 +1,318 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.jobs import JobsExecutor
+from falconswagger.exceptions import JobsQueueFullError
+from falconswagger.models.orm.sqlalchemy_redis import ModelSQLAlchemyRedisFactory
+from fakeredis import FakeStrictRedis
+from falcon import HTTPNotFound
+from threading import Event
+from unittest import mock
+import json
+
+import pytest
+
+
+@pytest.fixture
+def executor(request):
+    executor = JobsExecutor(max_workers=1, max_queue_size=1)
+    request.addfinalizer(executor.shutdown)
+    return executor
+
+
+class TestJobsExecutor(object):
+    def test_submit_runs_job(self, executor):
+        assert executor.submit(lambda a, b: a + b, 1, 2).result() == 3
+
+    def test_submit_raises_queue_full_error_when_bounded_queue_is_full(self, executor):
+        release = Event()
+        running = executor.submit(release.wait)
+        queued = executor.submit(release.wait)
+
+        with pytest.raises(JobsQueueFullError):
+            executor.submit(release.wait)
+
+        release.set()
+        running.result()
+        queued.result()
+
+        assert executor.submit(lambda: 1).result() == 1
+
+    def test_get_metrics(self, executor):
+        release = Event()
+        started = Event()
+
+        def job():
+            started.set()
+            release.wait()
+
+        running = executor.submit(job)
+        queued = executor.submit(release.wait)
+        started.wait()
+
+        with pytest.raises(JobsQueueFullError):
+            executor.submit(release.wait)
+
+        metrics = executor.get_metrics()
+        assert metrics['queue_depth'] == 1
+        assert metrics['running_jobs'] == 1
+        assert metrics['rejected_jobs'] == 1
+        assert metrics['finished_jobs'] == 0
+
+        release.set()
+        running.result()
+        queued.result()
+        executor.shutdown()
+
+        metrics = executor.get_metrics()
+        assert metrics['queue_depth'] == 0
+        assert metrics['running_jobs'] == 0
+        assert metrics['finished_jobs'] == 2
+        assert metrics['max_latency'] >= metrics['avg_latency'] > 0
+
+    def test_shutdown_waits_jobs_and_rejects_new_ones(self, executor):
+        job = executor.submit(lambda: 1)
+        executor.shutdown()
+
+        assert job.done()
+        with pytest.raises(JobsQueueFullError):
+            executor.submit(lambda: 1)
+
+
+class FakeSession(object):
+    def __init__(self, bind, redis_bind):
+        self.bind = bind
+        self.redis_bind = redis_bind
+        self.close = mock.MagicMock()
+
+
+@pytest.fixture
+def redis():
+    redis = FakeStrictRedis()
+    redis.flushall()
+    return redis
+
+
+@pytest.fixture
+def model(executor):
+    model = ModelSQLAlchemyRedisFactory.make()
+    model.__key__ = 'test'
+    model.__jobs_executor__ = executor
+    return model
+
+
+class TestModelJobs(object):
+    def test_post_job_runs_job_on_executor(self, model, executor, redis):
+        model._run_job = mock.MagicMock(return_value={'test': 1})
+        session = FakeSession(mock.MagicMock(), redis)
+        req = mock.MagicMock(context={'session': session})
+        resp = mock.MagicMock()
+
+        with mock.patch.object(model, '_set_job', wraps=model._set_job) as set_job:
+            model.post_job(req, resp)
+            executor.shutdown()
+
+        job_hash = json.loads(resp.body)['hash']
+        job_session = req.context['job_session']
+        statuses = [call[0][1] for call in set_job.call_args_list]
+
+        assert model._run_job.call_args_list == [mock.call(req, resp)]
+        assert job_session is not session
+        assert job_session.bind == session.bind.engine.connect.return_value
+        assert [call[0][0] for call in set_job.call_args_list] == [job_hash] * 3
+        assert statuses[0] == {'status': 'queued'}
+        assert statuses[1] == {'status': 'running'}
+        assert statuses[2]['status'] == 'done'
+        assert json.loads(model._get_job(job_hash, session).decode())['result'] == {'test': 1}
+        assert job_session.bind.close.called
+        assert job_session.close.called
+
+    def test_post_job_raises_queue_full_error_and_removes_job(self, model, redis):
+        model.__jobs_executor__ = mock.MagicMock()
+        model.__jobs_executor__.submit_job.side_effect = JobsQueueFullError('full')
+        session = FakeSession(mock.MagicMock(), redis)
+        req = mock.MagicMock(context={'session': session})
+
+        with pytest.raises(JobsQueueFullError):
+            model.post_job(req, mock.MagicMock())
+
+        assert redis.keys('test_jobs*') == []
+
+    def test_job_watcher_sets_error_when_session_fails(self, model, redis):
+        model._run_job = mock.MagicMock()
+        model._set_logger()
+        session_class = mock.MagicMock(side_effect=ValueError('test'))
+        bind = mock.MagicMock()
+
+        model._job_watcher('1', mock.MagicMock(context={}), mock.MagicMock(),
+                           session_class, bind, redis)
+
+        job = json.loads(model._get_job('1', FakeSession(None, redis)).decode())
+        assert job['status'] == 'error'
+        assert job['result'] == {'name': 'ValueError', 'message': 'test'}
+        assert not model._run_job.called
+        assert bind.engine.connect.return_value.close.called
+
+    def test_get_jobs_metrics(self, model, executor):
+        resp = mock.MagicMock()
+
+        model.get_jobs_metrics(mock.MagicMock(), resp)
+
+        assert json.loads(resp.body) == executor.get_metrics()
+
+
+class TestModelJobsStorage(object):
+    def test_set_job_uses_one_key_per_job_with_ttl(self, model, redis):
+        session = FakeSession(None, redis)
+        model.__jobs_ttl__ = 60
+
+        model._set_job('1', {'status': 'running'}, session)
+        model._set_job('2', {'status': 'done', 'result': [1]}, session)
+
+        assert sorted(redis.keys('test_jobs*')) == [b'test_jobs:1', b'test_jobs:2']
+        assert 0 < redis.ttl('test_jobs:1') <= 60
+        assert json.loads(model._get_job('2', session).decode()) == {'status': 'done', 'result': [1]}
+
+    def test_set_job_refreshes_results_ttl(self, model, redis):
+        session = FakeSession(None, redis)
+        model.__jobs_ttl__ = 60
+        model._set_job_progress('1', session, result={'id': 1})
+        redis.expire('test_jobs:1:results', 1)
+
+        model._set_job('1', {'status': 'done', 'result': None}, session)
+
+        assert 1 < redis.ttl('test_jobs:1:results') <= 60
+
+    def test_set_job_splits_large_results_in_chunks(self, model, redis):
+        session = FakeSession(None, redis)
+        model.__jobs_result_chunk_size__ = 10
+        result = list(range(100))
+
+        model._set_job('1', {'status': 'done', 'result': result}, session)
+
+        manifest = json.loads(redis.get('test_jobs:1').decode())
+        chunks = redis.lrange('test_jobs:1:chunks', 0, -1)
+        assert manifest == {'status': 'done', 'result_chunks': len(chunks)}
+        assert len(chunks) == (len(json.dumps(result)) + 9) // 10
+        assert all(len(chunk) <= 10 for chunk in chunks)
+        assert 0 < redis.ttl('test_jobs:1:chunks')
+        assert json.loads(model._get_job('1', session).decode()) == {'status': 'done', 'result': result}
+
+    def test_set_job_removes_old_chunks(self, model, redis):
+        session = FakeSession(None, redis)
+        model.__jobs_result_chunk_size__ = 10
+
+        model._set_job('1', {'status': 'done', 'result': list(range(100))}, session)
+        model._set_job('1', {'status': 'done', 'result': 1}, session)
+
+        assert not redis.exists('test_jobs:1:chunks')
+        assert json.loads(model._get_job('1', session).decode()) == {'status': 'done', 'result': 1}
+
+    def test_get_job_streams_chunked_results(self, model, redis):
+        session = FakeSession(None, redis)
+        model.__jobs_result_chunk_size__ = 10
+        result = [{'id': i} for i in range(100)]
+        model._set_job('1', {'status': 'done', 'result': result, 'elapsed_time': '0'}, session)
+        req = mock.MagicMock(
+            context={'session': session, 'parameters': {'query_string': {'hash': '1'}}})
+        resp = mock.MagicMock()
+
+        model.get_job(req, resp)
+
+        assert json.loads(b''.join(resp.stream).decode()) == {
+            'status': 'done', 'result': result, 'elapsed_time': '0'}
+
+    def test_get_job_without_job_raises_not_found(self, model, redis):
+        req = mock.MagicMock(context={
+            'session': FakeSession(None, redis),
+            'parameters': {'query_string': {'hash': '1'}}
+        })
+
+        with pytest.raises(HTTPNotFound):
+            model.get_job(req, mock.MagicMock())
+
+
+class TestModelJobsProgress(object):
+    def test_run_job_reports_progress_and_partial_results(self, model, executor, redis):
+        def run_job(req, resp):
+            for i in range(3):
+                req.context['job_progress'](result=[i], progress=i+1)
+
+            return 'finished'
+
+        model._run_job = run_job
+        session = FakeSession(None, redis)
+        req = mock.MagicMock(context={'session': session})
+        resp = mock.MagicMock()
+
+        model.post_job(req, resp)
+        executor.shutdown()
+
+        job_hash = json.loads(resp.body)['hash']
+        assert redis.lrange('test_jobs:{}:results'.format(job_hash), 0, -1) == \
+            [b'[0]', b'[1]', b'[2]']
+        assert json.loads(model._get_job(job_hash, session).decode())['result'] == 'finished'
+
+    def test_set_job_progress_updates_job_status(self, model, redis):
+        session = FakeSession(None, redis)
+
+        model._set_job_progress('1', session, progress={'done': 10, 'total': 100})
+
+        assert json.loads(model._get_job('1', session).decode()) == {
+            'status': 'running', 'progress': {'done': 10, 'total': 100}}
+        assert not redis.exists('test_jobs:1:results')
+
+    def test_get_job_with_offset_returns_results_since_offset(self, model, redis):
+        session = FakeSession(None, redis)
+        model.__jobs_result_chunk_size__ = 10
+        for i in range(5):
+            model._set_job_progress('1', session, result={'id': i}, progress=i)
+
+        model._set_job('1', {'status': 'done', 'result': list(range(100))}, session)
+        req = mock.MagicMock(context={
+            'session': session,
+            'parameters': {'query_string': {'hash': '1', 'offset': 3}}
+        })
+        resp = mock.MagicMock()
+
+        model.get_job(req, resp)
+
+        assert json.loads(resp.body.decode()) == {
+            'status': 'done',
+            'results': [{'id': 3}, {'id': 4}],
+            'next_offset': 5
+        }
+
+    def test_get_job_with_offset_after_the_last_result(self, model, redis):
+        session = FakeSession(None, redis)
+        model._set_job_progress('1', session, result=1, progress=1)
+        req = mock.MagicMock(context={
+            'session': session,
+            'parameters': {'query_string': {'hash': '1', 'offset': 1}}
+        })
+        resp = mock.MagicMock()
+
+        model.get_job(req, resp)
+
+        assert json.loads(resp.body.decode()) == {
+            'status': 'running', 'progress': 1, 'results': [], 'next_offset': 1}
@@ -81,3 +81,47 @@ class TestFalconSQLAlchemyRedisMiddleware(object):
 
         sqlalchemy_middleware.process_response(req, resp, resource)
         assert 'session' not in req.context
+
+    def test_process_response_with_stream(self, sqlalchemy_middleware):
+        session = mock.MagicMock()
+        req = mock.MagicMock(
+            method='GET', uri_template='/test',
+            context={'session': session, 'session_on_stream': True})
+        resp = mock.MagicMock(stream=iter([b'[', b']']))
+        resource = ModelSQLAlchemyRedisBase
+
+        sqlalchemy_middleware.process_response(req, resp, resource)
+        assert session.close.call_count == 0
+
+        assert list(resp.stream) == [b'[', b']']
+        assert session.close.call_count == 1
+
+    def test_process_response_with_stream_closes_session_when_not_consumed(
+            self, sqlalchemy_middleware):
+        session = mock.MagicMock()
+        req = mock.MagicMock(
+            method='GET', uri_template='/test',
+            context={'session': session, 'session_on_stream': True})
+        stream = mock.MagicMock()
+        resp = mock.MagicMock(stream=stream)
+        resource = ModelSQLAlchemyRedisBase
+
+        sqlalchemy_middleware.process_response(req, resp, resource)
+        resp.stream.close()
+
+        assert stream.close.call_count == 1
+        assert session.close.call_count == 1
+
+    def test_process_response_with_stream_closes_session_once(self, sqlalchemy_middleware):
+        session = mock.MagicMock()
+        req = mock.MagicMock(
+            method='GET', uri_template='/test',
+            context={'session': session, 'session_on_stream': True})
+        resp = mock.MagicMock(stream=iter([b'[', b']']))
+        resource = ModelSQLAlchemyRedisBase
+
+        sqlalchemy_middleware.process_response(req, resp, resource)
+        list(resp.stream)
+        resp.stream.close()
+
+        assert session.close.call_count == 1
@@ -0,0 +1,231 @@
+# MIT License
+
+# Copyright (c) 2016 Diogo Dutra
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from falconswagger.exceptions import JobsQueueFullError
+from falconswagger.jobs import RedisJobsQueue
+from falconswagger.models.orm.sqlalchemy_redis import ModelSQLAlchemyRedisFactory
+from falconswagger.worker import JobsWorker, _build_parser
+from fakeredis import FakeStrictRedis
+from unittest import mock
+import json
+import signal
+
+import pytest
+
+
+@pytest.fixture
+def redis():
+    redis = FakeStrictRedis()
+    redis.flushall()
+    return redis
+
+
+@pytest.fixture
+def queue(redis):
+    return RedisJobsQueue(redis, max_queue_size=2)
+
+
+@pytest.fixture
+def model(queue):
+    model = ModelSQLAlchemyRedisFactory.make()
+    model.__key__ = 'test'
+    model.__jobs_executor__ = queue
+    model._set_logger()
+    model._run_job = mock.MagicMock(
+        side_effect=lambda req, resp: req.context['parameters']['body'])
+    return model
+
+
+@pytest.fixture
+def worker(model, queue):
+    return JobsWorker([model], queue)
+
+
+def post_job(model, redis, body):
+    session = mock.MagicMock(redis_bind=redis)
+    req = mock.MagicMock(context={'session': session, 'parameters': {'body': body}})
+    resp = mock.MagicMock()
+    model.post_job(req, resp)
+    return json.loads(resp.body)['hash']
+
+
+def get_job(model, redis, job_hash):
+    return json.loads(model._get_job(job_hash, mock.MagicMock(redis_bind=redis)).decode())
+
+
+class TestRedisJobsQueue(object):
+    def test_post_job_enqueues_job(self, model, redis, queue):
+        job_hash = post_job(model, redis, {'test': 1})
+
+        assert get_job(model, redis, job_hash) == {'status': 'queued'}
+        assert json.loads(redis.lindex(queue.queue_key, 0).decode()) == {
+            'model': 'test',
+            'hash': job_hash,
+            'parameters': {'body': {'test': 1}}
+        }
+        assert not model._run_job.called
+
+    def test_post_job_dont_enqueue_authorization_header(self, model, redis, queue):
+        session = mock.MagicMock(redis_bind=redis)
+        parameters = {
+            'body': {'test': 1},
+            'headers': {'Authorization': 'Basic dGVzdDp0ZXN0', 'X-Test': 'test'}
+        }
+        req = mock.MagicMock(context={'session': session, 'parameters': parameters})
+        model.post_job(req, mock.MagicMock())
+
+        job = json.loads(redis.lindex(queue.queue_key, 0).decode())
+        assert job['parameters']['headers'] == {'X-Test': 'test'}
+        assert b'Authorization' not in redis.lindex(queue.queue_key, 0)
+        assert 'Authorization' in parameters['headers']
+
+    def test_post_job_raises_queue_full_error(self, model, redis, queue):
+        post_job(model, redis, 1)
+        post_job(model, redis, 2)
+
+        with pytest.raises(JobsQueueFullError):
+            post_job(model, redis, 3)
+
+        assert queue.get_metrics()['queue_depth'] == 2
+        assert len(redis.keys('test_jobs:*')) == 2
+
+    def test_requeue_dead_workers_jobs(self, model, redis, queue):
+        dead_queue = RedisJobsQueue(redis, max_queue_size=2)
+        dead_queue.register_worker()
+        post_job(model, redis, 1)
+        dead_queue.pop_job()
+        redis.delete(dead_queue._build_heartbeat_key(dead_queue.worker_id))
+
+        assert queue.get_metrics()['running_jobs'] == 1
+        assert queue.requeue_dead_workers_jobs() == 1
+        assert queue.get_metrics() == {
+            'queue_depth': 1, 'running_jobs': 0, 'workers': 0, 'max_queue_size': 2}
+
+    def test_requeue_dead_workers_jobs_keeps_alive_workers_jobs(self, model, redis, queue):
+        other_queue = RedisJobsQueue(redis, max_queue_size=2)
+        other_queue.register_worker()
+        queue.register_worker()
+        post_job(model, redis, 1)
+        other_queue.pop_job()
+
+        assert queue.requeue_dead_workers_jobs() == 0
+        assert queue.get_metrics() == {
+            'queue_depth': 0, 'running_jobs': 1, 'workers': 2, 'max_queue_size': 2}
+
+    def test_unregister_worker_requeues_own_jobs(self, model, redis, queue):
+        queue.register_worker()
+        post_job(model, redis, 1)
+        queue.pop_job()
+        queue.unregister_worker()
+
+        assert queue.get_metrics() == {
+            'queue_depth': 1, 'running_jobs': 0, 'workers': 0, 'max_queue_size': 2}
+
+
+class TestJobsWorker(object):
+    def test_run_once_runs_job(self, model, redis, queue, worker):
+        job_hash = post_job(model, redis, {'test': 1})
+
+        assert worker.run_once() is True
+
+        job = get_job(model, redis, job_hash)
+        assert job['status'] == 'done'
+        assert job['result'] == {'test': 1}
+        assert queue.get_metrics()['running_jobs'] == 0
+
+    def test_run_once_sets_job_error(self, model, redis, worker):
+        model._run_job.side_effect = ValueError('test')
+        job_hash = post_job(model, redis, {'test': 1})
+
+        worker.run_once()
+
+        job = get_job(model, redis, job_hash)
+        assert job['status'] == 'error'
+        assert job['result'] == {'name': 'ValueError', 'message': 'test'}
+
+    def test_run_once_without_jobs(self, worker):
+        assert worker.run_once(timeout=1) is False
+
+    def test_run_once_with_invalid_model(self, model, redis, queue, worker):
+        model.__key__ = 'invalid'
+        job_hash = post_job(model, redis, {'test': 1})
+
+        assert worker.run_once() is True
+        assert queue.get_metrics()['running_jobs'] == 0
+        assert not model._run_job.called
+        assert get_job(model, redis, job_hash) == {
+            'status': 'error',
+            'result': {'name': 'ValueError', 'message': "Invalid model 'invalid'"}
+        }
+
+    def test_run_once_with_malformed_job(self, redis, queue, worker):
+        redis.lpush(queue.queue_key, b'invalid')
+
+        assert worker.run_once() is True
+        assert queue.get_metrics()['running_jobs'] == 0
+
+    def test_run_once_with_queue_error(self, queue, worker):
+        worker.poll_timeout = 0
+        with mock.patch.object(queue, 'pop_job', side_effect=ConnectionError('test')):
+            assert worker.run_once() is False
+
+    def test_run_registers_worker_until_stopped(self, redis, queue, worker):
+        workers = []
+
+        def run_once():
+            workers.append(queue.get_metrics()['workers'])
+            worker._stop()
+
+        worker.run_once = run_once
+        with mock.patch('falconswagger.worker.signal.signal'):
+            worker.run()
+
+        assert workers == [1]
+        assert queue.get_metrics()['workers'] == 0
+        assert not redis.exists(queue._build_heartbeat_key(queue.worker_id))
+
+    def test_run_processes_forwards_sigterm(self, worker):
+        process = mock.MagicMock()
+
+        with mock.patch('falconswagger.worker.Process', return_value=process), \
+                mock.patch('falconswagger.worker.signal.signal') as signal_:
+            worker.run_processes(2)
+
+        terminate = signal_.call_args[0][1]
+        terminate()
+
+        assert signal_.call_args[0][0] == signal.SIGTERM
+        assert process.start.call_count == 2
+        assert process.terminate.call_count == 2
+
+
+class TestWorkerParser(object):
+    def test_parse_worker_args(self):
+        args = _build_parser().parse_args(
+            ['worker', 'app:models', '--processes', '4', '--queue-key', 'jobs'])
+
+        assert args.command == 'worker'
+        assert args.models == ['app:models']
+        assert args.processes == 4
+        assert args.queue_key == 'jobs'
+        assert args.redis_url == 'redis://localhost:6379/0'